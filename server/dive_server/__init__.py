@@ -3,15 +3,40 @@ from pathlib import Path
 
 from girder import events, plugin
 from girder.constants import AccessType
+from girder.models.folder import Folder
+from girder.models.item import Item
 from girder.models.setting import Setting
 from girder.models.user import User
 from girder.utility import mail_utils, setting_utilities
 from girder.utility.model_importer import ModelImporter
+from girder_jobs.models.job import Job
+import pymongo
 
-from dive_utils.constants import SETTINGS_CONST_JOBS_CONFIGS, UserPrivateQueueEnabledMarker
+from dive_utils.constants import (
+    JOBCONST_DATASET_ID,
+    SETTINGS_CONST_JOBS_CONFIGS,
+    DatasetMarker,
+    DetectionDeltaMarker,
+    DetectionMarker,
+    NaturalSortKeyField,
+    PublishedMarker,
+    SnapshotHashMarker,
+    TrainedPipelineMarker,
+    UserPrivateQueueEnabledMarker,
+)
 
 from .client_webroot import ClientWebroot
-from .event import process_fs_import, process_s3_import, send_new_user_email
+from .event import (
+    invalidate_file_frame_manifest,
+    invalidate_item_frame_manifest,
+    invalidate_trained_pipelines,
+    process_fs_import,
+    process_s3_import,
+    remove_dataset_tracks,
+    send_new_user_email,
+    set_natural_sort_key,
+)
+from .track_item import TrackItem
 from .viame import Viame
 from .viame_detection import ViameDetection
 from .viame_summary import SummaryItem, ViameSummary
@@ -30,10 +55,66 @@ def validateSettings(doc):
         assert 'pipelines' in val, '"piplines" missing from doc'
 
 
+def _partial(field: str) -> dict:
+    """Index options covering only the documents that set a metadata field"""
+    return {'partialFilterExpression': {field: {'$exists': True}}}
+
+
+def ensureDiveIndices():
+    """Indices for the metadata queries DIVE makes, most of which match few documents"""
+    Item().ensureIndices(
+        [
+            # Detection reads look up the revision log of their snapshot file
+            (f'meta.{DetectionDeltaMarker}', {'sparse': True}),
+            # Saves look for an identical past revision to share its files
+            (f'meta.{SnapshotHashMarker}', {'sparse': True}),
+            (
+                [(f'meta.{DetectionMarker}', pymongo.ASCENDING), ('created', pymongo.DESCENDING)],
+                _partial(f'meta.{DetectionMarker}'),
+            ),
+            (
+                [
+                    ('folderId', pymongo.ASCENDING),
+                    ('meta.codec', pymongo.ASCENDING),
+                    ('meta.source_video', pymongo.ASCENDING),
+                ],
+                _partial('meta.codec'),
+            ),
+            # Image sequences are listed in DIVE frame order
+            ([('folderId', pymongo.ASCENDING), (NaturalSortKeyField, pymongo.ASCENDING)], {}),
+            (
+                [('meta.brand', pymongo.ASCENDING), ('creatorId', pymongo.ASCENDING)],
+                _partial('meta.brand'),
+            ),
+        ]
+    )
+    Folder().ensureIndices(
+        [
+            (
+                [(f'meta.{DatasetMarker}', pymongo.ASCENDING), ('created', pymongo.ASCENDING)],
+                _partial(f'meta.{DatasetMarker}'),
+            ),
+            (
+                [(f'meta.{PublishedMarker}', pymongo.ASCENDING), ('created', pymongo.ASCENDING)],
+                _partial(f'meta.{PublishedMarker}'),
+            ),
+            (f'meta.{TrainedPipelineMarker}', {'sparse': True}),
+        ]
+    )
+    Job().ensureIndex(
+        (
+            [(JOBCONST_DATASET_ID, pymongo.ASCENDING), ('status', pymongo.ASCENDING)],
+            _partial(JOBCONST_DATASET_ID),
+        )
+    )
+
+
 class GirderPlugin(plugin.GirderPlugin):
     def load(self, info):
         ModelImporter.registerModel('summaryItem', SummaryItem, plugin='dive_server')
+        ModelImporter.registerModel('trackItem', TrackItem, plugin='dive_server')
         User().exposeFields(AccessType.READ, UserPrivateQueueEnabledMarker)
+        ensureDiveIndices()
 
         info["apiRoot"].viame = Viame()
         info["apiRoot"].viame_detection = ViameDetection()
@@ -59,6 +140,22 @@ class GirderPlugin(plugin.GirderPlugin):
             "process_s3_import",
             process_s3_import,
         )
+        events.bind(
+            'model.folder.remove',
+            'remove_dataset_tracks',
+            remove_dataset_tracks,
+        )
+        events.bind(
+            'model.item.save',
+            'set_natural_sort_key',
+            set_natural_sort_key,
+        )
+        for event in ('model.item.save', 'model.item.remove'):
+            events.bind(event, 'invalidate_frame_manifest', invalidate_item_frame_manifest)
+        for event in ('model.file.save', 'model.file.remove'):
+            events.bind(event, 'invalidate_frame_manifest', invalidate_file_frame_manifest)
+        for event in ('model.folder.save.after', 'model.folder.remove'):
+            events.bind(event, 'invalidate_trained_pipelines', invalidate_trained_pipelines)
         events.bind(
             'model.user.save.created',
             'send_new_user_email',
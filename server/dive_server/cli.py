@@ -0,0 +1,90 @@
+import click
+from girder.models.folder import Folder
+from girder.utility.server import configureServer
+
+from dive_server.utils import (
+    applyRevisionRetention,
+    getFolderTrackData,
+    migrateTrackStorage,
+    setDatasetStats,
+)
+from dive_utils.constants import DatasetMarker, DatasetStatsMarker
+from dive_utils.stats import track_stats
+
+
+@click.command(
+    'dive-migrate-tracks',
+    short_help='Move DIVE detection files into per-track documents.',
+    help='Convert the detection file of each DIVE dataset into one TrackItem document per '
+    'track.  Every dataset is converted unless --dataset is given.',
+)
+@click.option('--dataset', 'datasetIds', multiple=True, help='Folder id of a dataset to convert.')
+def migrate_tracks(datasetIds):
+    configureServer(plugins=['dive_server'])
+    query = {f'meta.{DatasetMarker}': True}
+    if datasetIds:
+        query = {
+            '_id': {'$in': [Folder().load(i, force=True, exc=True)['_id'] for i in datasetIds]}
+        }
+    for folder in Folder().find(query):
+        if migrateTrackStorage(folder):
+            click.echo(f'Migrated {folder["name"]} ({folder["_id"]})')
+        else:
+            click.echo(f'Skipped {folder["name"]} ({folder["_id"]}), already migrated')
+
+
+@click.command(
+    'dive-prune-revisions',
+    short_help='Apply the revision retention policy to DIVE datasets.',
+    help='Remove past annotation revisions of every DIVE dataset that fall outside the '
+    'retention policy, along with revisions that duplicate a newer one.  The policy '
+    'defaults to DIVE_REVISION_KEEP_LAST and DIVE_REVISION_THINNING.',
+)
+@click.option('--keep-last', type=int, default=None, help='Number of newest revisions to keep.')
+@click.option(
+    '--thinning',
+    type=click.Choice(['hourly', 'daily']),
+    default=None,
+    help='Also keep the newest revision of every hour or day.',
+)
+@click.option('--batch-size', type=int, default=100, show_default=True)
+def prune_revisions(keep_last, thinning, batch_size):
+    configureServer(plugins=['dive_server'])
+    query = {f'meta.{DatasetMarker}': True}
+    lastId = None
+    while True:
+        # Short batches keep the cursor from timing out while revisions are removed
+        batchQuery = query if lastId is None else {**query, '_id': {'$gt': lastId}}
+        batch = list(Folder().find(batchQuery, sort=[('_id', 1)], limit=batch_size))
+        if not batch:
+            break
+        for folder in batch:
+            removed = applyRevisionRetention(folder, keep_last, thinning)
+            if removed:
+                click.echo(f'Removed {removed} revisions of {folder["name"]} ({folder["_id"]})')
+        lastId = batch[-1]['_id']
+
+
+@click.command(
+    'dive-dataset-stats',
+    short_help='Compute the track statistics shown in DIVE dataset listings.',
+    help='Record the track statistics of DIVE datasets that have none, such as datasets last '
+    'saved before statistics were kept.  Use --all to recompute them for every dataset.',
+)
+@click.option('--all', 'recompute', is_flag=True, help='Recompute existing statistics.')
+@click.option('--batch-size', type=int, default=100, show_default=True)
+def dataset_stats(recompute, batch_size):
+    configureServer(plugins=['dive_server'])
+    query = {f'meta.{DatasetMarker}': True}
+    if not recompute:
+        query[f'meta.{DatasetStatsMarker}'] = {'$exists': False}
+    lastId = None
+    while True:
+        batchQuery = query if lastId is None else {**query, '_id': {'$gt': lastId}}
+        batch = list(Folder().find(batchQuery, sort=[('_id', 1)], limit=batch_size))
+        if not batch:
+            break
+        for folder in batch:
+            setDatasetStats(folder, track_stats(getFolderTrackData(folder).values()))
+            click.echo(f'Updated {folder["name"]} ({folder["_id"]})')
+        lastId = batch[-1]['_id']
@@ -10,7 +10,10 @@ from girder.models.user import User
 from girder.settings import SettingKey
 from girder.utility.mail_utils import renderTemplate, sendMail
 
-from dive_utils import asbool, fromMeta
+from dive_server.pipelines import invalidateTrainedPipelines
+from dive_server.track_item import TrackItem
+from dive_server.utils import forgetCurrentDetections, invalidateFrameManifests
+from dive_utils import asbool, fromMeta, natural_sort_string
 from dive_utils.constants import (
     AssetstoreSourceMarker,
     AssetstoreSourcePathMarker,
@@ -19,10 +22,13 @@ from dive_utils.constants import (
     DetectionMarker,
     FPSMarker,
     ImageSequenceType,
+    NaturalSortKeyField,
+    TrainedPipelineMarker,
     TypeMarker,
     VideoType,
     csvRegex,
     imageRegex,
+    safeImageRegex,
     videoRegex,
 )
 
@@ -62,6 +68,7 @@ def process_assetstore_import(event, meta: dict):
     if csvRegex.search(importPath):
         # Update file metadata
         item["meta"].update({DetectionMarker: str(item["folderId"])})
+        forgetCurrentDetections(item["folderId"])
 
     elif imageRegex.search(importPath):
         dataset_type = ImageSequenceType
@@ -100,9 +107,57 @@ def process_assetstore_import(event, meta: dict):
             Folder().save(folder)
 
 
+def set_natural_sort_key(event):
+    """Store the DIVE sort order of an item's name on it, including on import and rename"""
+    item = event.info
+    item[NaturalSortKeyField] = natural_sort_string(item['name'])
+
+
+def invalidate_item_frame_manifest(event):
+    """Invalidate the frame manifests of the folders an image item is added to, moved or removed"""
+    item = event.info
+    if not safeImageRegex.search(item['name']):
+        return
+    if '_id' in item:
+        stored = Item().collection.find_one({'_id': item['_id']}, {'folderId': True, 'name': True})
+        if stored is not None:
+            if event.name == 'model.item.save' and (stored['folderId'], stored['name']) == (
+                item['folderId'],
+                item['name'],
+            ):
+                return
+            invalidateFrameManifests({stored['folderId'], item['folderId']})
+            return
+    invalidateFrameManifests([item['folderId']])
+
+
+def invalidate_file_frame_manifest(event):
+    """
+    Invalidate the frame manifest of the folder of an image item whose file is changed
+    or removed.  New files are skipped: they come after the file of their item that a
+    manifest lists, or give a file to an image that kept the manifest from being cached.
+    """
+    file = event.info
+    if '_id' not in file or not file.get('itemId') or not safeImageRegex.search(file['name']):
+        return
+    item = Item().collection.find_one({'_id': file['itemId']}, {'folderId': True})
+    if item is not None:
+        invalidateFrameManifests([item['folderId']])
+
+
 def process_fs_import(event):
     return process_assetstore_import(event, {AssetstoreSourceMarker: 'filesystem'})
 
 
 def process_s3_import(event):
     return process_assetstore_import(event, {AssetstoreSourceMarker: 's3'})
+
+
+def remove_dataset_tracks(event):
+    TrackItem().removeWithQuery({'datasetId': event.info['_id']})
+
+
+def invalidate_trained_pipelines(event):
+    """Drop the cached pipeline lists when a trained pipeline folder changes"""
+    if asbool(fromMeta(event.info, TrainedPipelineMarker)):
+        invalidateTrainedPipelines()
@@ -1,4 +1,6 @@
-from typing import Dict, Optional
+import os
+import time
+from typing import Dict, List, Optional
 
 from girder.constants import AccessType
 from girder.exceptions import RestException
@@ -16,12 +18,14 @@ from dive_server.utils import (
 )
 from dive_tasks.tasks import EMPTY_JOB_SCHEMA, run_pipeline as async_run_pipeline
 from dive_utils import TRUTHY_META_VALUES, asbool, fromMeta
+from dive_utils.cache import SizedLRUCache
 from dive_utils.constants import (
     JOBCONST_DATASET_ID,
     JOBCONST_PIPELINE_NAME,
     JOBCONST_PRIVATE_QUEUE,
     JOBCONST_RESULTS_FOLDER_ID,
     SETTINGS_CONST_JOBS_CONFIGS,
+    TrainedPipeFileMarker,
     TrainedPipelineCategory,
     TrainedPipelineMarker,
     UserPrivateQueueEnabledMarker,
@@ -34,21 +38,34 @@ from dive_utils.types import (
     PipelineJob,
 )
 
+# Trained pipelines each user can read, kept for at most DIVE_PIPELINE_CACHE_SECONDS
+trainedPipelineCache = SizedLRUCache(int(os.getenv("DIVE_PIPELINE_CACHE_USERS", 1000)))
 
-def _load_dynamic_pipelines(user: User) -> Dict[str, PipelineCategory]:
-    """Add any additional dynamic pipelines to the existing pipeline list."""
-    pipelines: Dict[str, PipelineCategory] = {}
-    pipelines[TrainedPipelineCategory] = {"pipes": [], "description": ""}
+
+def invalidateTrainedPipelines():
+    trainedPipelineCache.clear()
+
+
+def _trainedPipelines(user: User) -> List[PipelineDescription]:
+    pipes: List[PipelineDescription] = []
     for folder in Folder().findWithPermissions(
         query={f"meta.{TrainedPipelineMarker}": {'$in': TRUTHY_META_VALUES}},
+        fields=["name", f"meta.{TrainedPipeFileMarker}"],
         user=user,
     ):
-        pipename = None
-        for item in Folder().childItems(folder):
-            if item['name'].endswith('.pipe'):
+        pipename = fromMeta(folder, TrainedPipeFileMarker)
+        if pipename is None:
+            # Pipelines trained before the pipe file was recorded on their folder
+            for item in Folder().childItems(folder, filters={'name': {'$regex': r'\.pipe$'}}):
                 pipename = item['name']
+            if pipename is not None:
+                Folder().update(
+                    {'_id': folder['_id']},
+                    {'$set': {f'meta.{TrainedPipeFileMarker}': pipename}},
+                    multi=False,
+                )
         if pipename is not None:
-            pipelines[TrainedPipelineCategory]["pipes"].append(
+            pipes.append(
                 {
                     "name": folder["name"],
                     "type": TrainedPipelineCategory,
@@ -56,6 +73,22 @@ def _load_dynamic_pipelines(user: User) -> Dict[str, PipelineCategory]:
                     "folderId": str(folder["_id"]),
                 }
             )
+    return pipes
+
+
+def _load_dynamic_pipelines(user: User) -> Dict[str, PipelineCategory]:
+    """Add any additional dynamic pipelines to the existing pipeline list."""
+    key = str(user["_id"]) if user else None
+    version = int(time.time() // int(os.getenv("DIVE_PIPELINE_CACHE_SECONDS", 30)))
+    pipes = trainedPipelineCache.get(key, version)
+    if pipes is None:
+        pipes = _trainedPipelines(user)
+        trainedPipelineCache.put(key, pipes, 1, version)
+    pipelines: Dict[str, PipelineCategory] = {}
+    pipelines[TrainedPipelineCategory] = {
+        "pipes": [pipe.copy() for pipe in pipes],
+        "description": "",
+    }
     return pipelines
 
 
@@ -1,12 +1,11 @@
 """
 KWCOCO JSON format deserializer
 """
-import functools
 from typing import Any, Dict, List, Tuple
 
 from dive_server.serializers import viame
-from dive_utils import strNumericCompare
-from dive_utils.models import CocoMetadata, Feature, Track
+from dive_utils import natural_sort_key
+from dive_utils.models import CocoMetadata, Track, feature_json, track_json
 
 
 def is_coco_json(coco: Dict[str, Any]):
@@ -45,7 +44,7 @@ def _parse_annotation(annotation: dict, meta: CocoMetadata) -> Tuple[dict, dict,
     category_id = annotation['category_id']
     score = annotation.get('score', 1.0)  # may not exist, default to 1.0
     class_name = meta.categories[category_id]['name']
-    confidence_pair = (class_name, score)
+    confidence_pair = (str(class_name), float(score))
 
     # parse keypoints
     keypoints = annotation.get('keypoints', [])
@@ -55,7 +54,7 @@ def _parse_annotation(annotation: dict, meta: CocoMetadata) -> Tuple[dict, dict,
             keypoint_labels = meta.categories[category_id].get('keypoints', [])
             n = min(len(keypoint_labels), int(len(keypoints) / 3))  # stopping index
             for i in range(n):
-                point = keypoints[3 * i : 3 * i + 2]  # extract [x, y] pair
+                point = [float(v) for v in keypoints[3 * i : 3 * i + 2]]  # extract [x, y] pair
                 label = keypoint_labels[i]
                 if label in ('head', 'tail'):  # only allow head and tail keypoints
                     head_tail.append(point)
@@ -65,9 +64,9 @@ def _parse_annotation(annotation: dict, meta: CocoMetadata) -> Tuple[dict, dict,
         # dictionary kwcoco format
         keypoint_category_id = keypoint['keypoint_category_id']
         label = meta.keypoint_categories[keypoint_category_id]['name']
-        point = keypoint['xy']
+        point = [float(v) for v in keypoint['xy']]
         if label in ('head', 'tail'):  # only allow head and tail keypoints
-            head_tail.append(keypoint['xy'])
+            head_tail.append(point)
             viame.create_geoJSONFeature(features, 'Point', point, label)
 
     # create head-tail line if keypoint pair exists
@@ -109,6 +108,7 @@ def _parse_annotation(annotation: dict, meta: CocoMetadata) -> Tuple[dict, dict,
                 raise ValueError('Incorrect polygon segmentation')
 
             if coords:
+                coords = [[float(v) for v in point] for point in coords]
                 viame.create_geoJSONFeature(features, 'Polygon', coords)
 
     # TODO: process attributes and track_attributes
@@ -118,7 +118,7 @@ def _parse_annotation(annotation: dict, meta: CocoMetadata) -> Tuple[dict, dict,
 
 def _parse_annotation_for_tracks(
     annotation: dict, meta: CocoMetadata
-) -> Tuple[Feature, dict, dict, list]:
+) -> Tuple[dict, dict, dict, list]:
     (
         features,
         attributes,
@@ -127,9 +127,10 @@ def _parse_annotation_for_tracks(
     ) = _parse_annotation(annotation, meta)
     trackId, filename, frame, bounds = annotation_info(annotation, meta)
 
-    feature = Feature(
-        frame=frame,
-        bounds=bounds,
+    # Values are coerced to the model types above, so the model need not re-validate them
+    feature = feature_json(
+        frame=int(frame),
+        bounds=[int(x) for x in bounds],
         attributes=attributes or None,
         fishLength=None,
         **features,
@@ -151,11 +152,8 @@ def load_coco_metadata(coco: Dict[str, List[dict]]) -> CocoMetadata:
     # if any videos exist, can assume the images have frame indices
     is_video = len(videos) > 0
 
-    def file_name_cmp(item1, item2):
-        return strNumericCompare(item1['file_name'], item2['file_name'])
-
     # sort images by "dive order"
-    dive_sorted_images = sorted(images, key=functools.cmp_to_key(file_name_cmp))
+    dive_sorted_images = sorted(images, key=lambda image: natural_sort_key(image['file_name']))
 
     # assign frame_index to all images
     for i, image in enumerate(dive_sorted_images):
@@ -182,13 +180,17 @@ def load_coco_metadata(coco: Dict[str, List[dict]]) -> CocoMetadata:
     )
 
 
-def load_coco_as_tracks_and_attributes(coco: Dict[str, List[dict]]) -> Tuple[dict, dict]:
+def load_coco_as_tracks_and_attributes(
+    coco: Dict[str, List[dict]], strict=False
+) -> Tuple[dict, dict]:
     """
     Convert KWCOCO json to DIVE json tracks.
+
+    :param strict: validate every track against the Track model, for untrusted input
     """
-    tracks: Dict[int, Track] = {}
+    tracks: Dict[int, Dict[str, Any]] = {}
     metadata_attributes: Dict[str, Dict[str, Any]] = {}
-    test_vals: Dict[str, Dict[str, int]] = {}
+    test_vals: Dict[str, viame.AttributeValueCounter] = {}
     meta = load_coco_metadata(coco)
     annotations = coco.get('annotations', [])
 
@@ -203,16 +205,16 @@ def load_coco_as_tracks_and_attributes(coco: Dict[str, List[dict]]) -> Tuple[dic
         trackId, _, frame, _ = annotation_info(annotation, meta)
 
         if trackId not in tracks:
-            tracks[trackId] = Track(begin=frame, end=frame, trackId=trackId)
+            tracks[trackId] = track_json(begin=frame, end=frame, trackId=trackId)
 
         track = tracks[trackId]
-        track.begin = min(frame, track.begin)
-        track.end = max(track.end, frame)
-        track.features.append(feature)
-        track.confidencePairs = confidence_pairs
+        track['begin'] = min(frame, track['begin'])
+        track['end'] = max(track['end'], frame)
+        track['features'].append(feature)
+        track['confidencePairs'] = confidence_pairs
 
         for (key, val) in track_attributes.items():
-            track.attributes[key] = val
+            track['attributes'][key] = val
             viame.create_attributes(metadata_attributes, test_vals, 'track', key, val)
         for (key, val) in attributes.items():
             viame.create_attributes(metadata_attributes, test_vals, 'detection', key, val)
@@ -220,5 +222,6 @@ def load_coco_as_tracks_and_attributes(coco: Dict[str, List[dict]]) -> Tuple[dic
     # Now we process all the metadata_attributes for the types
     viame.calculate_attribute_types(metadata_attributes, test_vals)
 
-    track_json = {trackId: track.dict(exclude_none=True) for trackId, track in tracks.items()}
-    return track_json, metadata_attributes
+    if strict:
+        tracks = {trackId: Track(**t).dict(exclude_none=True) for trackId, t in tracks.items()}
+    return tracks, metadata_attributes
@@ -1,17 +1,28 @@
 """
 VIAME Fish format deserializer
 """
+from concurrent.futures import ProcessPoolExecutor
 import csv
 import datetime
+import heapq
 import io
 import json
+import multiprocessing
+import os
 import re
-from typing import Any, Dict, Generator, List, Tuple, Union
+import threading
+from typing import Any, Dict, Generator, Iterable, List, Optional, Tuple, Union
 
-from dive_utils.models import Feature, Track, interpolate
+from dive_utils import iterLines
+from dive_utils.models import Track, exceeds_thresholds, feature_json, interpolate_json, track_json
 
+# Patterns for the body of tagged trailing columns, i.e. the text after "(tag) "
+keypointRegex = re.compile(r"(head|tail) ([0-9]+\.*[0-9]*) ([0-9]+\.*[0-9]*)")
+attributeRegex = re.compile(r"(.*?)\s(.+)")
+polygonRegex = re.compile(r"(?:[0-9]+\.*[0-9]*\s*)+")
 
-def format_timestamp(fps: int, frame: int) -> str:
+
+def format_timestamp(fps: Union[int, float], frame: int) -> str:
     return str(datetime.datetime.utcfromtimestamp(frame / fps).strftime(r'%H:%M:%S.%f'))
 
 
@@ -72,10 +83,22 @@ def _deduceType(value: str) -> Union[bool, float, str]:
         return value
 
 
-def create_geoJSONFeature(features: Dict[str, Any], type: str, coords: List[Any], key=''):
+def create_geoJSONFeature(
+    features: Dict[str, Any],
+    type: str,
+    coords: List[Any],
+    key='',
+    index: Optional[Dict[Tuple[str, str], Dict[str, Any]]] = None,
+):
+    """
+    :param index: optional (type, key) lookup of the features already created for
+        this detection, used in place of scanning the feature collection
+    """
     feature = {}
     if "geometry" not in features:
         features["geometry"] = {"type": "FeatureCollection", "features": []}
+    elif index is not None:
+        feature = index.get((type, key), {})
     else:  # check for existing type/key pairs
         if features["geometry"]["features"]:
             for subfeature in features["geometry"]["features"]:
@@ -88,9 +111,11 @@ def create_geoJSONFeature(features: Dict[str, Any], type: str, coords: List[Any]
     if "geometry" not in feature:
         feature = {
             "type": "Feature",
-            "properties": {"key": key},
             "geometry": {"type": type},
+            "properties": {"key": key},
         }
+        if index is not None:
+            index[(type, key)] = feature
     if type == 'Polygon':
         feature["geometry"]['coordinates'] = [coords]
     elif type in ["LineString", "Point"]:
@@ -104,6 +129,7 @@ def _parse_row(row: List[str]) -> Tuple[Dict, Dict, Dict, List]:
     Parse a single CSV line into its composite track and detection parts
     """
     features: Dict[str, Any] = {}
+    feature_index: Dict[Tuple[str, str], Dict[str, Any]] = {}
     attributes: Dict[str, Any] = {}
     track_attributes: Dict[str, Any] = {}
     confidence_pairs: List[Tuple[str, float]] = [
@@ -116,39 +142,46 @@ def _parse_row(row: List[str]) -> Tuple[Dict, Dict, Dict, List]:
     start = 9 + len(sorted_confidence_pairs) * 2
 
     for j in range(start, len(row)):
-        # (kp) head x y
-        head_regex = re.match(r"^\(kp\) head ([0-9]+\.*[0-9]*) ([0-9]+\.*[0-9]*)", row[j])
-        if head_regex:
-            point = [float(head_regex[1]), float(head_regex[2])]
-            head_tail.append(point)
-            create_geoJSONFeature(features, 'Point', point, 'head')
-
-        # (kp) tail x y
-        tail_regex = re.match(r"^\(kp\) tail ([0-9]+\.*[0-9]*) ([0-9]+\.*[0-9]*)", row[j])
-        if tail_regex:
-            point = [float(tail_regex[1]), float(tail_regex[2])]
-            head_tail.append(point)
-            create_geoJSONFeature(features, 'Point', point, 'tail')
-
-        # (atr) text
-        atr_regex = re.match(r"^\(atr\) (.*?)\s(.+)", row[j])
-        if atr_regex:
-            attributes[atr_regex[1]] = _deduceType(atr_regex[2])
-
-        # (trk-atr) text
-        trk_regex = re.match(r"^\(trk-atr\) (.*?)\s(.+)", row[j])
-        if trk_regex:
-            track_attributes[trk_regex[1]] = _deduceType(trk_regex[2])
-
-        # (poly) x1 y1 x2 y2 ...
-        poly_regex = re.match(r"^(\(poly\)) ((?:[0-9]+\.*[0-9]*\s*)+)", row[j])
-        if poly_regex:
-            temp = [float(x) for x in poly_regex[2].split()]
-            coords = list(zip(temp[::2], temp[1::2]))
-            create_geoJSONFeature(features, 'Polygon', coords)
+        # Classify the column once by its leading "(tag) "
+        column = row[j]
+        if not column.startswith("("):
+            continue
+        tag_end = column.find(") ")
+        if tag_end < 0:
+            continue
+        tag = column[: tag_end + 1]
+        body = column[tag_end + 2 :]
+
+        if tag == "(kp)":
+            # (kp) head x y, (kp) tail x y
+            kp_match = keypointRegex.match(body)
+            if kp_match:
+                point = [float(kp_match[2]), float(kp_match[3])]
+                head_tail.append(point)
+                create_geoJSONFeature(features, 'Point', point, kp_match[1], feature_index)
+
+        elif tag == "(atr)":
+            # (atr) text
+            atr_match = attributeRegex.match(body)
+            if atr_match:
+                attributes[atr_match[1]] = _deduceType(atr_match[2])
+
+        elif tag == "(trk-atr)":
+            # (trk-atr) text
+            trk_match = attributeRegex.match(body)
+            if trk_match:
+                track_attributes[trk_match[1]] = _deduceType(trk_match[2])
+
+        elif tag == "(poly)":
+            # (poly) x1 y1 x2 y2 ...
+            poly_match = polygonRegex.match(body)
+            if poly_match:
+                temp = list(map(float, poly_match[0].split()))
+                coords = list(zip(temp[::2], temp[1::2]))
+                create_geoJSONFeature(features, 'Polygon', coords, index=feature_index)
 
     if len(head_tail) == 2:
-        create_geoJSONFeature(features, 'LineString', head_tail, 'HeadTails')
+        create_geoJSONFeature(features, 'LineString', head_tail, 'HeadTails', feature_index)
 
     # ensure confidence pairs list is not empty
     if len(sorted_confidence_pairs) == 0:
@@ -164,11 +197,12 @@ def _parse_row(row: List[str]) -> Tuple[Dict, Dict, Dict, List]:
     return features, attributes, track_attributes, sorted_confidence_pairs
 
 
-def _parse_row_for_tracks(row: List[str]) -> Tuple[Feature, Dict, Dict, List]:
+def _parse_row_for_tracks(row: List[str]) -> Tuple[Dict, Dict, Dict, List]:
     head_tail_feature, attributes, track_attributes, confidence_pairs = _parse_row(row)
     trackId, filename, frame, bounds, fishLength = row_info(row)
 
-    feature = Feature(
+    # Every value has been typed by the parser, so the model need not re-validate it
+    feature = feature_json(
         frame=frame,
         bounds=bounds,
         attributes=attributes or None,
@@ -180,9 +214,74 @@ def _parse_row_for_tracks(row: List[str]) -> Tuple[Feature, Dict, Dict, List]:
     return feature, attributes, track_attributes, confidence_pairs
 
 
+class AttributeValueCounter:
+    """
+    Streaming datatype inference and value counts for a single attribute.
+
+    Distinct values are counted exactly until there are more than `capacity` of them.
+    Past that point only a Misra-Gries heavy-hitters summary of the most frequent
+    values is kept, so memory stays bounded for free-text attributes, and the
+    attribute is no longer a candidate for predefined values.
+    """
+
+    datatypes = ['number', 'boolean', 'text']
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.exact = True
+        self.datatype = 'number'
+
+    def _observe_new_value(self, valstring: str):
+        # A value may only be number, then boolean, then text.
+        if self.datatype == 'number':
+            try:
+                float(valstring)
+            except ValueError:
+                self.datatype = 'boolean'
+        if self.datatype == 'boolean' and valstring != 'True' and valstring != 'False':
+            self.datatype = 'text'
+
+    def _shrink(self):
+        # Misra-Gries: subtract the (capacity + 1)th largest count from every counter
+        threshold = heapq.nlargest(self.capacity + 1, self.counts.values())[-1]
+        self.counts = {
+            valstring: count - threshold
+            for valstring, count in self.counts.items()
+            if count > threshold
+        }
+
+    def add(self, valstring: str, count: int = 1):
+        if valstring in self.counts:
+            self.counts[valstring] += count
+            return
+        self._observe_new_value(valstring)
+        self.counts[valstring] = count
+        if len(self.counts) > self.capacity:
+            self.exact = False
+            # Shrinking once per `capacity` new values keeps the cost per value logarithmic,
+            # at the price of holding up to twice as many counters in between
+            if len(self.counts) > 2 * self.capacity:
+                self._shrink()
+
+    def merge(self, other: 'AttributeValueCounter'):
+        """Merge counts observed after this counter's, as if they had been added in order"""
+        for valstring, count in other.counts.items():
+            self.add(valstring, count)
+        if not other.exact:
+            self.exact = False
+            self.datatype = max(self.datatype, other.datatype, key=self.datatypes.index)
+
+    def predefined_values(self, min_count: int) -> Optional[List[str]]:
+        """All distinct values, if every one of them was seen at least min_count times"""
+        if self.exact and all(count >= min_count for count in self.counts.values()):
+            return list(self.counts.keys())
+        return None
+
+
 def create_attributes(
     metadata_attributes: Dict[str, Dict[str, Any]],
-    test_vals: Dict[str, Dict[str, int]],
+    test_vals: Dict[str, AttributeValueCounter],
     atr_type: str,
     key: str,
     val,
@@ -196,52 +295,35 @@ def create_attributes(
             'name': key,
             'key': attribute_key,
         }
-        test_vals[attribute_key] = {}
-        test_vals[attribute_key][valstring] = 1
-    elif attribute_key in metadata_attributes and attribute_key in test_vals:
-        if valstring in test_vals[attribute_key]:
-            test_vals[attribute_key][valstring] += 1
-        else:
-            test_vals[attribute_key][valstring] = 1
+        test_vals[attribute_key] = AttributeValueCounter()
+    test_vals[attribute_key].add(valstring)
 
 
 def calculate_attribute_types(
-    metadata_attributes: Dict[str, Dict[str, Any]], test_vals: Dict[str, Dict[str, int]]
+    metadata_attributes: Dict[str, Dict[str, Any]], test_vals: Dict[str, AttributeValueCounter]
 ):
     # count all keys must have a value to convert to predefined
     predefined_min_count = 3
     for attributeKey in metadata_attributes.keys():
         if attributeKey in test_vals:
-            attribute_type = 'number'
-            low_count = predefined_min_count
-            values = []
-            for (key, val) in test_vals[attributeKey].items():
-                if val <= low_count:
-                    low_count = val
-                values.append(key)
-                if attribute_type == 'number':
-                    try:
-                        float(key)
-                    except ValueError:
-                        attribute_type = 'boolean'
-                if attribute_type == 'boolean' and key != 'True' and key != 'False':
-                    attribute_type = 'text'
+            counter = test_vals[attributeKey]
             # If all text values are used 3 or more times they are defined values
-            if low_count >= predefined_min_count and 'text' in attribute_type:
+            values = counter.predefined_values(predefined_min_count)
+            if values is not None and counter.datatype == 'text':
                 metadata_attributes[attributeKey]['values'] = values
 
-            metadata_attributes[attributeKey]['datatype'] = attribute_type
+            metadata_attributes[attributeKey]['datatype'] = counter.datatype
 
 
-def load_csv_as_tracks_and_attributes(rows: List[str]) -> Tuple[dict, dict]:
+def _load_csv_rows(rows: Iterable[str], strict=False) -> Tuple[dict, dict, dict]:
     """
-    Convert VIAME CSV to json tracks.
-    Expect detections to be in increasing order (either globally or by track).
+    Parse CSV lines into json tracks, attribute metadata, and the raw attribute value
+    counts that calculate_attribute_types needs to decide on attribute types.
     """
     reader = csv.reader(row for row in rows if (not row.startswith("#") and row))
-    tracks: Dict[int, Track] = {}
+    tracks: Dict[int, Dict[str, Any]] = {}
     metadata_attributes: Dict[str, Dict[str, Any]] = {}
-    test_vals: Dict[str, Dict[str, int]] = {}
+    test_vals: Dict[str, AttributeValueCounter] = {}
     for row in reader:
         (
             feature,
@@ -253,24 +335,282 @@ def load_csv_as_tracks_and_attributes(rows: List[str]) -> Tuple[dict, dict]:
         trackId, _, frame, _, _ = row_info(row)
 
         if trackId not in tracks:
-            tracks[trackId] = Track(begin=frame, end=frame, trackId=trackId)
+            tracks[trackId] = track_json(begin=frame, end=frame, trackId=trackId)
 
         track = tracks[trackId]
-        track.begin = min(frame, track.begin)
-        track.end = max(track.end, frame)
-        track.features.append(feature)
-        track.confidencePairs = confidence_pairs
+        track['begin'] = min(frame, track['begin'])
+        track['end'] = max(track['end'], frame)
+        track['features'].append(feature)
+        track['confidencePairs'] = confidence_pairs
 
         for (key, val) in track_attributes.items():
-            track.attributes[key] = val
+            track['attributes'][key] = val
             create_attributes(metadata_attributes, test_vals, 'track', key, val)
         for (key, val) in attributes.items():
             create_attributes(metadata_attributes, test_vals, 'detection', key, val)
+
+    if strict:
+        tracks = {trackId: Track(**t).dict(exclude_none=True) for trackId, t in tracks.items()}
+    return tracks, metadata_attributes, test_vals
+
+
+def load_csv_as_tracks_and_attributes(rows: Iterable[str], strict=False) -> Tuple[dict, dict]:
+    """
+    Convert VIAME CSV to json tracks.
+    Expect detections to be in increasing order (either globally or by track).
+
+    :param rows: lines of the CSV file. May be a lazy iterable so that large files
+        are never held in memory in their entirety.
+
+    :param strict: validate every track against the Track model rather than trusting
+        the types produced by the row parser
+    """
+    tracks, metadata_attributes, test_vals = _load_csv_rows(rows, strict=strict)
     # Now we process all the metadata_attributes for the types
     calculate_attribute_types(metadata_attributes, test_vals)
+    return tracks, metadata_attributes
+
+
+def _csv_byte_ranges(path: str, count: int) -> List[Tuple[int, int]]:
+    """Split a file into at most count [start, end) byte ranges that end on a newline"""
+    size = os.path.getsize(path)
+    offsets = [0]
+    with open(path, 'rb') as fh:
+        for i in range(1, count):
+            fh.seek(max(size * i // count, offsets[-1]))
+            fh.readline()
+            offset = fh.tell()
+            if offset >= size:
+                break
+            if offset > offsets[-1]:
+                offsets.append(offset)
+    return list(zip(offsets, offsets[1:] + [size]))
+
+
+def _load_csv_byte_range(path: str, start: int, end: int, strict: bool) -> Tuple[dict, dict, dict]:
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        rows = fh.read(end - start).decode("utf-8").splitlines()
+    return _load_csv_rows(rows, strict=strict)
+
+
+def _merge_partial_tracks(tracks: dict, partial: dict):
+    """Merge json tracks parsed from a later part of the file into tracks"""
+    for trackId, track in partial.items():
+        if trackId not in tracks:
+            tracks[trackId] = track
+            continue
+        merged = tracks[trackId]
+        merged['begin'] = min(merged['begin'], track['begin'])
+        merged['end'] = max(merged['end'], track['end'])
+        merged['features'].extend(track['features'])
+        merged['confidencePairs'] = track['confidencePairs']
+        merged['attributes'].update(track['attributes'])
+
+
+def _merge_partial_attributes(
+    metadata_attributes: Dict[str, Dict[str, Any]],
+    test_vals: Dict[str, AttributeValueCounter],
+    partial_metadata_attributes: Dict[str, Dict[str, Any]],
+    partial_test_vals: Dict[str, AttributeValueCounter],
+):
+    for attribute_key, attribute in partial_metadata_attributes.items():
+        metadata_attributes.setdefault(attribute_key, attribute)
+    for attribute_key, counter in partial_test_vals.items():
+        if attribute_key in test_vals:
+            test_vals[attribute_key].merge(counter)
+        else:
+            test_vals[attribute_key] = counter
 
-    track_json = {trackId: track.dict(exclude_none=True) for trackId, track in tracks.items()}
-    return track_json, metadata_attributes
+
+_csvPool: Optional[ProcessPoolExecutor] = None
+_csvPoolLock = threading.Lock()
+
+
+def _csv_pool() -> ProcessPoolExecutor:
+    """
+    The process pool shared by every parallel import.  Workers are spawned rather
+    than forked, since a fork of the multithreaded server can inherit locks held by
+    its other threads, and they are kept so only the first import pays their startup.
+    """
+    global _csvPool
+    with _csvPoolLock:
+        if _csvPool is None:
+            _csvPool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _csvPool
+
+
+def load_csv_file_as_tracks_and_attributes(
+    path: str,
+    processes: Optional[int] = None,
+    min_range_bytes: int = 8 * 1024 * 1024,
+    min_parallel_bytes: int = 64 * 1024 * 1024,
+    strict=False,
+) -> Tuple[dict, dict]:
+    """
+    Convert a VIAME CSV on local disk to json tracks, parsing it in parallel.
+
+    The file is split into line-aligned byte ranges which are parsed in a process pool.
+    Partial tracks are merged by trackId in file order, so the result is identical
+    to load_csv_as_tracks_and_attributes on the same file.
+
+    :param processes: size of the process pool, defaults to the number of CPUs
+
+    :param min_range_bytes: smallest byte range worth handing to a process.
+        Files smaller than two ranges are parsed serially.
+
+    :param min_parallel_bytes: files smaller than this are parsed serially, since
+        handing them to the pool costs more than it saves
+
+    :param strict: see load_csv_as_tracks_and_attributes
+    """
+    processes = processes or os.cpu_count() or 1
+    size = os.path.getsize(path)
+    count = min(processes, size // min_range_bytes)
+    if count < 2 or size < min_parallel_bytes:
+        with open(path, 'rb') as fh:
+            return load_csv_as_tracks_and_attributes(
+                iterLines(iter(lambda: fh.read(65536), b'')), strict=strict
+            )
+
+    ranges = _csv_byte_ranges(path, count)
+    tracks: Dict[int, dict] = {}
+    metadata_attributes: Dict[str, Dict[str, Any]] = {}
+    test_vals: Dict[str, AttributeValueCounter] = {}
+    partials = _csv_pool().map(
+        _load_csv_byte_range,
+        [path] * len(ranges),
+        [start for start, _ in ranges],
+        [end for _, end in ranges],
+        [strict] * len(ranges),
+    )
+    for partial_tracks, partial_metadata_attributes, partial_test_vals in partials:
+        _merge_partial_tracks(tracks, partial_tracks)
+        _merge_partial_attributes(
+            metadata_attributes, test_vals, partial_metadata_attributes, partial_test_vals
+        )
+    calculate_attribute_types(metadata_attributes, test_vals)
+    return tracks, metadata_attributes
+
+
+def _track_rows(
+    track: Dict[str, Any],
+    confidence_pairs: List[List[Any]],
+    filenames: Optional[List[str]],
+    fps: Optional[Union[int, float]],
+    timestamps: Dict[int, str],
+) -> Generator[Tuple[int, List[Any]], None, None]:
+    """
+    Lazily generate the (frame, columns) rows of one track in frame order,
+    interpolating each span only when the stream reaches it
+    """
+    track_features = track.get('features', [])
+    track_attributes = track.get('attributes')
+
+    for index, keyframe in enumerate(track_features):
+        features = [keyframe]
+
+        # If this is not the last keyframe, and interpolation is
+        # enabled for this keyframe, interpolate
+        if keyframe.get('interpolate') and index < len(track_features) - 1:
+            nextKeyframe = track_features[index + 1]
+            # interpolate all features in [a,b)
+            features = interpolate_json(keyframe, nextKeyframe)
+
+        for feature in features:
+            frame = feature['frame']
+            columns = [
+                track['trackId'],
+                "",
+                frame,
+                *feature['bounds'],
+                confidence_pairs[0][1],
+                feature.get('fishLength') or -1,
+            ]
+
+            # If FPS is set, column 2 will be video timestamp
+            if fps is not None and fps > 0:
+                if frame not in timestamps:
+                    timestamps[frame] = format_timestamp(fps, frame)
+                columns[1] = timestamps[frame]
+            # else if filenames is set, column 2 will be image file name
+            elif filenames and frame < len(filenames):
+                columns[1] = filenames[frame]
+
+            for pair in confidence_pairs:
+                columns.extend(list(pair))
+
+            feature_attributes = feature.get('attributes')
+            if feature_attributes:
+                for key, val in feature_attributes.items():
+                    columns.append(f"(atr) {key} {valueToString(val)}")
+
+            if track_attributes:
+                for key, val in track_attributes.items():
+                    columns.append(f"(trk-atr) {key} {valueToString(val)}")
+
+            geometry = feature.get('geometry')
+            if geometry and "FeatureCollection" == geometry['type']:
+                for geoJSONFeature in geometry['features']:
+                    geoJSONType = geoJSONFeature['geometry']['type']
+                    if 'Polygon' == geoJSONType:
+                        # Coordinates need to be flattened out from their list of tuples
+                        coordinates = [
+                            item
+                            for sublist in geoJSONFeature['geometry']['coordinates'][0]
+                            for item in sublist
+                        ]
+                        columns.append(
+                            f"(poly) {' '.join(map(lambda x: str(round(x)), coordinates))}"
+                        )
+                    if 'Point' == geoJSONType:
+                        coordinates = geoJSONFeature['geometry']['coordinates']
+                        columns.append(
+                            f"(kp) {geoJSONFeature['properties']['key']} "
+                            f"{round(coordinates[0])} {round(coordinates[1])}"
+                        )
+                    # TODO: support for multiple GeoJSON Objects of the same type
+                    # once the CSV supports it
+
+            yield frame, columns
+
+
+def _merge_track_rows(
+    streams: List[Tuple[int, Generator[Tuple[int, List[Any]], None, None]]]
+) -> Generator[List[Any], None, None]:
+    """
+    K-way merge of per-track row streams into frame order.
+
+    Streams are only started once the merge reaches the frame they begin on,
+    so the heap holds one pending row per active track rather than every row.
+    Rows that share a frame keep the order of their streams.
+
+    :param streams: (first frame, row stream) pairs
+    """
+    pending = sorted(
+        ((start, order, stream) for order, (start, stream) in enumerate(streams)),
+        key=lambda entry: (entry[0], entry[1]),
+    )
+    heap: List[Tuple[int, int, List[Any], Generator]] = []
+    next_pending = 0
+    while heap or next_pending < len(pending):
+        while next_pending < len(pending) and (not heap or pending[next_pending][0] <= heap[0][0]):
+            _, order, stream = pending[next_pending]
+            next_pending += 1
+            row = next(stream, None)
+            if row is not None:
+                heapq.heappush(heap, (row[0], order, row[1], stream))
+        if not heap:
+            continue
+        _, order, columns, stream = heap[0]
+        row = next(stream, None)
+        if row is None:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (row[0], order, row[1], stream))
+        yield columns
 
 
 def export_tracks_as_csv(
@@ -281,6 +621,9 @@ def export_tracks_as_csv(
     fps=None,
     header=True,
     typeFilter=None,
+    strict=False,
+    bufferSize=65536,
+    sortBy='track',
 ) -> Generator[str, None, None]:
     """
     Export track json to a CSV format.
@@ -296,11 +639,23 @@ def export_tracks_as_csv(
     :param header: include or omit header
 
     :param typeFilter: set of track types to only export if not empty
+
+    :param strict: validate every track against the Track model before export,
+        for track json that did not come from a validated save
+
+    :param bufferSize: accumulate rows until at least this many characters are ready
+        before yielding them, to keep the number of writes to the response down
+
+    :param sortBy: 'track' to group rows by track, or 'frame' to order rows by frame
     """
+    if sortBy not in ('track', 'frame'):
+        raise ValueError(f"Cannot sort CSV export by {sortBy}")
     if thresholds is None:
         thresholds = {}
     if typeFilter is None:
         typeFilter = set()
+    # format_timestamp is slow, and neighboring tracks share most of their frames
+    timestamps: Dict[int, str] = {}
 
     csvFile = io.StringIO()
     writer = csv.writer(csvFile)
@@ -309,85 +664,42 @@ def export_tracks_as_csv(
         if fps is not None:
             metadata["fps"] = fps
         writeHeader(writer, metadata)
+
+    streams = []
     for t in track_dict.values():
-        track = Track(**t)
-        if (not excludeBelowThreshold) or track.exceeds_thresholds(thresholds):
+        # Tracks are validated when they are saved or imported
+        track = Track(**t).dict(exclude_none=True) if strict else t
+        trackConfidencePairs = track.get('confidencePairs', [])
+        if (not excludeBelowThreshold) or exceeds_thresholds(trackConfidencePairs, thresholds):
 
             # filter by types if applicable
             if typeFilter:
-                confidence_pairs = [item for item in track.confidencePairs if item[0] in typeFilter]
+                confidence_pairs = [item for item in trackConfidencePairs if item[0] in typeFilter]
                 # skip line if no confidence pairs
                 if not confidence_pairs:
                     continue
             else:
-                confidence_pairs = track.confidencePairs
+                confidence_pairs = trackConfidencePairs
 
             sorted_confidence_pairs = sorted(
                 confidence_pairs, key=lambda item: item[1], reverse=True
             )
-
-            for index, keyframe in enumerate(track.features):
-                features = [keyframe]
-
-                # If this is not the last keyframe, and interpolation is
-                # enabled for this keyframe, interpolate
-                if keyframe.interpolate and index < len(track.features) - 1:
-                    nextKeyframe = track.features[index + 1]
-                    # interpolate all features in [a,b)
-                    features = interpolate(keyframe, nextKeyframe)
-
-                for feature in features:
-                    columns = [
-                        track.trackId,
-                        "",
-                        feature.frame,
-                        *feature.bounds,
-                        sorted_confidence_pairs[0][1],
-                        feature.fishLength or -1,
-                    ]
-
-                    # If FPS is set, column 2 will be video timestamp
-                    if fps is not None and fps > 0:
-                        columns[1] = format_timestamp(fps, feature.frame)
-                    # else if filenames is set, column 2 will be image file name
-                    elif filenames and feature.frame < len(filenames):
-                        columns[1] = filenames[feature.frame]
-
-                    for pair in sorted_confidence_pairs:
-                        columns.extend(list(pair))
-
-                    if feature.attributes:
-                        for key, val in feature.attributes.items():
-                            columns.append(f"(atr) {key} {valueToString(val)}")
-
-                    if track.attributes:
-                        for key, val in track.attributes.items():
-                            columns.append(f"(trk-atr) {key} {valueToString(val)}")
-
-                    if feature.geometry and "FeatureCollection" == feature.geometry.type:
-                        for geoJSONFeature in feature.geometry.features:
-                            if 'Polygon' == geoJSONFeature.geometry.type:
-                                # Coordinates need to be flattened out from their list of tuples
-                                coordinates = [
-                                    item
-                                    for sublist in geoJSONFeature.geometry.coordinates[
-                                        0
-                                    ]  # type: ignore
-                                    for item in sublist  # type: ignore
-                                ]
-                                columns.append(
-                                    f"(poly) {' '.join(map(lambda x: str(round(x)), coordinates))}"
-                                )
-                            if 'Point' == geoJSONFeature.geometry.type:
-                                coordinates = geoJSONFeature.geometry.coordinates  # type: ignore
-                                columns.append(
-                                    f"(kp) {geoJSONFeature.properties['key']} "
-                                    f"{round(coordinates[0])} {round(coordinates[1])}"
-                                )
-                            # TODO: support for multiple GeoJSON Objects of the same type
-                            # once the CSV supports it
-
-                    writer.writerow(columns)
-                    yield csvFile.getvalue()
-                    csvFile.seek(0)
-                    csvFile.truncate(0)
+            track_features = track.get('features', [])
+            if not track_features:
+                continue
+            stream = _track_rows(track, sorted_confidence_pairs, filenames, fps, timestamps)
+            streams.append((track_features[0]['frame'], stream))
+
+    if sortBy == 'frame':
+        rows: Iterable[List[Any]] = _merge_track_rows(streams)
+    else:
+        rows = (columns for _, stream in streams for _, columns in stream)
+
+    for columns in rows:
+        writer.writerow(columns)
+        if csvFile.tell() >= bufferSize:
+            yield csvFile.getvalue()
+            csvFile.seek(0)
+            csvFile.truncate(0)
+    if csvFile.tell():
+        yield csvFile.getvalue()
@@ -0,0 +1,114 @@
+import json
+from typing import Any, Dict, Generator, Iterable, List, Optional
+
+from bson.objectid import ObjectId
+from girder.models.model_base import Model
+import pymongo
+from pymongo.cursor import Cursor
+
+from dive_utils.types import GirderModel
+
+
+def top_type(track: Dict[str, Any]) -> Optional[str]:
+    """The type of a track's highest confidence pair"""
+    confidencePairs = track.get('confidencePairs') or []
+    if not confidencePairs:
+        return None
+    return max(confidencePairs, key=lambda pair: pair[1])[0]
+
+
+class TrackItem(Model):
+    """
+    One document per track of a dataset, for datasets whose annotations are
+    too large to rewrite as a single detection file on every save.
+    """
+
+    def initialize(self):
+        self.name = "track"
+        self.ensureIndices(
+            [
+                (
+                    [("datasetId", pymongo.ASCENDING), ("trackId", pymongo.ASCENDING)],
+                    {"unique": True},
+                ),
+                ([("datasetId", pymongo.ASCENDING), ("begin", pymongo.ASCENDING)], {}),
+                ([("datasetId", pymongo.ASCENDING), ("end", pymongo.ASCENDING)], {}),
+                ([("datasetId", pymongo.ASCENDING), ("type", pymongo.ASCENDING)], {}),
+            ]
+        )
+
+    def validate(self, doc):
+        return doc
+
+    def document(self, datasetId: Any, track: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "datasetId": datasetId,
+            "trackId": int(track["trackId"]),
+            "begin": track.get("begin"),
+            "end": track.get("end"),
+            "type": top_type(track),
+            # Attribute keys are user-defined and may contain "." or "$",
+            # which cannot be used as field names, so the track is kept serialized
+            "track": json.dumps(track),
+        }
+
+    def findTracks(self, dataset: GirderModel, query: Optional[dict] = None, **kwargs) -> Cursor:
+        """Tracks of a dataset in trackId order, optionally narrowed by query"""
+        return self.find(
+            {**(query or {}), "datasetId": dataset["_id"]},
+            sort=[("trackId", pymongo.ASCENDING)],
+            **kwargs,
+        )
+
+    def trackDict(self, dataset: GirderModel) -> Dict[str, dict]:
+        """Tracks of a dataset in the shape of a detection file"""
+        return {
+            str(doc["trackId"]): json.loads(doc["track"])
+            for doc in self.findTracks(dataset, fields=["trackId", "track"])
+        }
+
+    def jsonGenerator(self, dataset: GirderModel) -> Generator[str, None, None]:
+        """Stream the tracks of a dataset as a detection file without loading all of them"""
+        yield "{"
+        separator = ""
+        for doc in self.findTracks(dataset, fields=["trackId", "track"]):
+            yield f'{separator}"{doc["trackId"]}": {doc["track"]}'
+            separator = ", "
+        yield "}"
+
+    def upsert(self, dataset: GirderModel, tracks: Iterable[Dict[str, Any]]):
+        requests = [
+            pymongo.ReplaceOne(
+                {"datasetId": dataset["_id"], "trackId": int(track["trackId"])},
+                self.document(dataset["_id"], track),
+                upsert=True,
+            )
+            for track in tracks
+        ]
+        if requests:
+            self.collection.bulk_write(requests, ordered=False)
+
+    def delete(self, dataset: GirderModel, trackIds: List[Any]):
+        if trackIds:
+            self.collection.delete_many(
+                {"datasetId": dataset["_id"], "trackId": {"$in": [int(i) for i in trackIds]}}
+            )
+
+    def replace(self, dataset: GirderModel, tracks: Dict[str, dict]):
+        """Replace every track of a dataset"""
+        self.collection.delete_many({"datasetId": dataset["_id"]})
+        if tracks:
+            self.collection.insert_many(
+                [self.document(dataset["_id"], track) for track in tracks.values()]
+            )
+
+    def copy(self, source: GirderModel, destination: GirderModel):
+        self.collection.delete_many({"datasetId": destination["_id"]})
+        batch = []
+        for doc in self.findTracks(source):
+            batch.append({**doc, "_id": ObjectId(), "datasetId": destination["_id"]})
+            if len(batch) >= 1000:
+                self.collection.insert_many(batch)
+                batch = []
+        if batch:
+            self.collection.insert_many(batch)
@@ -1,11 +1,9 @@
-from girder.models.assetstore import Assetstore
 from girder.models.file import File
 from girder.models.folder import Folder
 from girder.models.item import Item
-from girder.models.upload import Upload
 from girder.models.user import User
 
-from dive_server.utils import get_annotation_csv_generator
+from dive_server.utils import get_annotation_csv_file
 from dive_utils.constants import ViameDataFolderName
 from dive_utils.types import GirderModel
 
@@ -43,16 +41,8 @@ def ensure_csv_detections_file(folder: Folder, detection_item: Item, user: User)
     TODO: move this to the training job code instead of keeping it
     in the request thread
     """
-    filename, gen = get_annotation_csv_generator(folder, user, excludeBelowThreshold=True)
-    csv_bytes = ("".join([line for line in gen()])).encode()
-    new_file = File().createFile(
-        user,
-        detection_item,
-        filename,
-        len(csv_bytes),
-        Assetstore().getCurrent(),
-        reuseExisting=True,
-    )
-    upload = Upload().createUploadToFile(new_file, user, len(csv_bytes))
-    new_file = Upload().handleChunk(upload, csv_bytes)
-    return new_file
+    csv_file = get_annotation_csv_file(folder, user, excludeBelowThreshold=True)
+    for existing in File().find({'itemId': detection_item['_id'], 'name': csv_file['name']}):
+        File().remove(existing)
+    # The copy shares the cached export's stored data rather than duplicating it
+    return File().copyFile(csv_file, user, item=detection_item)
@@ -1,40 +1,77 @@
 from datetime import datetime
-import functools
+import hashlib
 import io
 import json
 import os
 from pathlib import Path
-from typing import Callable, Dict, Generator, List, Optional, Tuple, Type
+import tempfile
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, Tuple, Type, cast
 
+from bson.objectid import ObjectId
+import cherrypy
+from girder import events
+from girder.api.rest import setResponseHeader
 from girder.constants import AccessType
-from girder.exceptions import RestException
+from girder.exceptions import FilePathException, RestException
 from girder.models.file import File
 from girder.models.folder import Folder
 from girder.models.item import Item
-from girder.models.model_base import AccessControlledModel
+from girder.models.model_base import AccessControlledModel, Model
 from girder.models.upload import Upload
+from girder.models.user import User
 from pydantic.main import BaseModel
 import pymongo
 from pymongo.cursor import Cursor
 
 from dive_server.serializers import kwcoco, viame
-from dive_utils import asbool, fromMeta, models, strNumericCompare
+from dive_server.track_item import TrackItem
+from dive_utils import asbool, fromMeta, iterLines, models, natural_sort_key, natural_sort_string
+from dive_utils.cache import SizedLRUCache
+from dive_utils.columnar import TrackColumns
+from dive_utils.compression import compress_blocks, iter_byte_ranges, iter_gunzip, read_block_range
 from dive_utils.constants import (
+    CloneAncestorsMarker,
+    CloneRootMarker,
+    ColumnarMimeType,
     ConfidenceFiltersMarker,
+    CsvExportCacheMarker,
     DatasetMarker,
+    DatasetStatsMarker,
+    DetectionDeltaMarker,
+    DetectionDeltaMimeType,
+    DetectionFileMarker,
+    DetectionItemMarker,
     DetectionMarker,
     ForeignMediaIdMarker,
     FPSMarker,
+    FrameManifestBuildMarker,
+    FrameManifestMarker,
     ImageSequenceType,
+    IntervalIndexMimeType,
+    NaturalSortKeyField,
     PublishedMarker,
+    SnapshotHashMarker,
+    TrackItemStorage,
+    TrackRevisionMarker,
+    TrackStorageMarker,
     TypeMarker,
     VideoType,
     csvRegex,
     jsonRegex,
     safeImageRegex,
 )
+from dive_utils.intervals import build_interval_index, query_interval_index
+from dive_utils.retention import revisions_to_remove
+from dive_utils.stats import track_stats, update_track_stats
 from dive_utils.types import GirderModel
 
+# Parsed detection files by file id, sized by the length of their track json
+trackDataCache = SizedLRUCache(int(os.getenv("DIVE_TRACK_CACHE_BYTES", 256 * 1024 * 1024)))
+# Parsed interval indexes by index file id, sized by the length of their json
+intervalIndexCache = SizedLRUCache(
+    int(os.getenv("DIVE_INTERVAL_INDEX_CACHE_BYTES", 64 * 1024 * 1024))
+)
+
 
 class PydanticModel(AccessControlledModel):
     schema: Type[BaseModel]
@@ -57,9 +94,58 @@ def all_detections_items(folder: Folder) -> Cursor:
     return Item().find({f"meta.{DetectionMarker}": str(folder['_id'])}).sort([("created", -1)])
 
 
+def detection_item_file(item: GirderModel) -> Optional[GirderModel]:
+    """
+    The detection file of a detection item, rather than one of the files derived from it,
+    such as the csv attached for training
+    """
+    derived = [IntervalIndexMimeType, ColumnarMimeType, 'text/csv']
+    return File().findOne({'itemId': item['_id'], 'mimeType': {'$nin': derived}})
+
+
+def setCurrentDetections(
+    folder: GirderModel, item: Optional[GirderModel], file: Optional[GirderModel]
+):
+    """Point a dataset at its current detection item and file in a single update"""
+    pointer = {
+        DetectionItemMarker: str(item['_id']) if item is not None else None,
+        DetectionFileMarker: str(file['_id']) if file is not None else None,
+    }
+    Folder().update(
+        {'_id': folder['_id']},
+        {'$set': {f'meta.{key}': value for key, value in pointer.items()}},
+        multi=False,
+    )
+    folder.setdefault('meta', {}).update(pointer)
+
+
+def forgetCurrentDetections(folderId: ObjectId):
+    """Make the next lookup of a dataset's detections find them with a query"""
+    Folder().update(
+        {'_id': folderId},
+        {'$unset': {f'meta.{DetectionItemMarker}': True, f'meta.{DetectionFileMarker}': True}},
+        multi=False,
+    )
+
+
+def refreshCurrentDetections(folder: GirderModel) -> Optional[GirderModel]:
+    """Find the newest detection item of a dataset, and point the dataset at it"""
+    item = next(all_detections_items(folder), None)
+    if item is not None or fromMeta(folder, DetectionItemMarker):
+        setCurrentDetections(folder, item, detection_item_file(item) if item is not None else None)
+    return item
+
+
 def detections_item(folder: Folder, strict=False) -> Optional[GirderModel]:
-    all_items = all_detections_items(folder)
-    first_item = next(all_items, None)
+    first_item = None
+    itemId = fromMeta(folder, DetectionItemMarker)
+    if itemId:
+        first_item = Item().load(itemId, force=True)
+        # Clones start out with the pointer of their source
+        if first_item is not None and fromMeta(first_item, DetectionMarker) != str(folder['_id']):
+            first_item = None
+    if first_item is None:
+        first_item = refreshCurrentDetections(folder)
     if first_item is None and strict:
         raise RestException(f"No detections for folder {folder['name']}")
     return first_item
@@ -69,12 +155,186 @@ def detections_file(folder: Folder, strict=False) -> Optional[GirderModel]:
     item = detections_item(folder, strict)
     if item is None and not strict:
         return None
-    first_file = next(Item().childFiles(item), None)
+    # detections_item raises instead of returning None when strict
+    item = cast(GirderModel, item)
+    first_file = None
+    fileId = fromMeta(folder, DetectionFileMarker)
+    if fileId:
+        first_file = File().load(fileId, force=True)
+    if first_file is None or first_file['itemId'] != item['_id']:
+        first_file = detection_item_file(item)
+        if first_file is not None:
+            setCurrentDetections(folder, item, first_file)
     if first_file is None and strict:
         raise RestException(f"No file associated with detection item {item}")
     return first_file
 
 
+def usesTrackItems(folder: GirderModel) -> bool:
+    """Whether a dataset stores its tracks as TrackItem documents rather than a detection file"""
+    return fromMeta(folder, TrackStorageMarker) == TrackItemStorage
+
+
+def getFolderTrackData(folder: GirderModel) -> Dict[str, dict]:
+    """Current tracks of a dataset, from whichever storage it uses"""
+    if usesTrackItems(folder):
+        return TrackItem().trackDict(folder)
+    return getTrackData(detections_file(folder))
+
+
+def getFolderTrackColumns(folder: GirderModel) -> Optional[TrackColumns]:
+    """
+    Tracks of a dataset as memory-mapped columns, when its detection file has
+    an up to date columnar sidecar
+    """
+    if usesTrackItems(folder):
+        return None
+    file = detections_file(folder)
+    if file is None or latest_detection_delta(file) is not None:
+        return None
+    columns_file = File().findOne(
+        {'itemId': cast(dict, file)['itemId'], 'mimeType': ColumnarMimeType}
+    )
+    if columns_file is None:
+        return None
+    try:
+        return TrackColumns.load(File().getLocalFilePath(columns_file))
+    except FilePathException:
+        pass
+    # Remote assetstores are copied down first, the mapping outlives the unlinked copy
+    with tempfile.NamedTemporaryFile(suffix='.columns') as fh:
+        for chunk in File().download(columns_file, headers=False)():
+            fh.write(chunk)
+        fh.flush()
+        return TrackColumns.load(fh.name)
+
+
+def readIndexedTrack(fh, index: dict, position: int) -> dict:
+    """Read one track of an open detection file from the byte range its index records"""
+    _, _, offset, length = index['tracks'][position]
+    if 'blocks' in index:
+        return json.loads(read_block_range(fh, index['blocks'], offset, length))
+    fh.seek(offset)
+    return json.loads(fh.read(length))
+
+
+def getTrackDataInWindow(folder: GirderModel, frameStart: int, frameEnd: int) -> Dict[str, dict]:
+    """
+    Tracks of a dataset that overlap the frames in [frameStart, frameEnd],
+    with their features trimmed to the window
+    """
+
+    def overlaps(track: dict) -> bool:
+        return track['begin'] <= frameEnd and track['end'] >= frameStart
+
+    if usesTrackItems(folder):
+        tracks = {
+            str(doc['trackId']): json.loads(doc['track'])
+            for doc in TrackItem().findTracks(
+                folder,
+                {'begin': {'$lte': frameEnd}, 'end': {'$gte': frameStart}},
+                fields=['trackId', 'track'],
+            )
+        }
+    else:
+        file = detections_file(folder)
+        index = detections_interval_index(file) if file is not None else None
+        if file is None or index is None:
+            tracks = {key: track for key, track in getTrackData(file).items() if overlaps(track)}
+        else:
+            tracks = {}
+            with File().open(file) as fh:
+                for i in query_interval_index(index['tree'], index['tracks'], frameStart, frameEnd):
+                    track = readIndexedTrack(fh, index, i)
+                    tracks[str(track['trackId'])] = track
+            for delta_item in detection_deltas(file):
+                for delta_file in Item().childFiles(delta_item):
+                    with File().open(delta_file) as fh:
+                        delta = json.load(fh)
+                    applyTrackDelta(
+                        tracks,
+                        {
+                            # Tracks moved out of the window are dropped along with deleted ones
+                            'delete': delta.get('delete', [])
+                            + [t['trackId'] for t in delta.get('upsert', []) if not overlaps(t)],
+                            'upsert': [t for t in delta.get('upsert', []) if overlaps(t)],
+                        },
+                    )
+    return {
+        key: models.trim_track_json(track, frameStart, frameEnd) for key, track in tracks.items()
+    }
+
+
+def annotation_revision(folder: GirderModel) -> str:
+    """Identify the current state of a dataset's tracks"""
+    if usesTrackItems(folder):
+        return f"{TrackItemStorage}_{fromMeta(folder, TrackRevisionMarker)}"
+    return detections_revision(cast(GirderModel, detections_file(folder, strict=True)))
+
+
+def conditionalResponse(*state):
+    """
+    Tag the response with a strong ETag derived from the state it was built from,
+    and answer 304 Not Modified if the client already holds that version.
+    Clients may store the response, but must revalidate it before each use.
+    """
+    etag = f'"{hashlib.sha1(json.dumps(state, default=str).encode()).hexdigest()}"'
+    setResponseHeader('ETag', etag)
+    setResponseHeader('Cache-Control', 'private, no-cache')
+    ifNoneMatch = cherrypy.request.headers.get('If-None-Match')
+    if ifNoneMatch:
+        # If-None-Match uses weak comparison
+        tags = [tag.strip() for tag in ifNoneMatch.split(',')]
+        if '*' in tags or etag in tags or f'W/{etag}' in tags:
+            raise cherrypy.HTTPRedirect([], 304)
+
+
+def indexUsage(models: List[Model]) -> Dict[str, List[dict]]:
+    """How often each index of the given models' collections has been used since it was loaded"""
+    return {
+        model.name: [
+            {
+                'name': stats['name'],
+                'key': dict(stats['key']),
+                'accesses': stats['accesses']['ops'],
+                'since': stats['accesses']['since'],
+            }
+            for stats in model.collection.aggregate([{'$indexStats': {}}])
+        ]
+        for model in models
+    }
+
+
+def slowQueries(slowMs: int, limit: int) -> dict:
+    """
+    The most recent slow operations recorded by the database profiler,
+    which only records them while profiling is enabled
+    """
+    database = Item().collection.database
+    profile = database.command('profile', -1)
+    fields = [
+        'ts',
+        'ns',
+        'op',
+        'millis',
+        'planSummary',
+        'keysExamined',
+        'docsExamined',
+        'nreturned',
+    ]
+    queries = database['system.profile'].find(
+        {'millis': {'$gte': slowMs}},
+        projection={'_id': False, **dict.fromkeys(fields, True)},
+        sort=[('ts', pymongo.DESCENDING)],
+        limit=limit,
+    )
+    return {
+        'profilingLevel': profile['was'],
+        'profilingSlowMs': profile.get('slowms'),
+        'queries': list(queries),
+    }
+
+
 def get_static_pipelines_path() -> Path:
     pipeline_path = None
 
@@ -102,27 +362,213 @@ def move_existing_result_to_auxiliary_folder(folder, user):
         Item().move(item, auxiliary)
 
 
+def clear_annotation_csv_cache(folder, user):
+    """Remove cached CSV exports, which are stale once the annotations change"""
+    auxiliary = get_or_create_auxiliary_folder(folder, user)
+    for item in Item().find(
+        {'folderId': auxiliary['_id'], f'meta.{CsvExportCacheMarker}': {'$exists': True}}
+    ):
+        Item().remove(item)
+
+
 def itemIsWebsafeVideo(item: Item) -> bool:
     return fromMeta(item, "codec") == "h264"
 
 
+def detection_deltas(file: GirderModel) -> Cursor:
+    """Revisions saved on top of a detection snapshot file, oldest first"""
+    return (
+        Item()
+        .find({f"meta.{DetectionDeltaMarker}": str(file['_id'])})
+        .sort([("created", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)])
+    )
+
+
+def latest_detection_delta(file: GirderModel) -> Optional[GirderModel]:
+    return Item().findOne(
+        {f"meta.{DetectionDeltaMarker}": str(file['_id'])},
+        sort=[("created", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)],
+    )
+
+
+def detections_revision(file: GirderModel) -> str:
+    """Identify the current state of a detection snapshot and its revision log"""
+    latest_delta = latest_detection_delta(file)
+    if latest_delta is None:
+        return str(file['_id'])
+    return f"{file['_id']}_{latest_delta['_id']}"
+
+
+def detections_interval_index(file) -> Optional[dict]:
+    """
+    The interval index saved next to a detection snapshot file, if it has one.
+    Index files are never rewritten, so each is parsed once and shared between
+    callers, which must not modify it.
+    """
+    index_file = File().findOne({'itemId': file['itemId'], 'mimeType': IntervalIndexMimeType})
+    if index_file is None:
+        return None
+    index = intervalIndexCache.get(str(index_file['_id']))
+    if index is None:
+        with File().open(index_file) as fh:
+            index = json.load(fh)
+        intervalIndexCache.put(str(index_file['_id']), index, index_file['size'])
+    return index
+
+
+def serializeTracks(tracks: Dict[str, dict]) -> Tuple[bytes, List[list]]:
+    """
+    Serialize tracks to the same bytes as json.dumps, recording the
+    [begin, end, byte offset, byte length] of every track within them
+    """
+    buffer = io.BytesIO()
+    entries: List[list] = []
+    buffer.write(b"{")
+    for key, track in tracks.items():
+        if entries:
+            buffer.write(b", ")
+        buffer.write(f"{json.dumps(str(key))}: ".encode())
+        track_bytes = json.dumps(track).encode()
+        entries.append([track['begin'], track['end'], buffer.tell(), len(track_bytes)])
+        buffer.write(track_bytes)
+    buffer.write(b"}")
+    return buffer.getvalue(), entries
+
+
+def applyTrackDelta(tracks: Dict[str, dict], delta: dict):
+    for track_id in delta.get('delete', []):
+        tracks.pop(str(track_id), None)
+    for track in delta.get('upsert', []):
+        tracks[str(track['trackId'])] = track
+
+
+def isGzipped(file: GirderModel) -> bool:
+    """Detection snapshots are stored gzipped, under a name ending in .gz"""
+    return file['exts'][-1:] == ['gz']
+
+
 def getTrackData(file: Optional[File]) -> Dict[str, dict]:
+    """
+    Tracks of a detection file with its revisions applied.  Parsed tracks are
+    cached and shared between callers, so the track dicts must not be modified.
+    """
     if file is None:
         return {}
+    latest_delta = latest_detection_delta(file)
+    version = (file.get('updated'), latest_delta['_id'] if latest_delta is not None else None)
+    cached = trackDataCache.get(str(file['_id']), version)
+    if cached is not None:
+        return dict(cached)
     if "csv" in file["exts"]:
+        # Imported CSV detection files are untrusted
         (tracks, attributes) = viame.load_csv_as_tracks_and_attributes(
-            b"".join(list(File().download(file, headers=False)())).decode("utf-8").splitlines()
+            iterLines(File().download(file, headers=False)()), strict=True
         )
-        return tracks
-    return json.loads(b"".join(list(File().download(file, headers=False)())).decode())
+        size = file['size']
+    else:
+        chunks = File().download(file, headers=False)()
+        if isGzipped(file):
+            chunks = iter_gunzip(chunks)
+        data = b"".join(list(chunks))
+        tracks = json.loads(data.decode())
+        size = len(data)
+    for delta_item in detection_deltas(file):
+        for delta_file in Item().childFiles(delta_item):
+            with File().open(delta_file) as fh:
+                applyTrackDelta(tracks, json.load(fh))
+            size += delta_file['size']
+    # Parsed json takes several times the memory of its text, but scales with it
+    trackDataCache.put(str(file['_id']), tracks, size, version)
+    return dict(tracks)
+
+
+def getTrackVersions(file: GirderModel, keys: Iterable[str]) -> List[dict]:
+    """
+    The current versions of some tracks of a detection file, with its revisions
+    applied.  Tracks are read from the byte ranges of the file's index when it
+    records their keys, rather than parsing every track.
+    """
+    keys = set(keys)
+    index = detections_interval_index(file) if 'csv' not in file['exts'] else None
+    if index is None or 'keys' not in index:
+        # Snapshots saved before track keys were indexed have to be parsed whole
+        tracks = getTrackData(file)
+        return [tracks[key] for key in keys if key in tracks]
+    found: Dict[str, dict] = {}
+    with File().open(file) as fh:
+        for position, key in enumerate(index['keys']):
+            if key in keys:
+                found[key] = readIndexedTrack(fh, index, position)
+    for delta_item in detection_deltas(file):
+        for delta_file in Item().childFiles(delta_item):
+            with File().open(delta_file) as fh:
+                delta = json.load(fh)
+            applyTrackDelta(
+                found,
+                {
+                    'delete': delta.get('delete', []),
+                    'upsert': [t for t in delta.get('upsert', []) if str(t['trackId']) in keys],
+                },
+            )
+    return list(found.values())
+
+
+def iterFolderTrackJson(folder: GirderModel) -> Generator[bytes, None, None]:
+    """
+    The current tracks of a dataset serialized one at a time, read incrementally
+    from storage rather than parsed into a single dict
+    """
+    if usesTrackItems(folder):
+        for doc in TrackItem().findTracks(folder, fields=['track']):
+            yield doc['track'].encode()
+        return
+    file = detections_file(folder)
+    if file is None:
+        return
+    index = detections_interval_index(file) if 'csv' not in file['exts'] else None
+    if index is None:
+        # Files saved before track offsets were indexed have to be parsed whole
+        for track in getTrackData(file).values():
+            yield json.dumps(track).encode()
+        return
+    # Tracks replaced or deleted (None) by pending revisions
+    patch: Dict[str, Optional[dict]] = {}
+    for delta_item in detection_deltas(file):
+        for delta_file in Item().childFiles(delta_item):
+            with File().open(delta_file) as fh:
+                delta = json.load(fh)
+            patch.update({str(trackId): None for trackId in delta.get('delete', [])})
+            patch.update({str(track['trackId']): track for track in delta.get('upsert', [])})
+    chunks = File().download(file, headers=False)()
+    if isGzipped(file):
+        chunks = iter_gunzip(chunks)
+    for track_bytes in iter_byte_ranges(chunks, (entry[2:] for entry in index['tracks'])):
+        if patch:
+            trackId = str(json.loads(track_bytes)['trackId'])
+            if trackId in patch:
+                patched = patch.pop(trackId)
+                if patched is not None:
+                    yield json.dumps(patched).encode()
+                continue
+        yield track_bytes
+    for patched in patch.values():
+        if patched is not None:
+            yield json.dumps(patched).encode()
 
 
 def getTrackAndAttributesFromCSV(file: GirderModel) -> Tuple[dict, dict]:
     if file is None:
         return ({}, {})
     if "csv" in file["exts"]:
+        try:
+            # Files on local disk can be split up and parsed in parallel
+            path = File().getLocalFilePath(file)
+        except FilePathException:
+            path = None
+        if path is not None:
+            return viame.load_csv_file_as_tracks_and_attributes(path, strict=True)
         return viame.load_csv_as_tracks_and_attributes(
-            b"".join(list(File().download(file, headers=False)())).decode("utf-8").splitlines()
+            iterLines(File().download(file, headers=False)()), strict=True
         )
     return ({}, {})
 
@@ -134,30 +580,274 @@ def get_track_and_attributes_from_coco(file: GirderModel) -> Tuple[dict, dict, b
         with File().open(file) as fh:
             coco = json.load(fh)
             if kwcoco.is_coco_json(coco):
-                tracks, attributes = kwcoco.load_coco_as_tracks_and_attributes(coco)
+                # Uploaded json is untrusted, so validate it against the models in full
+                tracks, attributes = kwcoco.load_coco_as_tracks_and_attributes(coco, strict=True)
                 return tracks, attributes, True
     return {}, {}, False
 
 
+def setDatasetStats(folder: GirderModel, stats: Dict[str, Any]):
+    """Record the track_stats of a dataset, as of now, for dataset listings"""
+    stats = {**stats, 'modified': datetime.utcnow()}
+    Folder().update(
+        {'_id': folder['_id']},
+        {'$set': {f'meta.{DatasetStatsMarker}': stats}},
+        multi=False,
+    )
+    folder.setdefault('meta', {})[DatasetStatsMarker] = stats
+
+
 def saveTracks(folder, tracks, user):
+    if usesTrackItems(folder):
+        TrackItem().replace(folder, tracks)
+        Folder().setMetadata(folder, {TrackRevisionMarker: str(ObjectId())})
+        setDatasetStats(folder, track_stats(tracks.values()))
+        clear_annotation_csv_cache(folder, user)
+        return
+
     timestamp = datetime.now().strftime("%m-%d-%Y_%H:%M:%S")
     item_name = f"result_{timestamp}.json"
 
+    previous = detections_file(folder)
+    if previous is not None:
+        trackDataCache.invalidate(str(previous['_id']))
     move_existing_result_to_auxiliary_folder(folder, user)
+    clear_annotation_csv_cache(folder, user)
     newResultItem = Item().createItem(item_name, user, folder)
-    Item().setMetadata(newResultItem, {DetectionMarker: str(folder["_id"])}, allowNull=True)
 
-    json_bytes = json.dumps(tracks).encode()
-    byteIO = io.BytesIO(json_bytes)
-    Upload().uploadFromFile(
+    json_bytes, entries = serializeTracks(tracks)
+    content_hash = hashlib.sha512(json_bytes).hexdigest()
+    Item().setMetadata(
+        newResultItem,
+        {DetectionMarker: str(folder["_id"]), SnapshotHashMarker: content_hash},
+        allowNull=True,
+    )
+    duplicate = Item().findOne(
+        {
+            f'meta.{DetectionMarker}': str(folder["_id"]),
+            f'meta.{SnapshotHashMarker}': content_hash,
+            '_id': {'$ne': newResultItem['_id']},
+        }
+    )
+    if duplicate is not None:
+        # An identical revision already exists, so share its stored files
+        for file in Item().childFiles(duplicate):
+            if 'csv' in file['exts']:
+                continue
+            copied = File().copyFile(file, user, item=newResultItem)
+            copied['name'] = item_name + file['name'][len(duplicate['name']) :]
+            File().save(copied)
+        snapshot = detection_item_file(newResultItem)
+    else:
+        snapshot = uploadSnapshotFiles(newResultItem, item_name, tracks, json_bytes, entries, user)
+    # Readers keep getting the previous revision until the new one is complete
+    setCurrentDetections(folder, newResultItem, snapshot)
+    setDatasetStats(folder, track_stats(tracks.values()))
+    applyRevisionRetention(folder)
+
+
+def uploadSnapshotFiles(item, item_name, tracks, json_bytes, entries, user):
+    # Track JSON compresses well, and gzip can be served to clients as is
+    gzip_bytes, blocks = compress_blocks(json_bytes)
+    byteIO = io.BytesIO(gzip_bytes)
+    snapshot = Upload().uploadFromFile(
         byteIO,
+        len(gzip_bytes),
+        f"{item_name}.gz",
+        parentType="item",
+        parent=item,
+        user=user,
+        mimeType="application/json",
+    )
+    # Frame window queries read only the tracks this index points them to
+    index_bytes = json.dumps(
+        {
+            'tracks': entries,
+            'keys': list(tracks.keys()),
+            'blocks': blocks,
+            'tree': build_interval_index(entries),
+        }
+    ).encode()
+    Upload().uploadFromFile(
+        io.BytesIO(index_bytes),
+        len(index_bytes),
+        f"{item_name}.index",
+        parentType="item",
+        parent=item,
+        user=user,
+        mimeType=IntervalIndexMimeType,
+    )
+    # Very large datasets also get columns that exports and summaries can map
+    # instead of parsing the whole detection file
+    feature_count = sum(len(track.get('features', [])) for track in tracks.values())
+    if feature_count >= int(os.getenv('DIVE_COLUMNAR_MIN_FEATURES', 1000000)):
+        with tempfile.TemporaryFile() as fh:
+            TrackColumns.from_tracks(tracks).write(fh)
+            size = fh.tell()
+            fh.seek(0)
+            Upload().uploadFromFile(
+                fh,
+                size,
+                f"{item_name}.columns",
+                parentType="item",
+                parent=item,
+                user=user,
+                mimeType=ColumnarMimeType,
+            )
+    return snapshot
+
+
+def applyRevisionRetention(folder, keepLast=None, thinning=None) -> int:
+    """
+    Remove the past detection revisions of a dataset that fall outside the retention
+    policy, by default DIVE_REVISION_KEEP_LAST and DIVE_REVISION_THINNING
+
+    :returns: the number of revisions removed
+    """
+    if keepLast is None:
+        keepLast = int(os.getenv('DIVE_REVISION_KEEP_LAST', 0))
+    if thinning is None:
+        thinning = os.getenv('DIVE_REVISION_THINNING') or None
+    revisions = list(all_detections_items(folder))
+    removed = 0
+    for position in revisions_to_remove(
+        [(item['created'], fromMeta(item, SnapshotHashMarker)) for item in revisions],
+        keepLast,
+        thinning,
+    ):
+        item = revisions[position]
+        # A snapshot being compacted keeps its revision log until the compaction is done
+        if any(latest_detection_delta(file) is not None for file in Item().childFiles(item)):
+            continue
+        Item().remove(item)
+        removed += 1
+    return removed
+
+
+def saveTrackDelta(folder, upsert: List[dict], delete: List[str], user):
+    """
+    Append a revision to the detection log instead of rewriting every track.
+
+    Once the log grows past DIVE_DELTA_COMPACTION_COUNT revisions or
+    DIVE_DELTA_COMPACTION_BYTES bytes, it is folded into a new snapshot in the background.
+
+    :param upsert: validated tracks to create or replace
+    :param delete: ids of tracks to remove
+    """
+    if usesTrackItems(folder):
+        stats = fromMeta(folder, DatasetStatsMarker)
+        changedIds = [int(i) for i in delete] + [int(track['trackId']) for track in upsert]
+        previous = [
+            json.loads(doc['track'])
+            for doc in TrackItem().findTracks(
+                folder, {'trackId': {'$in': changedIds}}, fields=['track']
+            )
+        ]
+        # Only the changed documents are written
+        TrackItem().delete(folder, delete)
+        TrackItem().upsert(folder, upsert)
+        Folder().setMetadata(folder, {TrackRevisionMarker: str(ObjectId())})
+        if stats is not None:
+            stats = update_track_stats(stats, previous, upsert)
+        setDatasetStats(
+            folder,
+            stats if stats is not None else track_stats(TrackItem().trackDict(folder).values()),
+        )
+        clear_annotation_csv_cache(folder, user)
+        return
+
+    snapshot = detections_file(folder)
+    if snapshot is None:
+        tracks: Dict[str, dict] = {}
+        applyTrackDelta(tracks, {'upsert': upsert, 'delete': delete})
+        saveTracks(folder, tracks, user)
+        return
+
+    # Only the changed tracks are read, unless a removed one bounded the frame range
+    changedKeys = {str(i) for i in delete} | {str(track['trackId']) for track in upsert}
+    stats = fromMeta(folder, DatasetStatsMarker)
+    if stats is not None:
+        stats = update_track_stats(stats, getTrackVersions(snapshot, changedKeys), upsert)
+    if stats is None:
+        tracks = getTrackData(snapshot)
+        applyTrackDelta(tracks, {'upsert': upsert, 'delete': delete})
+        stats = track_stats(tracks.values())
+
+    timestamp = datetime.now().strftime("%m-%d-%Y_%H:%M:%S")
+    item_name = f"delta_{timestamp}.json"
+    auxiliary = get_or_create_auxiliary_folder(folder, user)
+    deltaItem = Item().createItem(item_name, user, auxiliary)
+    json_bytes = json.dumps({'upsert': upsert, 'delete': delete}).encode()
+    Upload().uploadFromFile(
+        io.BytesIO(json_bytes),
         len(json_bytes),
         item_name,
         parentType="item",
-        parent=newResultItem,
+        parent=deltaItem,
         user=user,
-        mimeType="application/json",
+        mimeType=DetectionDeltaMimeType,
+    )
+    # The revision only joins the log once its file is complete, so that a compaction
+    # never folds and removes it before it can be read
+    Item().setMetadata(deltaItem, {DetectionDeltaMarker: str(snapshot["_id"])})
+    # A compaction that moved the log onto a new snapshot in the meantime may have
+    # re-keyed the log before this revision joined it
+    current = detections_file(Folder().load(folder['_id'], force=True))
+    if current is not None and current['_id'] != snapshot['_id']:
+        Item().setMetadata(deltaItem, {DetectionDeltaMarker: str(current['_id'])})
+    setDatasetStats(folder, stats)
+    clear_annotation_csv_cache(folder, user)
+
+    deltas = list(detection_deltas(snapshot))
+    if len(deltas) >= int(os.getenv("DIVE_DELTA_COMPACTION_COUNT", 50)) or sum(
+        delta['size'] for delta in deltas
+    ) >= int(os.getenv("DIVE_DELTA_COMPACTION_BYTES", 64 * 1024 * 1024)):
+        events.daemon.trigger(
+            info={'folderId': folder['_id'], 'userId': user['_id']},
+            callback=_compactTrackDeltas,
+        )
+
+
+def _compactTrackDeltas(event):
+    folder = Folder().load(event.info['folderId'], force=True)
+    user = User().load(event.info['userId'], force=True)
+    if folder is not None and user is not None:
+        compactTrackDeltas(folder, user)
+
+
+def compactTrackDeltas(folder, user):
+    """Fold the revision log of a folder's detections into a new snapshot"""
+    snapshot = detections_file(folder)
+    if snapshot is None:
+        return
+    deltas = list(detection_deltas(snapshot))
+    if not deltas:
+        return
+    saveTracks(folder, getTrackData(snapshot), user)
+    for delta in deltas:
+        Item().remove(delta)
+    # Revisions appended while compacting belong on top of the new snapshot.  Any of
+    # them already folded into it are replayed in order, which leaves the same tracks.
+    # Revisions that join the log after this re-parent themselves, see saveTrackDelta.
+    new_snapshot = detections_file(folder, strict=True)
+    for delta in detection_deltas(snapshot):
+        Item().setMetadata(delta, {DetectionDeltaMarker: str(new_snapshot["_id"])})
+
+
+def migrateTrackStorage(folder):
+    """
+    Move the tracks of a dataset from its detection file into TrackItem documents.
+    The detection file is left in place as the last file revision.
+
+    :returns: whether the dataset was migrated
+    """
+    if usesTrackItems(folder):
+        return False
+    TrackItem().replace(folder, getFolderTrackData(folder))
+    Folder().setMetadata(
+        folder, {TrackStorageMarker: TrackItemStorage, TrackRevisionMarker: str(ObjectId())}
     )
+    return True
 
 
 def saveImportAttributes(folder, attributes, user):
@@ -205,10 +895,11 @@ def process_json(folder: GirderModel, user: GirderModel):
         Folder().childItems(
             folder,
             filters={"lowerName": {"$regex": jsonRegex}},
-            sort=[("created", pymongo.DESCENDING)],
+            sort=[("created", pymongo.ASCENDING)],
         )
     )
     auxiliary = get_or_create_auxiliary_folder(folder, user)
+    # Each upload is saved as a revision, oldest first, so the newest ends up current
     for item in jsonItems:
         file = Item().childFiles(item)[0]
         tracks, attributes, is_coco = get_track_and_attributes_from_coco(file)
@@ -217,17 +908,30 @@ def process_json(folder: GirderModel, user: GirderModel):
             saveImportAttributes(folder, attributes, user)
             Item().move(item, auxiliary)
         else:  # dive json
-            item['meta'][DetectionMarker] = str(folder['_id'])
-            Item().save(item)
+            # Uploaded json is untrusted, so validate it against the models in full
+            tracks = {
+                key: models.Track(**track).dict(exclude_none=True)
+                for key, track in getTrackData(file).items()
+            }
+            saveTracks(folder, tracks, user)
+            Item().move(item, auxiliary)
     if len(jsonItems) > 0:
         move_existing_result_to_auxiliary_folder(folder, user)
+        refreshCurrentDetections(folder)
         return True
     return False
 
 
-def getCloneRoot(owner: GirderModel, source_folder: GirderModel):
-    """Get the source media folder associated with a clone"""
-    verify_dataset(source_folder)
+def _walkCloneChain(owner: GirderModel, folder: GirderModel) -> Tuple[GirderModel, List[str]]:
+    """
+    Follow the media sources of a clone to the root.  If a source was removed, the
+    chain continues from the next ancestor recorded when the clone was made.
+
+    :returns: the root, and the ids of the folders passed through on the way
+    """
+    recorded = fromMeta(folder, CloneAncestorsMarker, [])
+    ancestors: List[str] = []
+    source_folder = folder
     next_id = fromMeta(source_folder, ForeignMediaIdMarker, False)
     while next_id is not False:
         # Recurse through source folders to find the root, allowing clones of clones
@@ -236,14 +940,53 @@ def getCloneRoot(owner: GirderModel, source_folder: GirderModel):
             level=AccessType.READ,
             user=owner,
         )
+        if source_folder is None and str(next_id) in recorded:
+            remaining = recorded[recorded.index(str(next_id)) + 1 :]
+            if remaining:
+                next_id = remaining[0]
+                continue
         if source_folder is None:
             raise RestException(
                 f"Referenced media source missing. Folder Id {next_id} was not found."
                 " This may be a cloned dataset where the source was deleted."
             )
         verify_dataset(source_folder)
+        ancestors.append(str(source_folder['_id']))
         next_id = fromMeta(source_folder, ForeignMediaIdMarker, False)
-    return source_folder
+    return source_folder, ancestors
+
+
+def getCloneRoot(owner: GirderModel, source_folder: GirderModel):
+    """Get the source media folder associated with a clone"""
+    verify_dataset(source_folder)
+    if fromMeta(source_folder, ForeignMediaIdMarker, False) is False:
+        return source_folder
+    rootId = fromMeta(source_folder, CloneRootMarker)
+    if rootId:
+        # Only the root needs to be readable, as it is the only folder media is read from
+        root = Folder().load(rootId, level=AccessType.READ, user=owner)
+        if root is not None and fromMeta(root, ForeignMediaIdMarker, False) is False:
+            verify_dataset(root)
+            return root
+    root, ancestors = _walkCloneChain(owner, source_folder)
+    resolved = {CloneRootMarker: str(root['_id']), CloneAncestorsMarker: ancestors}
+    Folder().update(
+        {'_id': source_folder['_id']},
+        {'$set': {f'meta.{key}': value for key, value in resolved.items()}},
+        multi=False,
+    )
+    source_folder['meta'].update(resolved)
+    return root
+
+
+def copyTrackDeltas(source_file, target_file, folder, user):
+    """Copy the revision log of a detection snapshot onto a copy of that snapshot"""
+    for delta in detection_deltas(source_file):
+        copied = Item().createItem(delta['name'], user, folder)
+        for file in Item().childFiles(delta):
+            File().copyFile(file, user, item=copied)
+        # As in saveTrackDelta, a revision joins the log once its file is complete
+        Item().setMetadata(copied, {DetectionDeltaMarker: str(target_file['_id'])})
 
 
 def createSoftClone(
@@ -259,16 +1002,24 @@ def createSoftClone(
         description=f'Clone of {source_folder["name"]}.',
         reuseExisting=False,
     )
-    cloned_folder['meta'] = source_folder['meta']
+    # Copied, so that setting the clone's markers leaves the source's intact
+    cloned_folder['meta'] = dict(source_folder['meta'])
     media_source_folder = getCloneRoot(owner, source_folder)
     cloned_folder['meta'][ForeignMediaIdMarker] = str(media_source_folder['_id'])
+    cloned_folder['meta'][CloneRootMarker] = str(media_source_folder['_id'])
+    cloned_folder['meta'][CloneAncestorsMarker] = [
+        str(source_folder['_id']),
+        *fromMeta(source_folder, CloneAncestorsMarker, []),
+    ]
     cloned_folder['meta'][PublishedMarker] = False
     # ensure confidence filter metadata exists
     if ConfidenceFiltersMarker not in cloned_folder['meta']:
         cloned_folder['meta'][ConfidenceFiltersMarker] = {'default': 0.1}
 
     Folder().save(cloned_folder)
-    get_or_create_auxiliary_folder(cloned_folder, owner)
+    auxiliary = get_or_create_auxiliary_folder(cloned_folder, owner)
+    if usesTrackItems(source_folder):
+        TrackItem().copy(source_folder, cloned_folder)
     source_detections = detections_item(source_folder)
     if source_detections is not None:
         cloned_detection_item = Item().copyItem(
@@ -276,6 +1027,12 @@ def createSoftClone(
         )
         cloned_detection_item['meta'][DetectionMarker] = str(cloned_folder['_id'])
         Item().save(cloned_detection_item)
+        cloned_file = detection_item_file(cloned_detection_item)
+        setCurrentDetections(cloned_folder, cloned_detection_item, cloned_file)
+        # Revisions saved since the source was last compacted belong to the clone too
+        source_file = detections_file(source_folder)
+        if source_file is not None and cloned_file is not None:
+            copyTrackDeltas(source_file, cloned_file, auxiliary, owner)
     else:
         saveTracks(cloned_folder, {}, owner)
     return cloned_folder
@@ -288,22 +1045,151 @@ def valid_images(
     """
     Any time images are used where frame alignment matters, this function must be used
     """
-    images = Folder().childItems(
-        getCloneRoot(user, folder),
-        filters={"lowerName": {"$regex": safeImageRegex}},
+    images = list(
+        Folder().childItems(
+            getCloneRoot(user, folder),
+            filters={"lowerName": {"$regex": safeImageRegex}},
+            sort=[(NaturalSortKeyField, pymongo.ASCENDING), ("_id", pymongo.ASCENDING)],
+        )
     )
+    # Items saved before sort keys were stored come back first and unordered
+    missing = [item for item in images if NaturalSortKeyField not in item]
+    if missing:
+        Item().collection.bulk_write(
+            [
+                pymongo.UpdateOne(
+                    {'_id': item['_id']},
+                    {'$set': {NaturalSortKeyField: natural_sort_string(item['name'])}},
+                )
+                for item in missing
+            ],
+            ordered=False,
+        )
+        images.sort(key=lambda item: natural_sort_key(item['name']))
+    for item in images:
+        item.pop(NaturalSortKeyField, None)
+    return images
 
-    def unwrapItem(item1, item2):
-        return strNumericCompare(item1['name'], item2['name'])
 
-    return sorted(
-        images,
-        key=functools.cmp_to_key(unwrapItem),
+def _frameManifestRows(root: GirderModel, user: GirderModel) -> List[list]:
+    images = valid_images(root, user)
+    # First file of each image by item id
+    files: Dict[str, GirderModel] = {}
+    itemIds = [image['_id'] for image in images]
+    for start in range(0, len(itemIds), 10000):
+        for file in File().find(
+            {'itemId': {'$in': itemIds[start : start + 10000]}},
+            fields=['itemId', 'size'],
+            sort=[('_id', pymongo.ASCENDING)],
+        ):
+            files.setdefault(str(file['itemId']), file)
+    rows = []
+    for image in images:
+        file = files.get(str(image['_id']))
+        rows.append(
+            [
+                image['name'],
+                str(image['_id']),
+                str(file['_id']) if file is not None else None,
+                file['size'] if file is not None else image['size'],
+            ]
+        )
+    return rows
+
+
+def frameManifestFile(folder: GirderModel, user: GirderModel) -> GirderModel:
+    """
+    The gzipped JSON [name, itemId, fileId, size] of every image of a dataset in frame
+    order, cached on the media root until an image under it is added, moved or removed
+    """
+    root = getCloneRoot(user, folder)
+    fileId = fromMeta(root, FrameManifestMarker)
+    if fileId:
+        cached = File().load(fileId, force=True)
+        if cached is not None:
+            return cached
+
+    # Media that changes while the manifest is built clears this, leaving it uncached
+    build = str(ObjectId())
+    Folder().update(
+        {'_id': root['_id']},
+        {'$set': {f'meta.{FrameManifestBuildMarker}': build}},
+        multi=False,
+    )
+    rows = _frameManifestRows(root, user)
+    gzip_bytes, _ = compress_blocks(json.dumps(rows, separators=(',', ':')).encode())
+    # The requesting user may only be able to read the root through a clone, and
+    # anonymous users of public datasets have no account, so the owner keeps it
+    owner = User().load(root['creatorId'], force=True) if root.get('creatorId') else user
+    auxiliary = get_or_create_auxiliary_folder(root, owner)
+    for item in Item().find(
+        {'folderId': auxiliary['_id'], f'meta.{FrameManifestMarker}': {'$exists': True}}
+    ):
+        Item().remove(item)
+    item = Item().createItem("frame_manifest.json", owner, auxiliary)
+    Item().setMetadata(item, {FrameManifestMarker: True})
+    file = Upload().uploadFromFile(
+        io.BytesIO(gzip_bytes),
+        len(gzip_bytes),
+        "frame_manifest.json.gz",
+        parentType="item",
+        parent=item,
+        user=owner,
+        mimeType="application/json",
+    )
+    # Saving a new file does not invalidate manifests, so images still being
+    # uploaded leave the manifest uncached until they have their file
+    if all(row[2] is not None for row in rows):
+        Folder().update(
+            {'_id': root['_id'], f'meta.{FrameManifestBuildMarker}': build},
+            {
+                '$set': {f'meta.{FrameManifestMarker}': str(file['_id'])},
+                '$unset': {f'meta.{FrameManifestBuildMarker}': True},
+            },
+            multi=False,
+        )
+    return file
+
+
+def frameManifest(folder: GirderModel, user: GirderModel) -> List[list]:
+    """The rows of frameManifestFile"""
+    file = frameManifestFile(folder, user)
+    return json.loads(b"".join(iter_gunzip(File().download(file, headers=False)())))
+
+
+def invalidateFrameManifests(folderIds: Iterable[ObjectId]):
+    """Drop the cached frame manifests of folders, and any being built"""
+    Folder().update(
+        {
+            '_id': {'$in': list(folderIds)},
+            '$or': [
+                {f'meta.{FrameManifestMarker}': {'$exists': True}},
+                {f'meta.{FrameManifestBuildMarker}': {'$exists': True}},
+            ],
+        },
+        {
+            '$unset': {
+                f'meta.{FrameManifestMarker}': True,
+                f'meta.{FrameManifestBuildMarker}': True,
+            }
+        },
+    )
+
+
+def acceptsGzip() -> bool:
+    """Whether the client will decompress a gzip Content-Encoding itself"""
+    return any(
+        encoding.value in ('gzip', '*') and encoding.qvalue > 0
+        for encoding in cherrypy.request.headers.elements('Accept-Encoding')
     )
 
 
 def get_annotation_csv_generator(
-    folder: GirderModel, user: GirderModel, excludeBelowThreshold=False, typeFilter=None
+    folder: GirderModel,
+    user: GirderModel,
+    excludeBelowThreshold=False,
+    typeFilter=None,
+    sortBy='track',
 ) -> Tuple[str, Callable[[], Generator[str, None, None]]]:
     """
     Get the annotation generator for a folder
@@ -315,11 +1201,10 @@ def get_annotation_csv_generator(
     if source_type == VideoType:
         fps = fromMeta(folder, FPSMarker)
     elif source_type == ImageSequenceType:
-        imageFiles = [img['name'] for img in valid_images(folder, user)]
+        imageFiles = [name for name, *_ in frameManifest(folder, user)]
 
     thresholds = fromMeta(folder, "confidenceFilters", {})
-    annotation_file = detections_file(folder, strict=True)
-    track_dict = getTrackData(annotation_file)
+    track_dict = getFolderTrackColumns(folder) or getFolderTrackData(folder)
 
     def downloadGenerator():
         for data in viame.export_tracks_as_csv(
@@ -329,8 +1214,75 @@ def get_annotation_csv_generator(
             filenames=imageFiles,
             fps=fps,
             typeFilter=typeFilter,
+            sortBy=sortBy,
         ):
             yield data
 
     filename = folder["name"] + ".csv"
     return filename, downloadGenerator
+
+
+def get_annotation_csv_cache_key(
+    folder: GirderModel, excludeBelowThreshold=False, typeFilter=None, sortBy='track'
+) -> str:
+    """
+    Identify a CSV export by the annotation revision it was generated from
+    and every option that changes its content
+    """
+    revision = annotation_revision(folder)
+    typeFilterHash = hashlib.sha1(json.dumps(sorted(set(typeFilter or []))).encode()).hexdigest()
+    options = json.dumps(
+        [
+            fromMeta(folder, ConfidenceFiltersMarker, {}),
+            bool(excludeBelowThreshold),
+            typeFilterHash,
+            fromMeta(folder, FPSMarker),
+            sortBy,
+        ],
+        sort_keys=True,
+    )
+    return f"{revision}_{hashlib.sha1(options.encode()).hexdigest()}"
+
+
+def get_annotation_csv_file(
+    folder: GirderModel,
+    user: GirderModel,
+    excludeBelowThreshold=False,
+    typeFilter=None,
+    sortBy='track',
+) -> GirderModel:
+    """
+    Get the CSV export of a folder's annotations, generating it into the
+    auxiliary folder if there is no cached copy for these options yet
+    """
+    # Anonymous downloads of public datasets cache on behalf of the dataset owner
+    creator = user or User().load(folder['creatorId'], force=True)
+    auxiliary = get_or_create_auxiliary_folder(folder, creator)
+    key = get_annotation_csv_cache_key(folder, excludeBelowThreshold, typeFilter, sortBy)
+    cached_item = Item().findOne(
+        {'folderId': auxiliary['_id'], f'meta.{CsvExportCacheMarker}': key}
+    )
+    if cached_item is not None:
+        cached_file = next(Item().childFiles(cached_item, limit=1), None)
+        if cached_file is not None:
+            return cached_file
+
+    filename, gen = get_annotation_csv_generator(
+        folder, user, excludeBelowThreshold, typeFilter, sortBy
+    )
+    with tempfile.TemporaryFile() as fh:
+        for data in gen():
+            fh.write(data.encode())
+        size = fh.tell()
+        fh.seek(0)
+        cached_item = Item().createItem(f"export_{key}.csv", creator, auxiliary, reuseExisting=True)
+        Item().setMetadata(cached_item, {CsvExportCacheMarker: key})
+        return Upload().uploadFromFile(
+            fh,
+            size,
+            filename,
+            parentType="item",
+            parent=cached_item,
+            user=creator,
+            mimeType="text/csv",
+        )
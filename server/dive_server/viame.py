@@ -2,9 +2,10 @@ from typing import List
 
 from girder.api import access
 from girder.api.describe import Description, autoDescribeRoute, describeRoute
-from girder.api.rest import Resource
+from girder.api.rest import Resource, setResponseHeader
 from girder.constants import AccessType
 from girder.exceptions import RestException
+from girder.models.file import File
 from girder.models.folder import Folder
 from girder.models.item import Item
 from girder.models.setting import Setting
@@ -20,6 +21,7 @@ from dive_tasks.tasks import (
     upgrade_pipelines,
 )
 from dive_utils import TRUTHY_META_VALUES, fromMeta, models
+from dive_utils.compression import iter_gunzip
 from dive_utils.constants import (
     JOBCONST_PIPELINE_NAME,
     JOBCONST_PRIVATE_QUEUE,
@@ -29,8 +31,10 @@ from dive_utils.constants import (
     SETTINGS_CONST_JOBS_CONFIGS,
     ConfidenceFiltersMarker,
     DatasetMarker,
+    DatasetStatsMarker,
     ForeignMediaIdMarker,
     PublishedMarker,
+    TypeMarker,
     UserPrivateQueueEnabledMarker,
     csvRegex,
     imageRegex,
@@ -43,17 +47,24 @@ from dive_utils.types import AvailableJobSchema, PipelineDescription
 
 from .pipelines import load_pipelines, run_pipeline
 from .serializers import meva as meva_serializer
+from .track_item import TrackItem
 from .training import ensure_csv_detections_file, training_output_folder
 from .transforms import GetPathFromItemId
 from .utils import (
+    acceptsGzip,
+    conditionalResponse,
     createSoftClone,
     detections_file,
     detections_item,
+    frameManifestFile,
     get_or_create_auxiliary_folder,
     getCloneRoot,
+    indexUsage,
     process_csv,
     process_json,
     saveTracks,
+    slowQueries,
+    trackDataCache,
     valid_images,
     verify_dataset,
 )
@@ -78,7 +89,10 @@ class Viame(Resource):
         self.route("PUT", ("attributes",), self.save_attributes)
         self.route("POST", ("validate_files",), self.validate_files)
         self.route("GET", ("valid_images",), self.get_valid_images)
+        self.route("GET", ("frame_manifest",), self.get_frame_manifest)
         self.route("PUT", ("user", ":id", "use_private_queue"), self.use_private_queue)
+        self.route("GET", ("track_cache",), self.get_track_cache_stats)
+        self.route("GET", ("database_stats",), self.get_database_stats)
 
     def _get_queue_name(self, default="celery"):
         user = self.getCurrentUser()
@@ -129,6 +143,37 @@ class Viame(Resource):
     def update_job_configs(self, configs: AvailableJobSchema):
         Setting().set(SETTINGS_CONST_JOBS_CONFIGS, configs)
 
+    @access.admin
+    @autoDescribeRoute(
+        Description("Get the size and hit rate of this server's cache of parsed annotations")
+    )
+    def get_track_cache_stats(self):
+        return trackDataCache.stats()
+
+    @access.admin
+    @autoDescribeRoute(
+        Description("Get index usage, and the slow queries recorded by the database profiler")
+        .param(
+            "slowMs",
+            "Only report operations that took at least this many milliseconds",
+            paramType="query",
+            dataType="integer",
+            default=100,
+        )
+        .param(
+            "limit",
+            "Report at most this many of the most recent slow operations",
+            paramType="query",
+            dataType="integer",
+            default=50,
+        )
+    )
+    def get_database_stats(self, slowMs: int, limit: int):
+        return {
+            'indexes': indexUsage([Item(), Folder(), Job(), TrackItem()]),
+            **slowQueries(slowMs, limit),
+        }
+
     @access.public
     @autoDescribeRoute(Description("Get custom brand data"))
     def get_brand_data(self):
@@ -155,9 +200,31 @@ class Viame(Resource):
             default=False,
             dataType='boolean',
         )
+        .param(
+            'stats',
+            'Return only the name, type and track statistics of each dataset',
+            required=False,
+            default=False,
+            dataType='boolean',
+        )
     )
     def list_datasets(self, params):
         limit, offset, sort = self.getPagingParameters(params)
+        fields = None
+        if self.boolParam('stats', params):
+            fields = [
+                'name',
+                'description',
+                'created',
+                'updated',
+                'creatorId',
+                'parentId',
+                'parentCollection',
+                f'meta.{DatasetMarker}',
+                f'meta.{TypeMarker}',
+                f'meta.{PublishedMarker}',
+                f'meta.{DatasetStatsMarker}',
+            ]
         query = {
             f'meta.{DatasetMarker}': {'$in': TRUTHY_META_VALUES},
         }
@@ -169,7 +236,7 @@ class Viame(Resource):
                 ]
             }
         return Folder().findWithPermissions(
-            query, offset=offset, limit=limit, sort=sort, user=self.getCurrentUser()
+            query, offset=offset, limit=limit, sort=sort, fields=fields, user=self.getCurrentUser()
         )
 
     @access.user
@@ -525,7 +592,36 @@ class Viame(Resource):
         )
     )
     def get_valid_images(self, folder):
-        return valid_images(folder, self.getCurrentUser())
+        images = valid_images(folder, self.getCurrentUser())
+        conditionalResponse(images)
+        return images
+
+    @access.user
+    @autoDescribeRoute(
+        Description(
+            "Get [name, itemId, fileId, size] of every image of a dataset, in frame order"
+        ).modelParam(
+            "folderId",
+            description="folder id of a clip",
+            model=Folder,
+            paramType="query",
+            required=True,
+            level=AccessType.READ,
+        )
+    )
+    def get_frame_manifest(self, folder):
+        verify_dataset(folder)
+        file = frameManifestFile(folder, self.getCurrentUser())
+        setResponseHeader('Vary', 'Accept-Encoding')
+        gzipPassthrough = acceptsGzip()
+        # Gzipped and plain bodies each need their own ETag
+        conditionalResponse(str(file['_id']), gzipPassthrough)
+        setResponseHeader('Content-Type', 'application/json')
+        if not gzipPassthrough:
+            return lambda: iter_gunzip(File().download(file, headers=False)())
+        # The manifest is stored gzipped, and clients decompress it themselves
+        setResponseHeader('Content-Encoding', 'gzip')
+        return File().download(file, headers=False)
 
     @access.user
     @autoDescribeRoute(
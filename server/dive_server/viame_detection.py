@@ -1,6 +1,9 @@
+import functools
 import json
-from typing import List
+import sys
+from typing import List, Optional, Tuple
 
+import cherrypy
 from girder.api import access
 from girder.api.describe import Description, autoDescribeRoute
 from girder.api.rest import Resource, setContentDisposition, setResponseHeader
@@ -11,16 +14,27 @@ from girder.models.folder import Folder
 from girder.models.item import Item
 from girder.utility import ziputil
 
+from dive_server.track_item import TrackItem
 from dive_server.utils import (
+    acceptsGzip,
+    annotation_revision,
+    conditionalResponse,
     detections_file,
     detections_item,
-    get_annotation_csv_generator,
+    detections_revision,
+    get_annotation_csv_file,
     getCloneRoot,
     getTrackData,
-    saveTracks,
+    getTrackDataInWindow,
+    isGzipped,
+    iterFolderTrackJson,
+    latest_detection_delta,
+    saveTrackDelta,
+    usesTrackItems,
     verify_dataset,
 )
 from dive_utils import fromMeta, models
+from dive_utils.compression import iter_gunzip
 from dive_utils.constants import ImageSequenceType, TypeMarker, VideoType, imageRegex, videoRegex
 
 
@@ -30,6 +44,7 @@ class ViameDetection(Resource):
         self.resourceName = "viame_detection"
         self.route("GET", (), self.get_detection)
         self.route("PUT", (), self.save_detection)
+        self.route("GET", ("stream",), self.stream_detection)
         self.route("GET", ("clip_meta",), self.get_clip_meta)
         self.route("GET", (":id", "export"), self.get_export_urls)
         self.route("GET", (":id", "export_detections"), self.export_detections)
@@ -159,14 +174,30 @@ class ViameDetection(Resource):
             default=[],
             requireArray=True,
         )
+        .param(
+            "sortBy",
+            "Group rows by track, or order them by frame",
+            paramType="query",
+            required=False,
+            default="track",
+            enum=["track", "frame"],
+        )
     )
-    def export_detections(self, folder, excludeBelowThreshold: bool, typeFilter: List[str]):
+    def export_detections(
+        self, folder, excludeBelowThreshold: bool, typeFilter: List[str], sortBy: str
+    ):
         verify_dataset(folder)
-        filename, gen = get_annotation_csv_generator(
-            folder, self.getCurrentUser(), excludeBelowThreshold, typeFilter
+        file = get_annotation_csv_file(
+            folder, self.getCurrentUser(), excludeBelowThreshold, typeFilter, sortBy
+        )
+        offset, endByte = 0, None
+        ranges = cherrypy.lib.httputil.get_ranges(
+            cherrypy.request.headers.get('Range'), file['size']
         )
-        setContentDisposition(filename)
-        return gen
+        if ranges:
+            # Only a single range is supported, as with girder's own file download
+            offset, endByte = ranges[0]
+        return File().download(file, offset, endByte=endByte)
 
     @access.public(scope=TokenScope.DATA_READ, cookie=True)
     @autoDescribeRoute(
@@ -217,9 +248,11 @@ class ViameDetection(Resource):
         typeFilter: List[str],
     ):
         verify_dataset(folder)
-        _, gen = get_annotation_csv_generator(
-            folder, self.getCurrentUser(), excludeBelowThreshold, typeFilter
-        )
+        csv_file = None
+        if includeDetections:
+            csv_file = get_annotation_csv_file(
+                folder, self.getCurrentUser(), excludeBelowThreshold, typeFilter
+            )
         setResponseHeader('Content-Type', 'application/zip')
         setContentDisposition(folder['name'] + '.zip')
         user = self.getCurrentUser()
@@ -247,16 +280,33 @@ class ViameDetection(Resource):
 
             if includeDetections:
                 # add JSON detections
+                snapshot = detections_file(folder)
+
+                def snapshotJson():
+                    # Export the current tracks in place of the detection file
+                    if usesTrackItems(folder):
+                        yield from TrackItem().jsonGenerator(folder)
+                    else:
+                        yield json.dumps(getTrackData(snapshot))
+
                 for (path, file) in Folder().fileList(
                     folder,
                     user=user,
                     subpath=False,
                     mimeFilter={'application/json'},
+                    data=False,
                 ):
-                    for data in z.addFile(file, path):
+                    gen = File().download(file, headers=False)
+                    if snapshot is not None and file['_id'] == snapshot['_id']:
+                        gen = snapshotJson
+                        if isGzipped(file):
+                            path = path[: -len('.gz')]
+                    for data in z.addFile(gen, path):
                         yield data
                 # add CSV detections
-                for data in z.addFile(gen, "output_tracks.csv"):
+                for data in z.addFile(
+                    File().download(csv_file, headers=False), "output_tracks.csv"
+                ):
                     yield data
             yield z.footer()
 
@@ -264,7 +314,8 @@ class ViameDetection(Resource):
 
     @access.user
     @autoDescribeRoute(
-        Description("Get detections of a clip").modelParam(
+        Description("Get detections of a clip")
+        .modelParam(
             "folderId",
             description="folder id of a clip",
             model=Folder,
@@ -272,16 +323,119 @@ class ViameDetection(Resource):
             required=True,
             level=AccessType.READ,
         )
+        .param(
+            "frameStart",
+            "Only return tracks overlapping frames from here, trimmed to the window",
+            paramType="query",
+            dataType="integer",
+            required=False,
+        )
+        .param(
+            "frameEnd",
+            "Only return tracks overlapping frames up to here, trimmed to the window",
+            paramType="query",
+            dataType="integer",
+            required=False,
+        )
     )
-    def get_detection(self, folder):
+    def get_detection(self, folder, frameStart: Optional[int], frameEnd: Optional[int]):
         verify_dataset(folder)
-        file = detections_file(folder)
+        window: Optional[Tuple[int, int]] = None
+        if frameStart is not None or frameEnd is not None:
+            window = (
+                frameStart if frameStart is not None else 0,
+                frameEnd if frameEnd is not None else sys.maxsize,
+            )
+            if window[0] > window[1]:
+                raise RestException('frameStart must not be after frameEnd')
+        trackItems = usesTrackItems(folder)
+        file = None if trackItems else detections_file(folder)
+        revision = None
+        if trackItems:
+            revision = annotation_revision(folder)
+        elif file is not None:
+            revision = detections_revision(file)
+        gzipPassthrough = False
+        if window is None and file is not None and isGzipped(file):
+            setResponseHeader('Vary', 'Accept-Encoding')
+            gzipPassthrough = acceptsGzip()
+        # The stored and decompressed bodies are different representations
+        conditionalResponse(revision, window, gzipPassthrough)
+
+        if window is not None:
+            return getTrackDataInWindow(folder, *window)
+        if trackItems:
+            setResponseHeader('Content-Type', 'application/json')
+            return functools.partial(TrackItem().jsonGenerator, folder)
         if file is None:
             return {}
         if "csv" in file["exts"]:
             raise RestException('Cannot get detections until postprocessing is complete.')
+        if latest_detection_delta(file) is not None:
+            return getTrackData(file)
+        if isGzipped(file):
+            if not gzipPassthrough:
+                setResponseHeader('Content-Type', 'application/json')
+                return lambda: iter_gunzip(File().download(file, headers=False)())
+            # Pass the stored bytes straight through for the client to decompress
+            setResponseHeader('Content-Encoding', 'gzip')
         return File().download(file, contentDisposition="inline")
 
+    @access.user
+    @autoDescribeRoute(
+        Description("Stream detections of a clip as newline-delimited JSON, one track per line")
+        .modelParam(
+            "folderId",
+            description="folder id of a clip",
+            model=Folder,
+            paramType="query",
+            required=True,
+            level=AccessType.READ,
+        )
+        .jsonParam(
+            "typeFilter",
+            "Only include tracks with one of these types",
+            paramType="query",
+            required=False,
+            default=[],
+            requireArray=True,
+        )
+        .param(
+            "confidence",
+            "Only include tracks with a confidence pair (of the filtered types) at least this high",
+            paramType="query",
+            dataType="number",
+            required=False,
+        )
+    )
+    def stream_detection(self, folder, typeFilter: List[str], confidence: Optional[float]):
+        verify_dataset(folder)
+        types = set(typeFilter)
+        thresholds = {} if confidence is None else {'default': confidence}
+
+        def include(track: dict) -> bool:
+            confidencePairs = track.get('confidencePairs', [])
+            if types:
+                confidencePairs = [pair for pair in confidencePairs if pair[0] in types]
+                if not confidencePairs:
+                    return False
+            return not thresholds or models.exceeds_thresholds(confidencePairs, thresholds)
+
+        def stream():
+            buffer = bytearray()
+            for track_bytes in iterFolderTrackJson(folder):
+                if (types or thresholds) and not include(json.loads(track_bytes)):
+                    continue
+                buffer += track_bytes + b"\n"
+                if len(buffer) >= 65536:
+                    yield bytes(buffer)
+                    buffer.clear()
+            if buffer:
+                yield bytes(buffer)
+
+        setResponseHeader('Content-Type', 'application/x-ndjson')
+        return stream
+
     @access.user
     @autoDescribeRoute(
         Description("").modelParam(
@@ -295,7 +449,9 @@ class ViameDetection(Resource):
     )
     def get_clip_meta(self, folder):
         verify_dataset(folder)
-        return self._get_clip_meta(folder)
+        clipMeta = self._get_clip_meta(folder)
+        conditionalResponse(clipMeta)
+        return clipMeta
 
     @access.user
     @autoDescribeRoute(
@@ -315,19 +471,13 @@ class ViameDetection(Resource):
         user = self.getCurrentUser()
         upsert: List[dict] = tracks.get('upsert', [])
         delete: List[str] = tracks.get('delete', [])
-        track_dict = getTrackData(detections_file(folder))
-
-        for track_id in delete:
-            track_dict.pop(str(track_id), None)
-        for track in upsert:
-            validated: models.Track = models.Track(**track)
-            track_dict[str(validated.trackId)] = validated.dict(exclude_none=True)
+        validated_upsert = [models.Track(**track).dict(exclude_none=True) for track in upsert]
 
         upserted_len = len(upsert)
         deleted_len = len(delete)
 
         if upserted_len or deleted_len:
-            saveTracks(folder, track_dict, user)
+            saveTrackDelta(folder, validated_upsert, delete, user)
 
         return {
             "updated": upserted_len,
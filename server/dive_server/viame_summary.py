@@ -10,7 +10,7 @@ from girder.models.folder import Folder
 from girder.models.token import Token
 
 from dive_server.serializers.viame import format_timestamp
-from dive_server.utils import PydanticModel, detections_file, getTrackData
+from dive_server.utils import PydanticModel, getFolderTrackColumns, getFolderTrackData
 from dive_tasks.summary import generate_max_n_summary, generate_summary
 from dive_utils import fromMeta, models
 from dive_utils.types import GirderModel
@@ -44,7 +44,7 @@ def generate_max_n_summary_csv(
 
     def gen():
         for folder in folders:
-            track_data = getTrackData(detections_file(folder))
+            track_data = getFolderTrackColumns(folder) or getFolderTrackData(folder)
             annotation_fps = fromMeta(folder, 'fps')
             for detection_type, result in generate_max_n_summary(track_data).items():
                 writer.writerow(
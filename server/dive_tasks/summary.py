@@ -1,9 +1,11 @@
-from typing import Any, Dict, Set
+from typing import Any, Dict, Mapping, Set
 
 from girder_client import GirderClient
 from girder_worker.app import app
 from girder_worker.task import Task
+import numpy as np
 
+from dive_utils.columnar import TrackColumns
 from dive_utils.constants import PublishedMarker
 from dive_utils.models import PublicDataSummary, SummaryItemSchema, Track
 
@@ -27,7 +29,32 @@ def summarize_annotations(
                 )
 
 
-def generate_max_n_summary(trackData: Dict[str, Any]):
+def generate_max_n_summary_columns(columns: TrackColumns):
+    """generate_max_n_summary over the begin and end columns, without decoding any tracks"""
+    begin = np.asarray(columns.columns['begin'])
+    end = np.asarray(columns.columns['end'])
+    types = np.array([t or 'unknown' for t in columns.top_types()], dtype=object)
+    order = np.argsort(begin, kind='stable')
+
+    maxN: Dict[str, Dict[str, int]] = {}
+    # Report types in the order their first track begins, like the sweep does
+    for trackType in dict.fromkeys(types[order].tolist()):
+        mask = types == trackType
+        typeBegins = np.sort(begin[mask])
+        typeEnds = np.sort(end[mask])
+        frames = np.unique(typeBegins)
+        # Tracks active on each frame a track begins: begun by then, minus ended before
+        counts = np.searchsorted(typeBegins, frames, 'right') - np.searchsorted(
+            typeEnds, frames, 'left'
+        )
+        best = int(np.argmax(counts))
+        maxN[trackType] = {"frame": int(frames[best]), "count": int(counts[best])}
+    return maxN
+
+
+def generate_max_n_summary(trackData: Mapping[str, Any]):
+    if isinstance(trackData, TrackColumns):
+        return generate_max_n_summary_columns(trackData)
     enabled: Set[str] = set()  # the tracks that are active on the current frame
 
     maxN: Dict[str, Dict[str, int]] = {}  # map type to tuple (frame, count)
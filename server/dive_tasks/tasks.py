@@ -34,6 +34,7 @@ from dive_utils.constants import (
     ImageSequenceType,
     OriginalFPSMarker,
     OriginalFPSStringMarker,
+    TrainedPipeFileMarker,
     TrainedPipelineCategory,
     TrainedPipelineMarker,
     TypeMarker,
@@ -422,6 +423,12 @@ def train_pipeline(
                 },
             )
             gc.upload(f"{training_results_path}/*", girder_output_folder["_id"])
+            # Recorded once uploaded, so the pipeline is only listed when it can run
+            pipe_files = sorted(path.name for path in training_results_path.glob("*.pipe"))
+            if pipe_files:
+                gc.addMetadataToFolder(
+                    girder_output_folder["_id"], {TrainedPipeFileMarker: pipe_files[-1]}
+                )
 
 
 @app.task(bind=True, acks_late=True, ignore_result=True)
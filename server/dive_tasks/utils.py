@@ -144,10 +144,13 @@ def download_source_media(
     Download source media for folder from girder
     """
     if fromMeta(folder, TypeMarker) == ImageSequenceType:
-        image_items = girder_client.get('viame/valid_images', {'folderId': folder["_id"]})
-        for item in image_items:
-            girder_client.downloadItem(str(item["_id"]), str(dest))
-        return [str(dest / item['name']) for item in image_items]
+        manifest = girder_client.get('viame/frame_manifest', {'folderId': folder["_id"]})
+        for name, itemId, fileId, _ in manifest:
+            if fileId is None:
+                girder_client.downloadItem(itemId, str(dest))
+            else:
+                girder_client.downloadFile(fileId, str(dest / name))
+        return [str(dest / name) for name, *_ in manifest]
     elif fromMeta(folder, TypeMarker) == VideoType:
         clip_meta = girder_client.get("viame_detection/clip_meta", {'folderId': folder['_id']})
         destination_path = str(dest / clip_meta['video']['name'])
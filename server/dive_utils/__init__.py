@@ -1,7 +1,8 @@
 """Utilities that are common to both the viame server and tasks package."""
+import codecs
 import itertools
 import re
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, Generator, Iterable, List, Tuple, Union
 
 from dive_utils.types import GirderModel
 
@@ -60,3 +61,46 @@ def strNumericCompare(input1: str, input2: str) -> int:
             return 1
         return 1 if a > b else -1
     return 0
+
+
+def natural_sort_key(input: str) -> Tuple[Tuple[int, Union[int, str]], ...]:
+    """
+    A sort key that orders strings the same as strNumericCompare,
+    splitting each string once rather than on every comparison
+    """
+    # Numeric chunks sort before text chunks, and a string before its extensions
+    return tuple((0, c) if isinstance(c, int) else (1, c) for c in _strChunks(input))
+
+
+def natural_sort_string(input: str) -> str:
+    """
+    natural_sort_key encoded as a string with the same order under plain
+    codepoint (or UTF-8 byte) comparison, so the database can sort by it
+    """
+    encoded = []
+    for chunk in _strChunks(input):
+        if isinstance(chunk, int):
+            digits = str(chunk)
+            # Longer numbers are larger, so the length goes first
+            encoded.append(f"0{len(digits):04d}{digits}")
+        else:
+            # The terminator sorts before any printable character, so "a" < "ab"
+            encoded.append(f"1{chunk}\x01")
+    return "".join(encoded)
+
+
+def iterLines(chunks: Iterable[bytes], encoding='utf-8') -> Generator[str, None, None]:
+    """
+    Incrementally decode a stream of byte chunks into lines without line endings.
+    Equivalent to b"".join(chunks).decode().splitlines() without holding the
+    whole payload in memory.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    for chunk in chunks:
+        lines = (pending + decoder.decode(chunk)).splitlines(keepends=True)
+        # The last line may continue in the next chunk, including a \r\n split in two
+        pending = lines.pop() if lines else ''
+        for line in lines:
+            yield line.splitlines()[0]
+    yield from (pending + decoder.decode(b'', final=True)).splitlines()
@@ -0,0 +1,74 @@
+from collections import OrderedDict
+import threading
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class SizedLRUCache:
+    """
+    A thread-safe least recently used cache that evicts by the total
+    estimated size of its values rather than by their count.
+
+    Entries can carry a version, so that a lookup for a newer version
+    of a key misses and drops the stale value.
+    """
+
+    def __init__(self, maxSize: int):
+        """
+        :param maxSize: budget for the sum of value sizes, 0 disables the cache
+        """
+        self.maxSize = maxSize
+        self.currentSize = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, int, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Any = None, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] != version:
+                self._pop(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: int, version: Any = None):
+        with self._lock:
+            self._pop(key)
+            # A value larger than the whole budget would only flush everything else
+            if size > self.maxSize:
+                return
+            self._entries[key] = (value, size, version)
+            self.currentSize += size
+            while self.currentSize > self.maxSize:
+                _, (_, evictedSize, _) = self._entries.popitem(last=False)
+                self.currentSize -= evictedSize
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.currentSize = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'size': self.currentSize,
+                'maxSize': self.maxSize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def _pop(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.currentSize -= entry[1]
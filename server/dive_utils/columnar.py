@@ -0,0 +1,210 @@
+"""
+Columnar, memory-mappable storage for track data.
+
+Feature frames and bounds are stored as contiguous arrays with a per-track offset
+table into them.  Everything else about a track or feature (confidence pairs,
+attributes, geometry, flags) is stored as dictionary-encoded JSON, since most
+values repeat.  TrackColumns reads as a mapping from track key to track json,
+decoding one track at a time, so it can stand in for a detection file's track
+dict wherever that is only read.
+"""
+import json
+import struct
+from typing import Any, BinaryIO, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"DIVECOL1"
+ALIGNMENT = 64
+
+TRACK_COLUMNS = ("trackId", "begin", "end")
+FEATURE_COLUMNS = ("frame", "bounds")
+
+
+def _encode(values: List[str]) -> Tuple[np.ndarray, List[str]]:
+    table: Dict[str, int] = {}
+    codes = [table.setdefault(value, len(table)) for value in values]
+    return np.array(codes, dtype=np.int32), list(table)
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _bounds_columns(bounds: List[List[Any]]) -> Dict[str, np.ndarray]:
+    """
+    Bounds as int64 when every value is an int.  Otherwise they are float64, with
+    a mask of the values that were ints when there are any, so decoding gives back
+    the same json.
+    """
+    shape = (len(bounds), 4)
+    isInt = np.array([[_is_int(value) for value in box] for box in bounds], dtype=bool)
+    isInt = isInt.reshape(shape)
+    if isInt.all():
+        return {"bounds": np.array(bounds, dtype=np.int64).reshape(shape)}
+    columns = {"bounds": np.array(bounds, dtype=np.float64).reshape(shape)}
+    if isInt.any():
+        columns["boundsIsInt"] = isInt
+    return columns
+
+
+class TrackColumns(Mapping[str, Dict[str, Any]]):
+    def __init__(
+        self,
+        columns: Dict[str, np.ndarray],
+        dictionaries: Dict[str, List[str]],
+        keys: Optional[List[str]] = None,
+    ):
+        """
+        :param keys: track dict keys, when they are not just the string trackIds
+        """
+        self.columns = columns
+        self.dictionaries = dictionaries
+        self._customKeys = keys
+        self._keys = keys if keys is not None else [str(i) for i in columns["trackId"].tolist()]
+        self._index = {key: i for i, key in enumerate(self._keys)}
+
+    @classmethod
+    def from_tracks(cls, tracks: Mapping[str, Dict[str, Any]]) -> 'TrackColumns':
+        keys = list(tracks.keys())
+        trackRows = list(tracks.values())
+        features = [feature for track in trackRows for feature in track.get('features', [])]
+        bounds = [feature['bounds'] for feature in features]
+        confidencePairs = [
+            json.dumps(track['confidencePairs']) if 'confidencePairs' in track else ''
+            for track in trackRows
+        ]
+        trackExtra = [
+            json.dumps(
+                {
+                    key: value
+                    for key, value in track.items()
+                    if key not in TRACK_COLUMNS and key not in ('confidencePairs', 'features')
+                }
+            )
+            for track in trackRows
+        ]
+        featureExtra = [
+            json.dumps({key: value for key, value in feature.items() if key not in FEATURE_COLUMNS})
+            for feature in features
+        ]
+        confidenceCodes, confidenceTable = _encode(confidencePairs)
+        trackExtraCodes, trackExtraTable = _encode(trackExtra)
+        featureExtraCodes, featureExtraTable = _encode(featureExtra)
+        columns = {
+            "trackId": np.array([track['trackId'] for track in trackRows], dtype=np.int64),
+            "begin": np.array([track['begin'] for track in trackRows], dtype=np.int64),
+            "end": np.array([track['end'] for track in trackRows], dtype=np.int64),
+            "featureOffsets": np.cumsum(
+                [0] + [len(track.get('features', [])) for track in trackRows], dtype=np.int64
+            ),
+            "confidencePairs": confidenceCodes,
+            "trackExtra": trackExtraCodes,
+            "frame": np.array([feature['frame'] for feature in features], dtype=np.int64),
+            **_bounds_columns(bounds),
+            "featureExtra": featureExtraCodes,
+        }
+        dictionaries = {
+            "confidencePairs": confidenceTable,
+            "trackExtra": trackExtraTable,
+            "featureExtra": featureExtraTable,
+        }
+        default_keys = [str(track['trackId']) for track in trackRows]
+        return cls(columns, dictionaries, None if keys == default_keys else keys)
+
+    def track(self, index: int) -> Dict[str, Any]:
+        """Decode the track json at a position"""
+        columns = self.columns
+        start, stop = columns["featureOffsets"][index : index + 2].tolist()
+        featureExtraTable = self.dictionaries["featureExtra"]
+        bounds = columns["bounds"][start:stop].tolist()
+        if "boundsIsInt" in columns:
+            bounds = [
+                [int(value) if isInt else value for value, isInt in zip(box, boxIsInt)]
+                for box, boxIsInt in zip(bounds, columns["boundsIsInt"][start:stop].tolist())
+            ]
+        features = [
+            {"frame": frame, "bounds": box, **json.loads(featureExtraTable[code])}
+            for frame, box, code in zip(
+                columns["frame"][start:stop].tolist(),
+                bounds,
+                columns["featureExtra"][start:stop].tolist(),
+            )
+        ]
+        track: Dict[str, Any] = {
+            "trackId": int(columns["trackId"][index]),
+            "begin": int(columns["begin"][index]),
+            "end": int(columns["end"][index]),
+        }
+        confidencePairs = self.dictionaries["confidencePairs"][columns["confidencePairs"][index]]
+        if confidencePairs:
+            track["confidencePairs"] = json.loads(confidencePairs)
+        track.update(json.loads(self.dictionaries["trackExtra"][columns["trackExtra"][index]]))
+        track["features"] = features
+        return track
+
+    def top_types(self) -> List[Optional[str]]:
+        """The type of the highest confidence pair of every track"""
+        table = []
+        for encoded in self.dictionaries["confidencePairs"]:
+            pairs = json.loads(encoded) if encoded else []
+            table.append(max(pairs, key=lambda pair: pair[1])[0] if pairs else None)
+        return [table[code] for code in self.columns["confidencePairs"].tolist()]
+
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        return self.track(self._index[key])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def write(self, fh: BinaryIO):
+        """Write the columns as a header followed by aligned raw arrays"""
+        header: Dict[str, Any] = {
+            "columns": {},
+            "dictionaries": self.dictionaries,
+            "keys": self._customKeys,
+        }
+        offset = 0
+        for name, array in self.columns.items():
+            header["columns"][name] = {
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+                "offset": offset,
+            }
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        header_bytes = json.dumps(header).encode()
+        data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+        fh.write(MAGIC)
+        fh.write(struct.pack("<Q", len(header_bytes)))
+        fh.write(header_bytes)
+        fh.write(b"\0" * (data_start - len(MAGIC) - 8 - len(header_bytes)))
+        for array in self.columns.values():
+            data = np.ascontiguousarray(array).tobytes()
+            fh.write(data)
+            fh.write(b"\0" * (-len(data) % ALIGNMENT))
+
+    @classmethod
+    def load(cls, path: str, mmap=True) -> 'TrackColumns':
+        """Read columns written by write, memory-mapping the arrays by default"""
+        with open(path, "rb") as fh:
+            if fh.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a track columns file")
+            (header_length,) = struct.unpack("<Q", fh.read(8))
+            header = json.loads(fh.read(header_length))
+        data_start = -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+        columns = {}
+        for name, spec in header["columns"].items():
+            dtype = np.dtype(spec["dtype"])
+            shape = tuple(spec["shape"])
+            offset = data_start + spec["offset"]
+            if not mmap or 0 in shape:
+                count = int(np.prod(shape))
+                with open(path, "rb") as fh:
+                    fh.seek(offset)
+                    columns[name] = np.fromfile(fh, dtype=dtype, count=count).reshape(shape)
+            else:
+                columns[name] = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+        return cls(columns, header["dictionaries"], header["keys"])
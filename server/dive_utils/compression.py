@@ -0,0 +1,99 @@
+"""
+Gzip with random access.
+
+Data is compressed as a single ordinary gzip member, so any gzip client can read
+all of it, but the deflate stream is fully flushed at regular block boundaries.
+Decompression can restart at any of those boundaries, which lets a byte range of
+the original data be read without inflating everything before it.
+"""
+from bisect import bisect_right
+from typing import BinaryIO, Generator, Iterable, List, Sequence, Tuple
+import zlib
+
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+RAW_WBITS = -zlib.MAX_WBITS
+
+
+def compress_blocks(data: bytes, block_size=65536, level=6) -> Tuple[bytes, List[List[int]]]:
+    """
+    Gzip data with a full flush every block_size bytes.
+
+    :returns: the gzip bytes, and the [uncompressed offset, compressed offset]
+        of the start of every block
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    blocks = [[0, 0]]
+    parts = []
+    compressed_size = 0
+    for start in range(0, len(data), block_size):
+        if start:
+            flushed = compressor.flush(zlib.Z_FULL_FLUSH)
+            parts.append(flushed)
+            compressed_size += len(flushed)
+            blocks.append([start, compressed_size])
+        compressed = compressor.compress(data[start : start + block_size])
+        parts.append(compressed)
+        compressed_size += len(compressed)
+    parts.append(compressor.flush())
+    return b"".join(parts), blocks
+
+
+def read_block_range(
+    fh: BinaryIO, blocks: List[List[int]], offset: int, length: int, chunk_size=65536
+) -> bytes:
+    """Read length bytes of the original data from offset, out of a compress_blocks file"""
+    block = bisect_right([start for start, _ in blocks], offset) - 1
+    block_start, compressed_offset = blocks[block]
+    # The first block starts with the gzip header, the others mid deflate stream
+    decompressor = zlib.decompressobj(GZIP_WBITS if block == 0 else RAW_WBITS)
+    needed = offset - block_start + length
+    data = bytearray()
+    fh.seek(compressed_offset)
+    while len(data) < needed and not decompressor.eof:
+        chunk = fh.read(chunk_size)
+        if not chunk:
+            break
+        data += decompressor.decompress(chunk)
+    return bytes(data[offset - block_start : needed])
+
+
+def iter_gunzip(chunks: Iterable[bytes]) -> Generator[bytes, None, None]:
+    """Incrementally decompress a stream of gzip byte chunks"""
+    decompressor = zlib.decompressobj(GZIP_WBITS)
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    data = decompressor.flush()
+    if data:
+        yield data
+
+
+def iter_byte_ranges(
+    chunks: Iterable[bytes], ranges: Iterable[Sequence[int]]
+) -> Generator[bytes, None, None]:
+    """
+    Cut [offset, length] ranges out of a stream of byte chunks, holding
+    no more of the stream than the current range needs.
+
+    :param ranges: non-overlapping ranges in ascending order of offset
+    """
+    chunkIter = iter(chunks)
+    buffer = bytearray()
+    bufferStart = 0  # stream offset of buffer[0]
+    for offset, length in ranges:
+        if offset > bufferStart:
+            drop = min(offset - bufferStart, len(buffer))
+            del buffer[:drop]
+            bufferStart += drop
+        while bufferStart + len(buffer) < offset + length:
+            chunk = next(chunkIter, None)
+            if chunk is None:
+                raise ValueError(f"Stream ended before byte {offset + length}")
+            if bufferStart < offset:
+                # Skip whole chunks that fall before the range
+                skip = min(offset - bufferStart, len(chunk))
+                chunk = chunk[skip:]
+                bufferStart += skip
+            buffer += chunk
+        yield bytes(buffer[offset - bufferStart : offset - bufferStart + length])
@@ -65,7 +65,10 @@ DatasetMarker = "annotate"
 DetectionMarker = "detection"
 PublishedMarker = "published"
 ForeignMediaIdMarker = "foreign_media_id"
+CloneRootMarker = "clone_root"
+CloneAncestorsMarker = "clone_ancestors"
 TrainedPipelineMarker = "trained_pipeline"
+TrainedPipeFileMarker = "trained_pipe"
 TypeMarker = "type"
 AssetstoreSourceMarker = "import_source"
 AssetstoreSourcePathMarker = "import_path"
@@ -73,9 +76,26 @@ FPSMarker = "fps"
 OriginalFPSMarker = "originalFps"
 OriginalFPSStringMarker = "originalFpsString"
 ConfidenceFiltersMarker = "confidenceFilters"
+CsvExportCacheMarker = "csv_export_cache"
+DetectionDeltaMarker = "detection_delta"
+TrackStorageMarker = "track_storage"
+TrackRevisionMarker = "track_revision"
+SnapshotHashMarker = "snapshot_hash"
+DetectionItemMarker = "detection_item"
+DetectionFileMarker = "detection_file"
+FrameManifestMarker = "frame_manifest"
+FrameManifestBuildMarker = "frame_manifest_build"
+DatasetStatsMarker = "dataset_stats"
 
 # Other constants
 TrainedPipelineCategory = "trained"
+DetectionDeltaMimeType = "application/vnd.dive.delta+json"
+IntervalIndexMimeType = "application/vnd.dive.interval-index+json"
+ColumnarMimeType = "application/vnd.dive.columnar"
+# Item field holding natural_sort_string of the item name, for database sorts in DIVE order
+NaturalSortKeyField = "diveSortKey"
+# Value of TrackStorageMarker for datasets stored one document per track
+TrackItemStorage = "track_item"
 
 # The name of the folder where any user specific data should be stored
 # (created as a folder of that user)
@@ -0,0 +1,66 @@
+"""
+A static centered interval tree over track frame ranges.
+
+The tree is a list of JSON-serializable nodes so it can be persisted alongside
+the detection file it indexes.  Each node is
+[center, left child, right child, members by begin, members by end descending],
+where members are indices into the list of (begin, end) intervals.
+"""
+from typing import List, Sequence
+
+Interval = Sequence[int]
+
+
+def build_interval_index(intervals: Sequence[Interval]) -> List[list]:
+    """Build the tree nodes for a list of inclusive (begin, end, ...) intervals"""
+    nodes: List[list] = []
+
+    def build(members: List[int]) -> int:
+        if not members:
+            return -1
+        endpoints = sorted(bound for i in members for bound in intervals[i][:2])
+        center = endpoints[len(endpoints) // 2]
+        here = [i for i in members if intervals[i][0] <= center <= intervals[i][1]]
+        node = len(nodes)
+        nodes.append([center, -1, -1, [], []])
+        nodes[node][1] = build([i for i in members if intervals[i][1] < center])
+        nodes[node][2] = build([i for i in members if intervals[i][0] > center])
+        nodes[node][3] = sorted(here, key=lambda i: intervals[i][0])
+        nodes[node][4] = sorted(here, key=lambda i: intervals[i][1], reverse=True)
+        return node
+
+    build(list(range(len(intervals))))
+    return nodes
+
+
+def query_interval_index(
+    nodes: List[list], intervals: Sequence[Interval], start: int, end: int
+) -> List[int]:
+    """
+    Find the intervals that overlap the inclusive range [start, end]
+    in O(log n + k).
+
+    :returns: indices into intervals, in ascending order
+    """
+    found: List[int] = []
+    stack = [0] if nodes else []
+    while stack:
+        center, left, right, byBegin, byEnd = nodes[stack.pop()]
+        if end < center:
+            # Every member contains center, so it overlaps if it begins in time
+            for i in byBegin:
+                if intervals[i][0] > end:
+                    break
+                found.append(i)
+            children = [left]
+        elif start > center:
+            for i in byEnd:
+                if intervals[i][1] < start:
+                    break
+                found.append(i)
+            children = [right]
+        else:
+            found.extend(byBegin)
+            children = [left, right]
+        stack.extend(child for child in children if child >= 0)
+    return sorted(found)
@@ -1,6 +1,9 @@
+from bisect import bisect_left, bisect_right
 from typing import Any, Dict, List, Optional, Tuple, Union
 
+import numpy as np
 from pydantic import BaseModel, Field
+from pydantic.validators import BOOL_FALSE, BOOL_TRUE
 from typing_extensions import Literal
 
 
@@ -44,13 +47,7 @@ class Track(BaseModel):
     attributes: Dict[str, Any] = Field(default_factory=lambda: {})
 
     def exceeds_thresholds(self, thresholds: Dict[str, float]) -> bool:
-        defaultThresh = thresholds.get('default', 0)
-        return any(
-            [
-                confidence >= thresholds.get(field, defaultThresh)
-                for field, confidence in self.confidencePairs
-            ]
-        )
+        return exceeds_thresholds(self.confidencePairs, thresholds)
 
     def __hash__(self):
         return self.trackId
@@ -107,20 +104,135 @@ class CocoMetadata(BaseModel):
     videos: Dict[int, dict]
 
 
+def exceeds_thresholds(
+    confidencePairs: List[Tuple[str, float]], thresholds: Dict[str, float]
+) -> bool:
+    defaultThresh = thresholds.get('default', 0)
+    return any(
+        [
+            confidence >= thresholds.get(field, defaultThresh)
+            for field, confidence in confidencePairs
+        ]
+    )
+
+
+def attribute_value(value: Union[bool, float, str]) -> Union[bool, float, str]:
+    """Coerce an attribute value the way Union[bool, float, str] validation does"""
+    if value is True or value is False:
+        return value
+    key = value.lower() if isinstance(value, str) else value
+    if key in BOOL_TRUE:
+        return True
+    if key in BOOL_FALSE:
+        return False
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def feature_json(
+    frame: int,
+    bounds: List[int],
+    attributes: Optional[Dict[str, Union[bool, float, str]]] = None,
+    geometry: Optional[Dict[str, Any]] = None,
+    fishLength: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Build the json form of a Feature without validation, matching
+    Feature(...).dict(exclude_none=True) for arguments that already have the
+    right types.  Attribute values are coerced as the model would.
+    """
+    feature: Dict[str, Any] = {'frame': frame, 'bounds': bounds}
+    if attributes is not None:
+        feature['attributes'] = {key: attribute_value(val) for key, val in attributes.items()}
+    if geometry is not None:
+        feature['geometry'] = geometry
+    if fishLength is not None:
+        feature['fishLength'] = fishLength
+    feature['interpolate'] = False
+    feature['keyframe'] = True
+    return feature
+
+
+def track_json(begin: int, end: int, trackId: int) -> Dict[str, Any]:
+    """Build the json form of an empty Track without validation"""
+    return {
+        'begin': begin,
+        'end': end,
+        'trackId': trackId,
+        'features': [],
+        'confidencePairs': [],
+        'attributes': {},
+    }
+
+
+def interpolate_bounds(
+    a_frame: int, a_bounds: List[int], b_frame: int, b_bounds: List[int]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Interpolate bounds for every frame strictly between a and b in one array operation.
+    Rounding matches round() on each value, i.e. half to even.
+
+    :returns: an (n,) array of frames and an (n, 4) integer array of bounds
+    """
+    frame_range = b_frame - a_frame
+    steps = np.arange(1, frame_range)
+    delta = (steps / frame_range)[:, np.newaxis]
+    inverse_delta = 1 - delta
+    bounds = np.rint(
+        (np.asarray(a_bounds, dtype=np.float64) * inverse_delta)
+        + (np.asarray(b_bounds, dtype=np.float64) * delta)
+    )
+    return steps + a_frame, bounds.astype(np.int64)
+
+
 # interpolate all features [a, b)
 def interpolate(a: Feature, b: Feature) -> List[Feature]:
     if a.interpolate is False:
         raise ValueError('Cannot interpolate feature without interpolate enabled')
     if b.frame <= a.frame:
         raise ValueError('b.frame must be larger than a.frame')
-    feature_list = [a]
-    frame_range = b.frame - a.frame
-    for frame in range(1, frame_range):
-        delta = frame / frame_range
-        inverse_delta = 1 - delta
-        bounds: List[float] = [
-            round((abox * inverse_delta) + (bbox * delta))
-            for (abox, bbox) in zip(a.bounds, b.bounds)
-        ]
-        feature_list.append(Feature(frame=a.frame + frame, bounds=bounds, keyframe=False))
-    return feature_list
+    frames, bounds = interpolate_bounds(a.frame, a.bounds, b.frame, b.bounds)
+    return [a] + [
+        Feature(frame=frame, bounds=box, keyframe=False)
+        for frame, box in zip(frames.tolist(), bounds.tolist())
+    ]
+
+
+# interpolate all features [a, b) in their json form
+def interpolate_json(a: Dict[str, Any], b: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if a.get('interpolate', False) is False:
+        raise ValueError('Cannot interpolate feature without interpolate enabled')
+    if b['frame'] <= a['frame']:
+        raise ValueError('b.frame must be larger than a.frame')
+    frames, bounds = interpolate_bounds(a['frame'], a['bounds'], b['frame'], b['bounds'])
+    return [a] + [
+        {'frame': frame, 'bounds': box, 'interpolate': False, 'keyframe': False}
+        for frame, box in zip(frames.tolist(), bounds.tolist())
+    ]
+
+
+def trim_track_json(track: Dict[str, Any], start: int, end: int) -> Dict[str, Any]:
+    """
+    Restrict the features of a track to the frames in [start, end], keeping the
+    keyframes just outside the window that interpolated spans inside it depend on
+    """
+    features = track.get('features', [])
+    frames = [feature['frame'] for feature in features]
+    first = bisect_left(frames, start)
+    last = bisect_right(frames, end)
+    # A span only reaches into the window if its next keyframe is past the start
+    if (
+        0 < first < len(features)
+        and frames[first] > start
+        and features[first - 1].get('interpolate')
+    ):
+        first -= 1
+    if (
+        first < last < len(features)
+        and frames[last - 1] < end
+        and features[last - 1].get('interpolate')
+    ):
+        last += 1
+    return {**track, 'features': features[first:last]}
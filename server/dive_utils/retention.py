@@ -0,0 +1,50 @@
+"""Which past revisions of a dataset's annotations to keep."""
+from datetime import datetime
+from typing import List, Optional, Sequence, Set, Tuple
+
+THINNING_FORMATS = {
+    'hourly': '%Y-%m-%d %H',
+    'daily': '%Y-%m-%d',
+}
+
+Revision = Tuple[datetime, Optional[str]]
+
+
+def revisions_to_remove(
+    revisions: Sequence[Revision], keepLast=0, thinning: Optional[str] = None
+) -> List[int]:
+    """
+    Apply a retention policy to the revisions of a dataset.  The newest revision
+    is always kept, and an older revision with the same content as a newer kept
+    one is always removed.
+
+    :param revisions: (created, content hash or None if unknown) of every revision, newest first
+    :param keepLast: keep this many of the newest revisions, and no others unless thinning
+        is set.  0 keeps every revision.
+    :param thinning: 'hourly' or 'daily' to also keep the newest revision of every hour or day
+    :returns: positions of the revisions to remove
+    """
+    if thinning and thinning not in THINNING_FORMATS:
+        raise ValueError(f"Unknown revision thinning {thinning}")
+    keepAll = keepLast <= 0 and not thinning
+    remove: List[int] = []
+    keptHashes: Set[str] = set()
+    keptBuckets: Set[str] = set()
+    for position, (created, contentHash) in enumerate(revisions):
+        if position and contentHash is not None and contentHash in keptHashes:
+            remove.append(position)
+            continue
+        bucket = created.strftime(THINNING_FORMATS[thinning]) if thinning else None
+        if (
+            position == 0
+            or keepAll
+            or position < keepLast
+            or (bucket is not None and bucket not in keptBuckets)
+        ):
+            if contentHash is not None:
+                keptHashes.add(contentHash)
+            if bucket is not None:
+                keptBuckets.add(bucket)
+        else:
+            remove.append(position)
+    return remove
@@ -0,0 +1,86 @@
+"""Summary statistics of a dataset's tracks, kept on its folder for listing."""
+from typing import Any, Dict, Iterable, List, Optional
+
+UNKNOWN_TYPE = 'unknown'
+
+
+def _top_type(track: Dict[str, Any]) -> str:
+    confidencePairs = track.get('confidencePairs') or []
+    if not confidencePairs:
+        return UNKNOWN_TYPE
+    return max(confidencePairs, key=lambda pair: pair[1])[0]
+
+
+def _add(stats: Dict[str, Any], tracks: Iterable[Dict[str, Any]], sign: int):
+    types = stats['types']
+    for track in tracks:
+        stats['tracks'] += sign
+        stats['detections'] += sign * len(track.get('features', []))
+        trackType = _top_type(track)
+        types[trackType] = types.get(trackType, 0) + sign
+        if types[trackType] <= 0:
+            del types[trackType]
+
+
+def _pairs(types: Dict[str, int]) -> List[list]:
+    # Types are user-defined and may contain "." or "$", which cannot be used as field names
+    return sorted([[trackType, count] for trackType, count in types.items()])
+
+
+def track_stats(tracks: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Summarize tracks for a dataset listing
+
+    :returns: the number of tracks and detections, [type, track count] pairs by each
+        track's highest confidence type, and the [first, last] frame of any track
+    """
+    stats: Dict[str, Any] = {'tracks': 0, 'detections': 0, 'types': {}}
+    begin: Optional[int] = None
+    end: Optional[int] = None
+    for track in tracks:
+        _add(stats, [track], 1)
+        begin = track['begin'] if begin is None else min(begin, track['begin'])
+        end = track['end'] if end is None else max(end, track['end'])
+    stats['types'] = _pairs(stats['types'])
+    stats['frameRange'] = [begin, end] if begin is not None else None
+    return stats
+
+
+def update_track_stats(
+    stats: Dict[str, Any],
+    removed: Iterable[Dict[str, Any]],
+    added: Iterable[Dict[str, Any]],
+) -> Optional[Dict[str, Any]]:
+    """
+    Apply a change to the stats of track_stats without visiting unchanged tracks
+
+    :param removed: previous versions of the tracks that were deleted or replaced
+    :param added: new versions of the tracks that were created or replaced
+    :returns: the updated stats, or None when a removed track bounded the frame range
+        so that it can only be found from every track
+    """
+    removed = list(removed)
+    added = list(added)
+    updated: Dict[str, Any] = {
+        'tracks': stats['tracks'],
+        'detections': stats['detections'],
+        'types': dict((trackType, count) for trackType, count in stats['types']),
+    }
+    _add(updated, removed, -1)
+    _add(updated, added, 1)
+    frameRange = stats['frameRange']
+    if updated['tracks'] == 0:
+        frameRange = None
+    elif frameRange is None:
+        if removed:
+            return None
+    elif any(track['begin'] <= frameRange[0] or track['end'] >= frameRange[1] for track in removed):
+        return None
+    for track in added:
+        if frameRange is None:
+            frameRange = [track['begin'], track['end']]
+        else:
+            frameRange = [min(frameRange[0], track['begin']), max(frameRange[1], track['end'])]
+    updated['types'] = _pairs(updated['types'])
+    updated['frameRange'] = frameRange
+    return updated
@@ -10,6 +10,7 @@ requirements = [
     "girder_jobs==3.0.3",
     "girder_worker==0.8.1",
     "girder_worker_utils==0.8.5",
+    "numpy==1.24.4",
     "pydantic==1.8.2",
     "pyrabbit2==1.0.7",  # For rabbitmq_user_queues plugin
     "typing_extensions",
@@ -20,7 +21,9 @@ requirements = [
 ]
 
 dev_requirements = [
+    "mongomock==4.1.2",
     "pytest",
+    "pytest-girder==3.1.5",
     "tox",
 ]
 
@@ -53,6 +56,11 @@ setup(
             "rabbit_user_queues = rabbitmq_user_queues:GirderPlugin",
         ],
         "girder_worker_plugins": ["dive_tasks = dive_tasks:DIVEPlugin"],
+        "girder.cli_plugins": [
+            "dive-dataset-stats = dive_server.cli:dataset_stats",
+            "dive-migrate-tracks = dive_server.cli:migrate_tracks",
+            "dive-prune-revisions = dive_server.cli:prune_revisions",
+        ],
     },
     install_requires=requirements,
     extras_require={"dev": dev_requirements},
@@ -0,0 +1,61 @@
+import io
+import json
+import os
+
+import pytest
+
+# The plugin configures its worker queue when it loads, which is never reached in tests
+os.environ.setdefault('CELERY_BROKER_URL', 'memory://')
+
+
+def upload(user, folder, name: str, data: bytes, mimeType='application/octet-stream'):
+    from girder.models.upload import Upload
+
+    return Upload().uploadFromFile(
+        io.BytesIO(data),
+        len(data),
+        name,
+        parentType='folder',
+        parent=folder,
+        user=user,
+        mimeType=mimeType,
+    )
+
+
+def upload_json(user, folder, name: str, data) -> dict:
+    return upload(user, folder, name, json.dumps(data).encode(), 'application/json')
+
+
+@pytest.fixture
+def dataset(server, admin, fsAssetstore):
+    """An empty image sequence dataset owned by admin"""
+    from girder.models.folder import Folder
+
+    from dive_utils.constants import DatasetMarker, FPSMarker, ImageSequenceType, TypeMarker
+
+    folder = Folder().createFolder(admin, 'dataset', parentType='user', public=False, creator=admin)
+    return Folder().setMetadata(
+        folder, {DatasetMarker: True, TypeMarker: ImageSequenceType, FPSMarker: 1}
+    )
+
+
+def make_tracks(count: int, frames=5):
+    return {
+        str(trackId): {
+            'trackId': trackId,
+            'begin': trackId,
+            'end': trackId + frames - 1,
+            'confidencePairs': [['fish' if trackId % 2 else 'crab', 0.9]],
+            'attributes': {},
+            'features': [
+                {
+                    'frame': frame,
+                    'bounds': [frame, frame, frame + 10, frame + 10],
+                    'interpolate': False,
+                    'keyframe': True,
+                }
+                for frame in range(trackId, trackId + frames)
+            ],
+        }
+        for trackId in range(count)
+    }
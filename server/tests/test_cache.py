@@ -0,0 +1,49 @@
+from dive_utils.cache import SizedLRUCache
+
+
+def test_evicts_least_recently_used_by_size():
+    cache = SizedLRUCache(10)
+    cache.put('a', 'A', 4)
+    cache.put('b', 'B', 4)
+    assert cache.get('a') == 'A'
+    cache.put('c', 'C', 4)
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A'
+    assert cache.get('c') == 'C'
+    assert cache.stats() == {
+        'entries': 2,
+        'size': 8,
+        'maxSize': 10,
+        'hits': 3,
+        'misses': 1,
+        'evictions': 1,
+    }
+
+
+def test_oversized_value_is_not_cached():
+    cache = SizedLRUCache(10)
+    cache.put('a', 'A', 4)
+    cache.put('b', 'B', 11)
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A'
+
+
+def test_replace_and_invalidate():
+    cache = SizedLRUCache(10)
+    cache.put('a', 'A', 4)
+    cache.put('a', 'AA', 6)
+    assert cache.currentSize == 6
+    assert cache.get('a') == 'AA'
+    cache.invalidate('a')
+    assert cache.get('a') is None
+    assert cache.currentSize == 0
+
+
+def test_stale_version_misses():
+    cache = SizedLRUCache(10)
+    cache.put('a', 'A', 4, version=1)
+    assert cache.get('a', version=1) == 'A'
+    assert cache.get('a', version=2) is None
+    # The stale value is dropped rather than left to take up the budget
+    assert cache.get('a', version=1) is None
+    assert cache.currentSize == 0
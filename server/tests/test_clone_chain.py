@@ -0,0 +1,97 @@
+from girder.constants import AccessType
+from girder.exceptions import AccessException, RestException
+from girder.models.folder import Folder
+import pytest
+
+from dive_utils.constants import CloneAncestorsMarker, CloneRootMarker, ForeignMediaIdMarker
+
+pytestmark = pytest.mark.plugin('dive_server')
+
+
+def reload(folder):
+    return Folder().load(folder['_id'], force=True)
+
+
+@pytest.fixture
+def clones(admin, dataset):
+    """A clone of dataset, and a clone of that clone"""
+    from dive_server.utils import createSoftClone
+
+    parent = Folder().createFolder(admin, 'clones', parentType='user', creator=admin)
+    clone = createSoftClone(admin, dataset, parent, 'clone')
+    return clone, createSoftClone(admin, clone, parent, 'clone of clone')
+
+
+def legacy(folder, sourceId):
+    """A clone as saved before roots and ancestors were recorded"""
+    for key in [CloneRootMarker, CloneAncestorsMarker]:
+        folder['meta'].pop(key, None)
+    folder['meta'][ForeignMediaIdMarker] = str(sourceId)
+    return Folder().save(folder)
+
+
+def test_clone_of_clone_records_root_and_ancestors(admin, dataset, clones):
+    from dive_server.utils import getCloneRoot
+
+    clone, cloneOfClone = clones
+    assert clone['meta'][ForeignMediaIdMarker] == str(dataset['_id'])
+    assert clone['meta'][CloneAncestorsMarker] == [str(dataset['_id'])]
+    meta = reload(cloneOfClone)['meta']
+    assert meta[ForeignMediaIdMarker] == meta[CloneRootMarker] == str(dataset['_id'])
+    assert meta[CloneAncestorsMarker] == [str(clone['_id']), str(dataset['_id'])]
+    assert getCloneRoot(admin, cloneOfClone)['_id'] == dataset['_id']
+    assert getCloneRoot(admin, dataset)['_id'] == dataset['_id']
+
+
+def test_walk_legacy_chain(admin, dataset, clones):
+    from dive_server.utils import _walkCloneChain, getCloneRoot
+
+    clone, cloneOfClone = clones
+    legacy(clone, dataset['_id'])
+    cloneOfClone = legacy(cloneOfClone, clone['_id'])
+    root, ancestors = _walkCloneChain(admin, cloneOfClone)
+    assert root['_id'] == dataset['_id']
+    assert ancestors == [str(clone['_id']), str(dataset['_id'])]
+
+    # The walk is recorded, so later lookups go straight to the root
+    assert getCloneRoot(admin, cloneOfClone)['_id'] == dataset['_id']
+    meta = reload(cloneOfClone)['meta']
+    assert meta[CloneRootMarker] == str(dataset['_id'])
+    assert meta[CloneAncestorsMarker] == ancestors
+
+
+def test_walk_past_removed_source(admin, dataset, clones):
+    from dive_server.utils import _walkCloneChain
+
+    clone, cloneOfClone = clones
+    cloneOfClone = reload(cloneOfClone)
+    cloneOfClone['meta'][ForeignMediaIdMarker] = str(clone['_id'])
+    Folder().remove(clone)
+    root, ancestors = _walkCloneChain(admin, cloneOfClone)
+    assert root['_id'] == dataset['_id']
+    assert ancestors == [str(dataset['_id'])]
+
+    # Without recorded ancestors there is nowhere to continue from
+    cloneOfClone['meta'].pop(CloneAncestorsMarker)
+    with pytest.raises(RestException, match='source was deleted'):
+        _walkCloneChain(admin, cloneOfClone)
+
+
+def test_root_must_be_readable(admin, user, dataset, clones):
+    from dive_server.utils import getCloneRoot
+
+    clone, cloneOfClone = clones
+    for folder in clones:
+        Folder().setUserAccess(folder, user, AccessType.READ, save=True)
+    with pytest.raises(AccessException):
+        getCloneRoot(user, reload(cloneOfClone))
+
+    # Folders between a clone and its root need not be readable once the root is known
+    Folder().setUserAccess(reload(clone), user, None, save=True)
+    Folder().setUserAccess(dataset, user, AccessType.READ, save=True)
+    assert getCloneRoot(user, reload(cloneOfClone))['_id'] == dataset['_id']
+
+    # Walking the chain reads every folder along it
+    legacy(reload(cloneOfClone), clone['_id'])
+    with pytest.raises(AccessException):
+        getCloneRoot(user, reload(cloneOfClone))
@@ -0,0 +1,136 @@
+import json
+import random
+
+import numpy as np
+import pytest
+
+from dive_server.serializers import viame
+from dive_tasks.summary import generate_max_n_summary
+from dive_utils.columnar import TrackColumns
+
+
+def make_tracks(count: int, seed=0, floats=False):
+    rng = random.Random(seed)
+    tracks = {}
+    for trackId in range(count):
+        begin = rng.randint(0, 200)
+        end = begin + rng.randint(0, 30)
+        features = []
+        for frame in range(begin, end + 1, rng.randint(1, 5)):
+            feature = {
+                "frame": frame,
+                "bounds": [
+                    rng.randint(0, 500) * 0.5
+                    if floats and rng.random() < 0.3
+                    else rng.randint(0, 500)
+                    for _ in range(4)
+                ],
+                "keyframe": True,
+                "interpolate": rng.random() < 0.5,
+            }
+            if rng.random() < 0.2:
+                feature["attributes"] = {"occluded": rng.random() < 0.5}
+            features.append(feature)
+        tracks[str(trackId)] = {
+            "trackId": trackId,
+            "begin": begin,
+            "end": end,
+            "attributes": {},
+            "confidencePairs": [[rng.choice(["fish", "crab", "star"]), rng.random()]],
+            "features": features,
+        }
+    return tracks
+
+
+def exported_rows(track_dict, **kwargs):
+    """Rows of a CSV export, without the metadata row, which holds the export time"""
+    lines = "".join(viame.export_tracks_as_csv(track_dict, **kwargs)).splitlines()
+    return [line for line in lines if not line.startswith("# metadata")]
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+@pytest.mark.parametrize("floats", [True, False])
+def test_round_trip(tmp_path, mmap: bool, floats: bool):
+    tracks = make_tracks(300, floats=floats)
+    path = tmp_path / "tracks.columns"
+    with open(path, "wb") as fh:
+        TrackColumns.from_tracks(tracks).write(fh)
+    columns = TrackColumns.load(str(path), mmap=mmap)
+    assert list(columns) == list(tracks)
+    # Compare serialized, since 1 == 1.0 in a dict comparison
+    assert json.dumps(dict(columns), sort_keys=True) == json.dumps(tracks, sort_keys=True)
+
+
+def test_round_trip_custom_keys_and_float_bounds(tmp_path):
+    tracks = {
+        "a": {
+            "trackId": 7,
+            "begin": 1,
+            "end": 2,
+            "features": [
+                {"frame": 1, "bounds": [0.5, 1, 2, 3]},
+                {"frame": 2, "bounds": [1.5, 2, 3, 4]},
+            ],
+        },
+        "b": {"trackId": 3, "begin": 0, "end": 0, "features": []},
+    }
+    path = tmp_path / "tracks.columns"
+    with open(path, "wb") as fh:
+        TrackColumns.from_tracks(tracks).write(fh)
+    assert json.dumps(dict(TrackColumns.load(str(path))), sort_keys=True) == json.dumps(
+        tracks, sort_keys=True
+    )
+
+
+def test_bounds_keep_their_types():
+    tracks = {
+        "0": {
+            "trackId": 0,
+            "begin": 0,
+            "end": 0,
+            "features": [{"frame": 0, "bounds": [1, 2, 3, 4]}],
+        },
+        "1": {
+            "trackId": 1,
+            "begin": 0,
+            "end": 1,
+            "features": [
+                {"frame": 0, "bounds": [1, 0.5, 3.0, 4]},
+                {"frame": 1, "bounds": [1.0, 2.0, 3.0, 4.0]},
+            ],
+        },
+    }
+    columns = TrackColumns.from_tracks(tracks)
+    assert [type(value) for value in columns["0"]["features"][0]["bounds"]] == [int] * 4
+    assert [type(value) for value in columns["1"]["features"][0]["bounds"]] == [
+        int,
+        float,
+        float,
+        int,
+    ]
+    assert [type(value) for value in columns["1"]["features"][1]["bounds"]] == [float] * 4
+    assert "boundsIsInt" not in TrackColumns.from_tracks({"0": tracks["0"]}).columns
+    assert columns.columns["bounds"].dtype == np.float64
+
+
+def test_round_trip_empty(tmp_path):
+    path = tmp_path / "tracks.columns"
+    with open(path, "wb") as fh:
+        TrackColumns.from_tracks({}).write(fh)
+    assert dict(TrackColumns.load(str(path))) == {}
+
+
+@pytest.mark.parametrize("floats", [True, False])
+def test_csv_export_matches(floats: bool):
+    tracks = make_tracks(100, seed=1, floats=floats)
+    columns = TrackColumns.from_tracks(tracks)
+    for sortBy in ("track", "frame"):
+        assert exported_rows(columns, sortBy=sortBy) == exported_rows(tracks, sortBy=sortBy)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_max_n_summary_matches(seed: int):
+    tracks = make_tracks(200, seed=seed)
+    assert generate_max_n_summary(TrackColumns.from_tracks(tracks)) == generate_max_n_summary(
+        tracks
+    )
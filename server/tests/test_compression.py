@@ -0,0 +1,59 @@
+import gzip
+import io
+import json
+import random
+
+import pytest
+
+from dive_utils.compression import compress_blocks, iter_byte_ranges, iter_gunzip, read_block_range
+
+
+def _payload(seed: int) -> bytes:
+    rng = random.Random(seed)
+    tracks = {
+        str(i): {"trackId": i, "bounds": [rng.randint(0, 4000) for _ in range(4 * 20)]}
+        for i in range(rng.randint(0, 400))
+    }
+    return json.dumps(tracks).encode()
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("block_size", [1, 100, 4096, 65536])
+def test_compress_blocks_is_gzip(seed: int, block_size: int):
+    data = _payload(seed)
+    compressed, blocks = compress_blocks(data, block_size=block_size)
+    assert gzip.decompress(compressed) == data
+    chunks = [compressed[i : i + 7] for i in range(0, len(compressed), 7)]
+    assert b"".join(iter_gunzip(chunks)) == data
+    assert blocks[0] == [0, 0]
+    assert len(blocks) == max(1, -(-len(data) // block_size))
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("block_size", [100, 4096])
+def test_read_block_range(seed: int, block_size: int):
+    data = _payload(seed)
+    compressed, blocks = compress_blocks(data, block_size=block_size)
+    rng = random.Random(seed)
+    fh = io.BytesIO(compressed)
+    for _ in range(50):
+        offset = rng.randint(0, len(data))
+        length = rng.randint(0, 3 * block_size)
+        assert read_block_range(fh, blocks, offset, length, chunk_size=64) == (
+            data[offset : offset + length]
+        )
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 10000])
+def test_iter_byte_ranges(chunk_size: int):
+    data = bytes(range(256)) * 20
+    ranges = [[0, 5], [5, 10], [100, 1], [200, 300], [4000, 1120]]
+    chunks = [data[i : i + chunk_size] for i in range(0, len(data), chunk_size)]
+    assert list(iter_byte_ranges(chunks, ranges)) == [
+        data[offset : offset + length] for offset, length in ranges
+    ]
+
+
+def test_iter_byte_ranges_short_stream():
+    with pytest.raises(ValueError):
+        list(iter_byte_ranges([b"abc"], [[2, 5]]))
@@ -0,0 +1,138 @@
+import gzip
+import json
+
+from conftest import make_tracks, upload
+import pytest
+from pytest_girder.assertions import assertStatus, assertStatusOk
+from pytest_girder.utils import getResponseBody
+
+pytestmark = pytest.mark.plugin('dive_server')
+
+
+def get(server, user, path, folder, headers=()):
+    return server.request(
+        path,
+        user=user,
+        params={'folderId': str(folder['_id'])},
+        isJson=False,
+        additionalHeaders=list(headers),
+    )
+
+
+def assertNotModified(server, user, path, folder, etag, headers=()):
+    for ifNoneMatch in [etag, f'W/{etag}', f'"other", {etag}', '*']:
+        resp = get(server, user, path, folder, [*headers, ('If-None-Match', ifNoneMatch)])
+        assertStatus(resp, 304)
+        assert resp.headers['ETag'] == etag
+
+
+def test_detection_revalidation(server, admin, dataset):
+    from dive_server.utils import saveTrackDelta, saveTracks
+
+    tracks = make_tracks(3)
+    saveTracks(dataset, tracks, admin)
+    resp = get(server, admin, '/viame_detection', dataset)
+    assertStatusOk(resp)
+    assert json.loads(getResponseBody(resp)) == tracks
+    etag = resp.headers['ETag']
+    assert resp.headers['Cache-Control'] == 'private, no-cache'
+    assertNotModified(server, admin, '/viame_detection', dataset, etag)
+    resp = get(server, admin, '/viame_detection', dataset, [('If-None-Match', '"other"')])
+    assertStatusOk(resp)
+
+    saveTrackDelta(dataset, list(make_tracks(4).values())[3:], [], admin)
+    resp = get(server, admin, '/viame_detection', dataset, [('If-None-Match', etag)])
+    assertStatusOk(resp)
+    assert resp.headers['ETag'] != etag
+    assert sorted(json.loads(getResponseBody(resp)), key=int) == ['0', '1', '2', '3']
+
+
+def test_detection_gzip_and_identity_etags_differ(server, admin, dataset):
+    from dive_server.utils import saveTracks
+
+    tracks = make_tracks(3)
+    saveTracks(dataset, tracks, admin)
+    gzipHeaders = [('Accept-Encoding', 'gzip')]
+    identity = get(server, admin, '/viame_detection', dataset)
+    zipped = get(server, admin, '/viame_detection', dataset, gzipHeaders)
+    assertStatusOk(identity)
+    assertStatusOk(zipped)
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Encoding' not in identity.headers
+    assert identity.headers['Vary'] == zipped.headers['Vary'] == 'Accept-Encoding'
+    assert json.loads(getResponseBody(identity)) == tracks
+    assert json.loads(gzip.decompress(getResponseBody(zipped, text=False))) == tracks
+
+    assert identity.headers['ETag'] != zipped.headers['ETag']
+    assertNotModified(
+        server, admin, '/viame_detection', dataset, zipped.headers['ETag'], gzipHeaders
+    )
+    # A client holding one representation gets the other in full
+    resp = get(
+        server,
+        admin,
+        '/viame_detection',
+        dataset,
+        [*gzipHeaders, ('If-None-Match', identity.headers['ETag'])],
+    )
+    assertStatusOk(resp)
+    resp = get(
+        server, admin, '/viame_detection', dataset, [('If-None-Match', zipped.headers['ETag'])]
+    )
+    assertStatusOk(resp)
+
+
+def test_detection_window_etags(server, admin, dataset):
+    from dive_server.utils import saveTracks
+
+    saveTracks(dataset, make_tracks(5), admin)
+    etags = set()
+    for frameStart, frameEnd in [(0, 2), (1, 2), (0, 3)]:
+        resp = server.request(
+            '/viame_detection',
+            user=admin,
+            params={
+                'folderId': str(dataset['_id']),
+                'frameStart': frameStart,
+                'frameEnd': frameEnd,
+            },
+        )
+        assertStatusOk(resp)
+        etags.add(resp.headers['ETag'])
+    assert len(etags) == 3
+
+
+def test_clip_meta_revalidation(server, admin, dataset):
+    from dive_server.utils import saveTracks
+
+    saveTracks(dataset, make_tracks(2), admin)
+    resp = get(server, admin, '/viame_detection/clip_meta', dataset)
+    assertStatusOk(resp)
+    etag = resp.headers['ETag']
+    assertNotModified(server, admin, '/viame_detection/clip_meta', dataset, etag)
+
+    # A new snapshot is a new detection item
+    saveTracks(dataset, make_tracks(3), admin)
+    resp = get(server, admin, '/viame_detection/clip_meta', dataset, [('If-None-Match', etag)])
+    assertStatusOk(resp)
+    assert resp.headers['ETag'] != etag
+
+
+def test_valid_images_revalidation(server, admin, dataset):
+    for name in ['2.png', '10.png', '1.png']:
+        upload(admin, dataset, name, b'image', 'image/png')
+    resp = get(server, admin, '/viame/valid_images', dataset)
+    assertStatusOk(resp)
+    assert [image['name'] for image in json.loads(getResponseBody(resp))] == [
+        '1.png',
+        '2.png',
+        '10.png',
+    ]
+    etag = resp.headers['ETag']
+    assertNotModified(server, admin, '/viame/valid_images', dataset, etag)
+
+    upload(admin, dataset, '3.png', b'image', 'image/png')
+    resp = get(server, admin, '/viame/valid_images', dataset, [('If-None-Match', etag)])
+    assertStatusOk(resp)
+    assert resp.headers['ETag'] != etag
+    assert len(json.loads(getResponseBody(resp))) == 4
@@ -0,0 +1,78 @@
+from conftest import make_tracks
+from girder.models.folder import Folder
+from girder.models.item import Item
+import pytest
+from pytest_girder.assertions import assertStatus, assertStatusOk
+from pytest_girder.utils import getResponseBody
+
+pytestmark = pytest.mark.plugin('dive_server')
+
+
+def cached_exports(dataset, admin):
+    from dive_server.utils import get_or_create_auxiliary_folder
+    from dive_utils.constants import CsvExportCacheMarker
+
+    auxiliary = get_or_create_auxiliary_folder(dataset, admin)
+    return list(
+        Item().find(
+            {'folderId': auxiliary['_id'], f'meta.{CsvExportCacheMarker}': {'$exists': True}}
+        )
+    )
+
+
+def test_cache_hit(admin, dataset):
+    from dive_server.utils import get_annotation_csv_file, saveTracks
+
+    saveTracks(dataset, make_tracks(3), admin)
+    first = get_annotation_csv_file(dataset, admin)
+    second = get_annotation_csv_file(dataset, admin)
+    assert first['_id'] == second['_id']
+    assert len(cached_exports(dataset, admin)) == 1
+
+
+def test_cache_invalidated_on_save(admin, dataset):
+    from dive_server.utils import get_annotation_csv_file, saveTrackDelta, saveTracks
+
+    saveTracks(dataset, make_tracks(3), admin)
+    first = get_annotation_csv_file(dataset, admin)
+    tracks = make_tracks(4)
+    saveTrackDelta(dataset, [tracks['3']], ['0'], admin)
+    assert cached_exports(dataset, admin) == []
+    second = get_annotation_csv_file(dataset, admin)
+    assert second['_id'] != first['_id']
+    assert len(cached_exports(dataset, admin)) == 1
+
+
+def test_key_changes_with_options(admin, dataset):
+    from dive_server.utils import get_annotation_csv_cache_key, saveTracks
+
+    saveTracks(dataset, make_tracks(3), admin)
+    key = get_annotation_csv_cache_key(dataset)
+    assert get_annotation_csv_cache_key(dataset, typeFilter=['fish', 'crab']) != key
+    assert get_annotation_csv_cache_key(
+        dataset, typeFilter=['fish', 'crab']
+    ) == get_annotation_csv_cache_key(dataset, typeFilter=['crab', 'fish', 'crab'])
+    assert get_annotation_csv_cache_key(dataset, excludeBelowThreshold=True) != key
+    assert get_annotation_csv_cache_key(dataset, sortBy='frame') != key
+    dataset['meta']['confidenceFilters'] = {'default': 0.5}
+    assert get_annotation_csv_cache_key(dataset) != key
+
+
+def test_export_detections_anonymous_range(server, admin, dataset):
+    from dive_server.utils import saveTracks
+
+    saveTracks(dataset, make_tracks(3), admin)
+    path = f'/viame_detection/{dataset["_id"]}/export_detections'
+    assertStatus(server.request(path, isJson=False), 401)
+
+    Folder().setPublic(dataset, True, save=True)
+    resp = server.request(path, isJson=False)
+    assertStatusOk(resp)
+    body = getResponseBody(resp)
+    assert body.splitlines()[2].startswith('0,,0,0,0,10,10,')
+    # Anonymous exports are cached on behalf of the dataset owner
+    assert len(cached_exports(dataset, admin)) == 1
+
+    resp = server.request(path, isJson=False, additionalHeaders=[('Range', 'bytes=5-14')])
+    assertStatus(resp, 206)
+    assert getResponseBody(resp) == body[5:15]
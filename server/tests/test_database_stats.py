@@ -0,0 +1,138 @@
+import pytest
+from pytest_girder.assertions import assertStatus, assertStatusOk
+
+pytestmark = pytest.mark.plugin('dive_server')
+
+
+def keys(model) -> dict:
+    return {
+        tuple(tuple(field) for field in info['key']): info
+        for info in model.collection.index_information().values()
+    }
+
+
+def test_ensure_dive_indices(db):
+    from girder.models.folder import Folder
+    from girder.models.item import Item
+    from girder_jobs.models.job import Job
+
+    from dive_server import ensureDiveIndices
+    from dive_utils.constants import (
+        JOBCONST_DATASET_ID,
+        DatasetMarker,
+        DetectionMarker,
+        PublishedMarker,
+        TrainedPipelineMarker,
+    )
+
+    ensureDiveIndices()
+    items = keys(Item())
+    detections = items[((f'meta.{DetectionMarker}', 1), ('created', -1))]
+    assert detections['partialFilterExpression'] == {f'meta.{DetectionMarker}': {'$exists': True}}
+    brand = items[(('meta.brand', 1), ('creatorId', 1))]
+    assert brand['partialFilterExpression'] == {'meta.brand': {'$exists': True}}
+    folders = keys(Folder())
+    for marker in [DatasetMarker, PublishedMarker]:
+        index = folders[((f'meta.{marker}', 1), ('created', 1))]
+        assert index['partialFilterExpression'] == {f'meta.{marker}': {'$exists': True}}
+    assert folders[((f'meta.{TrainedPipelineMarker}', 1),)]['sparse']
+    assert ((JOBCONST_DATASET_ID, 1), ('status', 1)) in keys(Job())
+
+
+def test_database_stats_endpoint(server, admin, user, monkeypatch):
+    from dive_server import viame
+
+    calls = []
+
+    def slowQueries(slowMs, limit):
+        calls.append((slowMs, limit))
+        return {'profilingLevel': 1, 'profilingSlowMs': 100, 'queries': []}
+
+    monkeypatch.setattr(viame, 'indexUsage', lambda models: {m.name: [] for m in models})
+    monkeypatch.setattr(viame, 'slowQueries', slowQueries)
+
+    assertStatus(server.request('/viame/database_stats', user=user), 403)
+    resp = server.request('/viame/database_stats', user=admin)
+    assertStatusOk(resp)
+    assert set(resp.json['indexes']) == {'item', 'folder', 'job', 'track'}
+    assert resp.json['profilingLevel'] == 1
+    resp = server.request('/viame/database_stats', user=admin, params={'slowMs': 5, 'limit': 3})
+    assertStatusOk(resp)
+    assert calls == [(100, 50), (5, 3)]
+
+
+def test_index_usage(db, monkeypatch):
+    from girder.models.item import Item
+
+    from dive_server.utils import indexUsage
+
+    pipelines = []
+    stats = {
+        'name': 'meta.brand_1_creatorId_1',
+        'key': {'meta.brand': 1, 'creatorId': 1},
+        'host': 'mongo:27017',
+        'accesses': {'ops': 3, 'since': 'then'},
+    }
+    model = Item()
+    monkeypatch.setattr(
+        model.collection, 'aggregate', lambda pipeline: pipelines.append(pipeline) or [stats]
+    )
+    assert indexUsage([model]) == {
+        'item': [{'name': stats['name'], 'key': stats['key'], 'accesses': 3, 'since': 'then'}]
+    }
+    assert pipelines == [[{'$indexStats': {}}]]
+
+
+def test_slow_queries(db, monkeypatch):
+    from girder.models.item import Item
+
+    from dive_server.utils import slowQueries
+
+    database = Item().collection.database
+    monkeypatch.setattr(database, 'command', lambda *args: {'was': 1, 'slowms': 100})
+    database['system.profile'].insert_many(
+        [
+            {'ts': ts, 'op': 'query', 'millis': millis, 'planSummary': 'COLLSCAN', 'command': {}}
+            for ts, millis in enumerate([5, 200, 50, 300])
+        ]
+    )
+    stats = slowQueries(50, 10)
+    assert stats['profilingLevel'] == 1
+    assert stats['profilingSlowMs'] == 100
+    assert [query['millis'] for query in stats['queries']] == [300, 50, 200]
+    assert all(set(query) == {'ts', 'op', 'millis', 'planSummary'} for query in stats['queries'])
+    assert [query['millis'] for query in slowQueries(0, 1)['queries']] == [300]
+
+
+@pytest.mark.parametrize(
+    'model,marker',
+    [('folder', 'DatasetMarker'), ('folder', 'PublishedMarker'), ('item', 'brand')],
+)
+def test_truthy_queries_fit_partial_indexes(db, model, marker):
+    """
+    An equality or $in without null implies $exists, so the truthy metadata queries
+    only match documents covered by the indexes that skip documents without the field
+    """
+    from girder.models.folder import Folder
+    from girder.models.item import Item
+
+    from dive_server import ensureDiveIndices
+    from dive_utils import TRUTHY_META_VALUES, constants
+
+    ensureDiveIndices()
+    collection = {'folder': Folder, 'item': Item}[model]().collection
+    name = getattr(constants, marker, marker)
+    field = f'meta.{name}'
+    (partial,) = [
+        info['partialFilterExpression']
+        for info in collection.index_information().values()
+        if info['key'][0][0] == field
+    ]
+    values = TRUTHY_META_VALUES + [None, False, 0, '', 'no']
+    collection.insert_many([{'name': 'unmarked', 'meta': {}}])
+    collection.insert_many([{'name': repr(v), 'meta': {name: v}} for v in values])
+    query = {field: {'$in': TRUTHY_META_VALUES}}
+    matched = {doc['_id'] for doc in collection.find(query)}
+    assert len(matched) == len(TRUTHY_META_VALUES)
+    assert matched <= {doc['_id'] for doc in collection.find(partial)}
+    assert None not in TRUTHY_META_VALUES
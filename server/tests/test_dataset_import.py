@@ -0,0 +1,60 @@
+from conftest import make_tracks, upload, upload_json
+from pydantic import ValidationError
+import pytest
+
+pytestmark = pytest.mark.plugin('dive_server')
+
+
+def test_process_json_validates_tracks(admin, dataset):
+    from dive_server.utils import getFolderTrackData, process_json
+
+    tracks = make_tracks(3)
+    tracks['1']['features'][0]['bounds'] = ['1', '2', '3', '4']
+    upload_json(admin, dataset, 'annotations.json', tracks)
+    assert process_json(dataset, admin)
+    stored = getFolderTrackData(dataset)
+    assert stored['1']['features'][0]['bounds'] == [1, 2, 3, 4]
+    assert stored['0'] == tracks['0']
+
+
+def test_process_json_rejects_invalid_tracks(admin, dataset):
+    from dive_server.utils import process_json
+
+    tracks = make_tracks(1)
+    tracks['0']['features'][0]['bounds'] = 'not bounds'
+    upload_json(admin, dataset, 'annotations.json', tracks)
+    with pytest.raises(ValidationError):
+        process_json(dataset, admin)
+
+
+def test_process_json_keeps_newest_upload(admin, dataset):
+    import datetime
+
+    from girder.models.item import Item
+
+    from dive_server.utils import getFolderTrackData, process_json
+
+    tracks = make_tracks(3)
+    newest = upload_json(admin, dataset, 'newest.json', {'1': tracks['1']})
+    oldest = upload_json(admin, dataset, 'oldest.json', {'0': tracks['0'], '2': tracks['2']})
+    created = Item().load(newest['itemId'], force=True)['created']
+    Item().update(
+        {'_id': oldest['itemId']},
+        {'$set': {'created': created - datetime.timedelta(minutes=1)}},
+    )
+    assert process_json(dataset, admin)
+    assert getFolderTrackData(dataset) == {'1': tracks['1']}
+
+
+def test_process_csv_validates_tracks(admin, dataset):
+    from dive_server.utils import getFolderTrackData, process_csv
+
+    rows = [
+        '0,1.png,0,1,2,3,4,1,-1,fish,1.0',
+        '0,2.png,1,1,2,3,4,1,-1,fish,1.0,(atr) count 3',
+    ]
+    upload(admin, dataset, 'annotations.csv', '\n'.join(rows).encode(), 'text/csv')
+    assert process_csv(dataset, admin)
+    track = getFolderTrackData(dataset)['0']
+    assert [feature['frame'] for feature in track['features']] == [0, 1]
+    assert track['features'][1]['attributes'] == {'count': 3.0}
@@ -1,3 +1,4 @@
+import copy
 import json
 from typing import Dict, List, Tuple
 
@@ -711,12 +712,14 @@ test_tuple: List[Tuple[dict, dict, dict]] = [
 
 
 @pytest.mark.parametrize("input,expected_tracks,expected_attributes", test_tuple)
+@pytest.mark.parametrize("strict", [False, True])
 def test_read_kwcoco_json(
     input: Dict[str, List[dict]],
     expected_tracks: Dict[str, dict],
     expected_attributes: Dict[str, dict],
+    strict: bool,
 ):
-    (tracks, attributes) = kwcoco.load_coco_as_tracks_and_attributes(input)
+    (tracks, attributes) = kwcoco.load_coco_as_tracks_and_attributes(copy.deepcopy(input), strict)
     print(expected_tracks.keys())
     print(tracks.keys())
     assert json.dumps(tracks, sort_keys=True) == json.dumps(expected_tracks, sort_keys=True)
@@ -4,6 +4,7 @@ from typing import Dict, List, Tuple
 import pytest
 
 from dive_server.serializers import viame
+from dive_utils import iterLines
 
 test_tuple: List[Tuple[list, dict, dict]] = [
     (
@@ -487,11 +488,112 @@ test_tuple: List[Tuple[list, dict, dict]] = [
 
 
 @pytest.mark.parametrize("input,expected_tracks,expected_attributes", test_tuple)
+@pytest.mark.parametrize("strict", [False, True])
 def test_read_viame_csv(
     input: List[str],
     expected_tracks: Dict[str, dict],
     expected_attributes: Dict[str, dict],
+    strict: bool,
 ):
-    (tracks, attributes) = viame.load_csv_as_tracks_and_attributes(input)
+    (tracks, attributes) = viame.load_csv_as_tracks_and_attributes(input, strict=strict)
     assert json.dumps(tracks, sort_keys=True) == json.dumps(expected_tracks, sort_keys=True)
     assert json.dumps(attributes, sort_keys=True) == json.dumps(expected_attributes, sort_keys=True)
+
+
+@pytest.mark.parametrize("input,expected_tracks,expected_attributes", test_tuple)
+@pytest.mark.parametrize("chunk_size", [1, 7, 64])
+def test_read_viame_csv_streamed(
+    input: List[str],
+    expected_tracks: Dict[str, dict],
+    expected_attributes: Dict[str, dict],
+    chunk_size: int,
+):
+    payload = "\r\n".join(input).encode()
+    chunks = (payload[i : i + chunk_size] for i in range(0, len(payload), chunk_size))
+    (tracks, attributes) = viame.load_csv_as_tracks_and_attributes(iterLines(chunks))
+    assert json.dumps(tracks, sort_keys=True) == json.dumps(expected_tracks, sort_keys=True)
+    assert json.dumps(attributes, sort_keys=True) == json.dumps(expected_attributes, sort_keys=True)
+
+
+def test_iter_lines_multibyte_boundaries():
+    text = "# header\r\n0,é.png,0,1,2,3,4,1,-1,поле,1.0\n\n1,ü.png,1,1,2,3,4,1,-1,魚,0.5"
+    payload = text.encode()
+    for chunk_size in range(1, 8):
+        chunks = [payload[i : i + chunk_size] for i in range(0, len(payload), chunk_size)]
+        assert list(iterLines(chunks)) == text.splitlines()
+
+
+def _interleaved_rows(count: int) -> List[str]:
+    rows = ["# 1: Detection or Track-id,2: Video or Image Identifier"]
+    for i in range(count):
+        trackId = i % 7
+        rows.append(
+            f"{trackId},{i}.png,{i},1,2,3,4,1,-1,type{i % 3},0.{i % 10}5"
+            f",(atr) note {'even' if i % 2 else i},(trk-atr) group {i // 50}"
+            f",(poly) 1 2 3 4 5 {i}"
+        )
+    return rows
+
+
+@pytest.mark.parametrize("input", [case[0] for case in test_tuple] + [_interleaved_rows(400)])
+@pytest.mark.parametrize("processes", [2, 5])
+def test_read_viame_csv_parallel(tmp_path, input: List[str], processes: int):
+    path = tmp_path / "input.csv"
+    path.write_text("\n".join(input))
+    expected = viame.load_csv_as_tracks_and_attributes(input)
+    actual = viame.load_csv_file_as_tracks_and_attributes(
+        str(path), processes=processes, min_range_bytes=1, min_parallel_bytes=0
+    )
+    assert json.dumps(actual) == json.dumps(expected)
+
+
+def test_read_viame_csv_small_file_is_serial(tmp_path, monkeypatch):
+    path = tmp_path / "input.csv"
+    path.write_text("\n".join(_interleaved_rows(400)))
+
+    def no_pool():
+        raise AssertionError("small files should not use the process pool")
+
+    monkeypatch.setattr(viame, "_csv_pool", no_pool)
+    actual = viame.load_csv_file_as_tracks_and_attributes(str(path), processes=4, min_range_bytes=1)
+    expected = viame.load_csv_as_tracks_and_attributes(_interleaved_rows(400))
+    assert json.dumps(actual) == json.dumps(expected)
+
+
+def test_attribute_inference_high_cardinality():
+    rows = []
+    for i in range(5000):
+        rows.append(
+            f"{i},{i}.png,{i},1,2,3,4,1,-1,fish,1.0"
+            f",(atr) note free text {i},(atr) specimen {i},(atr) rating {['good', 'bad'][i % 2]}"
+        )
+    metadata_attributes: Dict[str, dict] = {}
+    test_vals: Dict[str, viame.AttributeValueCounter] = {}
+    for row in rows:
+        _, attributes, _, _ = viame._parse_row(row.split(","))
+        for key, val in attributes.items():
+            viame.create_attributes(metadata_attributes, test_vals, 'detection', key, val)
+    viame.calculate_attribute_types(metadata_attributes, test_vals)
+
+    assert all(len(counter.counts) <= 2 * counter.capacity for counter in test_vals.values())
+    assert metadata_attributes['detection_note']['datatype'] == 'text'
+    assert 'values' not in metadata_attributes['detection_note']
+    assert metadata_attributes['detection_specimen']['datatype'] == 'number'
+    assert metadata_attributes['detection_rating']['datatype'] == 'text'
+    assert metadata_attributes['detection_rating']['values'] == ['good', 'bad']
+
+
+def test_attribute_counter_batches_shrinks(monkeypatch):
+    counter = viame.AttributeValueCounter(capacity=10)
+    shrinks = []
+    shrink = counter._shrink
+    monkeypatch.setattr(counter, "_shrink", lambda: shrinks.append(shrink()))
+    for i in range(1000):
+        counter.add(f"value {i}")
+        counter.add("frequent")
+    assert not counter.exact
+    assert len(counter.counts) <= 2 * counter.capacity
+    # The heaviest value always survives, and the summary never undercounts it by more
+    # than the number of values divided by the capacity
+    assert counter.counts["frequent"] >= 1000 - 2000 // counter.capacity
+    assert len(shrinks) <= 1000 // counter.capacity
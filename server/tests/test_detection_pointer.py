@@ -0,0 +1,168 @@
+from conftest import make_tracks
+from girder.models.folder import Folder
+from girder.models.item import Item
+import pytest
+
+from dive_utils.constants import DetectionFileMarker, DetectionItemMarker
+
+pytestmark = pytest.mark.plugin('dive_server')
+
+
+def pointer(folder):
+    """The detection pointer stored on a dataset"""
+    meta = Folder().load(folder['_id'], force=True)['meta']
+    return meta.get(DetectionItemMarker), meta.get(DetectionFileMarker)
+
+
+def revisions(folder):
+    from dive_server.utils import all_detections_items
+
+    return list(all_detections_items(folder))
+
+
+def reload(folder):
+    return Folder().load(folder['_id'], force=True)
+
+
+def test_save_moves_pointer(admin, dataset):
+    from dive_server.utils import detection_item_file, saveTrackDelta, saveTracks
+
+    saveTracks(dataset, make_tracks(2), admin)
+    first = revisions(dataset)[0]
+    assert pointer(dataset) == (str(first['_id']), str(detection_item_file(first)['_id']))
+    saveTracks(dataset, make_tracks(3), admin)
+    second = revisions(dataset)[0]
+    assert second['_id'] != first['_id']
+    assert pointer(dataset) == (str(second['_id']), str(detection_item_file(second)['_id']))
+    # Revisions appended to the log leave the snapshot current
+    saveTrackDelta(reload(dataset), [make_tracks(4)['3']], ['0'], admin)
+    assert pointer(dataset) == (str(second['_id']), str(detection_item_file(second)['_id']))
+
+
+def test_save_of_past_revision(admin, dataset):
+    from dive_server.utils import (
+        detection_item_file,
+        detections_file,
+        getFolderTrackData,
+        saveTracks,
+    )
+
+    original = make_tracks(2)
+    saveTracks(dataset, original, admin)
+    saveTracks(dataset, make_tracks(3), admin)
+    originalFile = detection_item_file(revisions(dataset)[1])
+    # Saving the tracks of an earlier revision again shares its files, and
+    # retention removes the earlier copy
+    saveTracks(dataset, original, admin)
+    newest, _ = revisions(dataset)
+    assert pointer(dataset) == (str(newest['_id']), str(detection_item_file(newest)['_id']))
+    file = detections_file(reload(dataset))
+    assert file['itemId'] == newest['_id']
+    assert file['sha512'] == originalFile['sha512']
+    assert getFolderTrackData(reload(dataset)) == original
+
+
+def test_delete_falls_back_and_repairs(admin, dataset):
+    from dive_server.utils import (
+        detection_item_file,
+        detections_file,
+        detections_item,
+        getFolderTrackData,
+        saveTracks,
+    )
+
+    original = make_tracks(2)
+    saveTracks(dataset, original, admin)
+    saveTracks(dataset, make_tracks(3), admin)
+    newest, previous = revisions(dataset)
+    Item().remove(newest)
+
+    assert detections_item(reload(dataset))['_id'] == previous['_id']
+    expected = (str(previous['_id']), str(detection_item_file(previous)['_id']))
+    assert pointer(dataset) == expected
+    assert detections_file(reload(dataset))['itemId'] == previous['_id']
+    assert getFolderTrackData(reload(dataset)) == original
+
+    Item().remove(previous)
+    assert detections_item(reload(dataset)) is None
+    assert pointer(dataset) == (None, None)
+    assert detections_file(reload(dataset)) is None
+
+
+def test_forget_and_refresh(admin, dataset):
+    from dive_server.utils import (
+        detection_item_file,
+        detections_file,
+        forgetCurrentDetections,
+        refreshCurrentDetections,
+        saveTracks,
+        setCurrentDetections,
+    )
+
+    saveTracks(dataset, make_tracks(2), admin)
+    saveTracks(dataset, make_tracks(3), admin)
+    newest, previous = revisions(dataset)
+    expected = (str(newest['_id']), str(detection_item_file(newest)['_id']))
+
+    forgetCurrentDetections(dataset['_id'])
+    assert pointer(dataset) == (None, None)
+    assert reload(dataset)['meta'].keys().isdisjoint({DetectionItemMarker, DetectionFileMarker})
+    assert detections_file(reload(dataset))['_id'] == detection_item_file(newest)['_id']
+    assert pointer(dataset) == expected
+
+    # A pointer at an older revision is trusted until it is refreshed
+    setCurrentDetections(dataset, previous, detection_item_file(previous))
+    assert detections_file(reload(dataset))['itemId'] == previous['_id']
+    assert refreshCurrentDetections(reload(dataset))['_id'] == newest['_id']
+    assert pointer(dataset) == expected
+
+
+def test_stale_pointers_are_repaired(admin, dataset):
+    from dive_server.utils import (
+        detection_item_file,
+        detections_file,
+        detections_item,
+        saveTracks,
+        setCurrentDetections,
+    )
+
+    other = Folder().createFolder(admin, 'other', parentType='user', creator=admin)
+    saveTracks(other, make_tracks(1), admin)
+    saveTracks(dataset, make_tracks(2), admin)
+    item = revisions(dataset)[0]
+    otherItem = revisions(other)[0]
+    expected = (str(item['_id']), str(detection_item_file(item)['_id']))
+
+    # The item of another dataset, as a clone starts out with
+    setCurrentDetections(dataset, otherItem, detection_item_file(otherItem))
+    assert detections_item(reload(dataset))['_id'] == item['_id']
+    assert pointer(dataset) == expected
+
+    # The right item with the file of another
+    setCurrentDetections(dataset, item, detection_item_file(otherItem))
+    assert detections_file(reload(dataset))['itemId'] == item['_id']
+    assert pointer(dataset) == expected
+
+
+def test_training_csv_is_not_the_detection_file(admin, dataset):
+    from girder.models.file import File
+
+    from dive_server.training import ensure_csv_detections_file
+    from dive_server.utils import (
+        detection_item_file,
+        detections_file,
+        forgetCurrentDetections,
+        saveTracks,
+    )
+
+    saveTracks(dataset, make_tracks(2), admin)
+    (item,) = revisions(dataset)
+    snapshot = detection_item_file(item)
+    csv = ensure_csv_detections_file(reload(dataset), item, admin)
+    assert csv['itemId'] == item['_id']
+    # The stored order of an item's files is arbitrary, so put the csv first
+    File().collection.delete_one({'_id': snapshot['_id']})
+    File().collection.insert_one(snapshot)
+    assert detection_item_file(item)['_id'] == snapshot['_id']
+    forgetCurrentDetections(dataset['_id'])
+    assert detections_file(reload(dataset))['_id'] == snapshot['_id']
@@ -0,0 +1,56 @@
+from conftest import make_tracks
+from girder.exceptions import RestException
+from girder.models.folder import Folder
+import pytest
+
+pytestmark = pytest.mark.plugin('dive_server')
+
+
+def test_window_matches_overlapping_tracks(admin, dataset):
+    from dive_server.utils import getTrackDataInWindow, saveTrackDelta, saveTracks
+
+    tracks = make_tracks(20)
+    saveTracks(dataset, tracks, admin)
+    moved = {**tracks['3'], 'begin': 40, 'end': 44}
+    saveTrackDelta(dataset, [moved], ['6'], admin)
+    tracks['3'] = moved
+    del tracks['6']
+
+    dataset = Folder().load(dataset['_id'], force=True)
+    window = getTrackDataInWindow(dataset, 5, 8)
+    assert window.keys() == {
+        key for key, track in tracks.items() if track['begin'] <= 8 and track['end'] >= 5
+    }
+    assert all(
+        5 <= feature['frame'] <= 8 for track in window.values() for feature in track['features']
+    )
+
+
+def test_interval_index_is_parsed_once(admin, dataset, monkeypatch):
+    from dive_server import utils
+
+    utils.saveTracks(dataset, make_tracks(10), admin)
+    dataset = Folder().load(dataset['_id'], force=True)
+    utils.intervalIndexCache.clear()
+    hits = utils.intervalIndexCache.stats()['hits']
+    loads = []
+    original = utils.json.load
+
+    def counting_load(fh, *args, **kwargs):
+        loads.append(fh)
+        return original(fh, *args, **kwargs)
+
+    monkeypatch.setattr(utils.json, 'load', counting_load)
+    first = utils.getTrackDataInWindow(dataset, 0, 3)
+    assert len(loads) == 1
+    assert utils.getTrackDataInWindow(dataset, 0, 3) == first
+    assert len(loads) == 1
+    assert utils.intervalIndexCache.stats()['hits'] == hits + 1
+
+
+def test_detections_file_strict(admin, dataset):
+    from dive_server.utils import detections_file
+
+    assert detections_file(dataset) is None
+    with pytest.raises(RestException):
+        detections_file(dataset, strict=True)
@@ -0,0 +1,191 @@
+import gzip
+import io
+import json
+
+from conftest import upload
+from girder.constants import AccessType
+from girder.models.file import File
+from girder.models.folder import Folder
+from girder.models.item import Item
+from girder.models.upload import Upload
+import pytest
+from pytest_girder.assertions import assertStatus, assertStatusOk
+from pytest_girder.utils import getResponseBody
+
+from dive_utils.constants import FrameManifestBuildMarker, FrameManifestMarker
+
+pytestmark = pytest.mark.plugin('dive_server')
+
+
+@pytest.fixture
+def images(admin, dataset):
+    return {
+        name: upload(admin, dataset, name, b'x' * size, 'image/png')
+        for name, size in [
+            ('10.png', 3),
+            ('2.png', 1),
+            ('1.png', 2),
+        ]
+    }
+
+
+def reload(folder):
+    return Folder().load(folder['_id'], force=True)
+
+
+def cached(folder):
+    return reload(folder)['meta'].get(FrameManifestMarker)
+
+
+def test_endpoint(server, admin, dataset, images):
+    path = '/viame/frame_manifest'
+    params = {'folderId': str(dataset['_id'])}
+    resp = server.request(path, user=admin, params=params, isJson=False)
+    assertStatusOk(resp)
+    rows = json.loads(getResponseBody(resp))
+    assert rows == [
+        [name, str(images[name]['itemId']), str(images[name]['_id']), images[name]['size']]
+        for name in ['1.png', '2.png', '10.png']
+    ]
+    identity = resp.headers['ETag']
+
+    gzipHeaders = [('Accept-Encoding', 'gzip')]
+    resp = server.request(
+        path, user=admin, params=params, isJson=False, additionalHeaders=gzipHeaders
+    )
+    assertStatusOk(resp)
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(getResponseBody(resp, text=False))) == rows
+    zipped = resp.headers['ETag']
+    assert zipped != identity
+
+    resp = server.request(
+        path,
+        user=admin,
+        params=params,
+        isJson=False,
+        additionalHeaders=[*gzipHeaders, ('If-None-Match', zipped)],
+    )
+    assertStatus(resp, 304)
+    resp = server.request(
+        path,
+        user=admin,
+        params=params,
+        isJson=False,
+        additionalHeaders=[*gzipHeaders, ('If-None-Match', identity)],
+    )
+    assertStatusOk(resp)
+
+
+def test_cached_until_images_change(admin, dataset, images):
+    from dive_server.utils import frameManifest, frameManifestFile, get_or_create_auxiliary_folder
+
+    first = frameManifestFile(dataset, admin)
+    assert cached(dataset) == str(first['_id'])
+    assert FrameManifestBuildMarker not in reload(dataset)['meta']
+    assert frameManifestFile(reload(dataset), admin)['_id'] == first['_id']
+
+    # Saves that leave the images where they were keep the manifest
+    Item().setMetadata(Item().load(images['1.png']['itemId'], force=True), {'note': 1})
+    upload(admin, dataset, 'notes.txt', b'notes', 'text/plain')
+    upload(admin, get_or_create_auxiliary_folder(dataset, admin), '3.png', b'x', 'image/png')
+    assert cached(dataset) == str(first['_id'])
+
+    upload(admin, dataset, '3.png', b'xyz', 'image/png')
+    assert cached(dataset) is None
+    second = frameManifestFile(reload(dataset), admin)
+    assert second['_id'] != first['_id']
+    assert [row[0] for row in frameManifest(reload(dataset), admin)] == [
+        '1.png',
+        '2.png',
+        '3.png',
+        '10.png',
+    ]
+    # Only the current manifest is kept
+    auxiliary = get_or_create_auxiliary_folder(dataset, admin)
+    manifests = list(Item().find({'folderId': auxiliary['_id'], 'name': 'frame_manifest.json'}))
+    assert len(manifests) == 1
+
+
+@pytest.mark.parametrize('change', ['rename', 'move', 'remove', 'file', 'remove file'])
+def test_invalidation(admin, dataset, images, change):
+    from dive_server.utils import frameManifestFile
+
+    frameManifestFile(dataset, admin)
+    assert cached(dataset)
+    item = Item().load(images['2.png']['itemId'], force=True)
+    file = File().load(images['2.png']['_id'], force=True)
+    if change == 'rename':
+        item['name'] = '20.png'
+        Item().save(item)
+    elif change == 'move':
+        other = Folder().createFolder(admin, 'other', parentType='user', creator=admin)
+        Item().move(item, other)
+    elif change == 'remove':
+        Item().remove(item)
+    elif change == 'file':
+        file['size'] = 5
+        File().save(file)
+    else:
+        File().remove(file)
+    assert cached(dataset) is None
+
+
+def test_new_file_of_listed_image_keeps_manifest(admin, dataset, images):
+    from dive_server.utils import frameManifestFile
+
+    frameManifestFile(dataset, admin)
+    item = Item().load(images['2.png']['itemId'], force=True)
+    Upload().uploadFromFile(
+        io.BytesIO(b'later'), 5, '2.png', parentType='item', parent=item, user=admin
+    )
+    assert cached(dataset)
+
+
+def test_image_without_file_is_not_cached(admin, dataset, images):
+    from dive_server.utils import frameManifest
+
+    Item().createItem('4.png', admin, dataset)
+    rows = frameManifest(dataset, admin)
+    assert rows[2][0] == '4.png' and rows[2][2] is None
+    assert cached(dataset) is None
+
+
+def test_change_during_build_is_not_cached(admin, dataset, images, monkeypatch):
+    from dive_server import utils
+
+    build = utils._frameManifestRows
+
+    def concurrent_upload(root, user):
+        rows = build(root, user)
+        upload(admin, dataset, '3.png', b'x', 'image/png')
+        return rows
+
+    monkeypatch.setattr(utils, '_frameManifestRows', concurrent_upload)
+    assert len(utils.frameManifest(dataset, admin)) == 3
+    meta = reload(dataset)['meta']
+    assert FrameManifestMarker not in meta and FrameManifestBuildMarker not in meta
+    monkeypatch.setattr(utils, '_frameManifestRows', build)
+    assert len(utils.frameManifest(reload(dataset), admin)) == 4
+    assert cached(dataset)
+
+
+def test_invalidating_without_manifest_leaves_folder(admin, dataset, images):
+    from dive_server.utils import invalidateFrameManifests
+
+    before = reload(dataset)
+    invalidateFrameManifests([dataset['_id']])
+    assert reload(dataset) == before
+
+
+def test_manifest_of_clone_belongs_to_owner(admin, user, dataset, images):
+    from dive_server.utils import createSoftClone, frameManifest, frameManifestFile
+
+    Folder().setUserAccess(dataset, user, AccessType.READ, save=True)
+    parent = Folder().createFolder(user, 'clones', parentType='user', creator=user)
+    clone = createSoftClone(user, reload(dataset), parent, 'clone')
+    file = frameManifestFile(clone, user)
+    assert Item().load(file['itemId'], force=True)['creatorId'] == admin['_id']
+    assert file['creatorId'] == admin['_id']
+    assert cached(dataset) == str(file['_id'])
+    assert [row[0] for row in frameManifest(clone, user)] == ['1.png', '2.png', '10.png']
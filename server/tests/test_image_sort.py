@@ -1,9 +1,10 @@
 import functools
 import json
+import random
 
 import pytest
 
-from dive_utils import strNumericCompare
+from dive_utils import natural_sort_key, natural_sort_string, strNumericCompare
 
 with open('../testutils/imagesort.spec.json', 'r') as fp:
     test_tuple = json.load(fp)
@@ -13,3 +14,22 @@ with open('../testutils/imagesort.spec.json', 'r') as fp:
 def test_utils_sort(input, expected):
     print(sorted(input, key=functools.cmp_to_key(strNumericCompare)))
     assert sorted(input, key=functools.cmp_to_key(strNumericCompare)) == expected
+
+
+@pytest.mark.parametrize("input,expected", test_tuple)
+def test_natural_sort_key(input, expected):
+    assert sorted(input, key=natural_sort_key) == expected
+    assert sorted(input, key=natural_sort_string) == expected
+
+
+def test_natural_sort_key_matches_compare():
+    rng = random.Random(0)
+    alphabet = ['a', 'b', 'B', '_', '.', '-', ' ', '0', '1', '2', '9', '00', '10', 'png']
+    names = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 6))) for _ in range(2000)]
+    for a, b in zip(names, reversed(names)):
+        compare = strNumericCompare(a, b)
+        expected = (compare > 0) - (compare < 0)
+        keyA, keyB = natural_sort_key(a), natural_sort_key(b)
+        assert (keyA > keyB) - (keyA < keyB) == expected
+        stringA, stringB = natural_sort_string(a), natural_sort_string(b)
+        assert (stringA > stringB) - (stringA < stringB) == expected
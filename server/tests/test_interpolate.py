@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from dive_utils.models import Feature, interpolate, interpolate_bounds, interpolate_json
+
+
+def _reference_bounds(a_frame, a_bounds, b_frame, b_bounds):
+    frame_range = b_frame - a_frame
+    for frame in range(1, frame_range):
+        delta = frame / frame_range
+        inverse_delta = 1 - delta
+        yield a_frame + frame, [
+            round((abox * inverse_delta) + (bbox * delta))
+            for (abox, bbox) in zip(a_bounds, b_bounds)
+        ]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_interpolate_bounds_matches_round(seed: int):
+    rng = random.Random(seed)
+    a_frame = rng.randint(0, 1000)
+    b_frame = a_frame + rng.choice([1, 2, 3, 4, 8, 9, 100, rng.randint(1, 5000)])
+    a_bounds = [rng.randint(-10, 4000) for _ in range(4)]
+    b_bounds = [rng.randint(-10, 4000) for _ in range(4)]
+    frames, bounds = interpolate_bounds(a_frame, a_bounds, b_frame, b_bounds)
+    assert list(zip(frames.tolist(), bounds.tolist())) == list(
+        _reference_bounds(a_frame, a_bounds, b_frame, b_bounds)
+    )
+
+
+def test_interpolate_half_to_even():
+    # 1.5 and 2.5 must round to 2, 3.5 to 4, as round() does
+    frames, bounds = interpolate_bounds(0, [1, 2, 3, 0], 2, [2, 3, 4, 1])
+    assert frames.tolist() == [1]
+    assert bounds.tolist() == [[2, 2, 4, 0]]
+
+
+def test_interpolate_features_and_json_agree():
+    a = Feature(frame=10, bounds=[0, 0, 10, 10], interpolate=True)
+    b = Feature(frame=14, bounds=[4, 8, 14, 30])
+    features = [feature.dict(exclude_none=True) for feature in interpolate(a, b)]
+    assert features == interpolate_json(a.dict(exclude_none=True), b.dict(exclude_none=True))
+    assert [feature['frame'] for feature in features] == [10, 11, 12, 13]
+    assert all(isinstance(x, int) for feature in features for x in feature['bounds'])
+
+
+def test_interpolate_requires_interpolate_enabled():
+    with pytest.raises(ValueError):
+        interpolate_json({'frame': 0, 'bounds': [0, 0, 1, 1]}, {'frame': 2, 'bounds': [0, 0, 1, 1]})
@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+from dive_utils.intervals import build_interval_index, query_interval_index
+from dive_utils.models import trim_track_json
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_query_interval_index_matches_scan(seed: int):
+    rng = random.Random(seed)
+    intervals = []
+    for _ in range(rng.randint(0, 300)):
+        begin = rng.randint(0, 5000)
+        intervals.append([begin, begin + rng.choice([0, 1, rng.randint(0, 200), 4000])])
+    nodes = build_interval_index(intervals)
+    for _ in range(50):
+        start = rng.randint(-10, 5500)
+        end = start + rng.choice([0, 1, rng.randint(0, 500)])
+        expected = [
+            i for i, (begin, stop) in enumerate(intervals) if begin <= end and stop >= start
+        ]
+        assert query_interval_index(nodes, intervals, start, end) == expected
+
+
+def _track(*keyframes):
+    return {
+        "trackId": 0,
+        "begin": keyframes[0][0],
+        "end": keyframes[-1][0],
+        "features": [
+            {"frame": frame, "bounds": [0, 0, 1, 1], "interpolate": interpolate}
+            for frame, interpolate in keyframes
+        ],
+    }
+
+
+@pytest.mark.parametrize(
+    "keyframes,start,end,expected",
+    [
+        ([(0, False), (5, False), (10, False)], 4, 6, [5]),
+        ([(0, False), (5, False), (10, False)], 6, 9, []),
+        # Interpolated spans that cross into the window keep their keyframes
+        ([(0, True), (5, True), (10, False)], 3, 4, [0, 5]),
+        ([(0, True), (5, True), (10, False)], 4, 6, [0, 5, 10]),
+        ([(0, False), (5, True), (10, False)], 2, 7, [5, 10]),
+        ([(0, True), (10, False)], 20, 30, []),
+        ([(0, True), (10, True)], 10, 30, [10]),
+        ([(0, True), (10, True), (20, False)], 0, 10, [0, 10]),
+    ],
+)
+def test_trim_track_json(keyframes, start, end, expected):
+    track = _track(*keyframes)
+    trimmed = trim_track_json(track, start, end)
+    assert [feature["frame"] for feature in trimmed["features"]] == expected
+    assert len(track["features"]) == len(keyframes)
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from dive_utils.retention import revisions_to_remove
+
+now = datetime(2021, 6, 1, 12, 30)
+
+
+def revisions(*minutesAgo, hashes=None):
+    hashes = hashes or [None] * len(minutesAgo)
+    return [(now - timedelta(minutes=m), h) for m, h in zip(minutesAgo, hashes)]
+
+
+def test_keep_everything_by_default():
+    assert revisions_to_remove(revisions(0, 1, 2, 3)) == []
+
+
+def test_keep_last():
+    assert revisions_to_remove(revisions(0, 1, 2, 3), keepLast=2) == [2, 3]
+    # The current revision is never removed
+    assert revisions_to_remove(revisions(0, 1), keepLast=-1) == []
+
+
+def test_hourly_thinning():
+    # 12:30, 12:10, 11:50, 11:20, 10:30, 08:30
+    history = revisions(0, 20, 40, 70, 120, 240)
+    assert revisions_to_remove(history, thinning='hourly') == [1, 3]
+    assert revisions_to_remove(history, keepLast=2, thinning='hourly') == [3]
+
+
+def test_daily_thinning():
+    history = revisions(0, 60, 60 * 24, 60 * 25, 60 * 49)
+    assert revisions_to_remove(history, thinning='daily') == [1, 3]
+
+
+def test_duplicates_removed():
+    history = revisions(0, 1, 2, 3, hashes=['a', 'b', 'a', None])
+    assert revisions_to_remove(history) == [2]
+    # The current revision stays even when an older one is identical to it
+    assert revisions_to_remove(revisions(0, 1, hashes=['a', 'a'])) == [1]
+
+
+def test_unknown_thinning():
+    with pytest.raises(ValueError):
+        revisions_to_remove(revisions(0), thinning='weekly')
@@ -1,3 +1,4 @@
+import csv
 from typing import Dict, List, Tuple
 
 import pytest
@@ -296,10 +297,69 @@ test_tuple: List[Tuple[dict, list, list]] = [
 
 
 @pytest.mark.parametrize("input,expected,typeFilter", test_tuple)
-def test_write_viame_csv(input: Dict[str, dict], expected: List[str], typeFilter: List[str]):
-    for i, line in enumerate(
+@pytest.mark.parametrize("bufferSize", [0, 40, 65536])
+def test_write_viame_csv(
+    input: Dict[str, dict], expected: List[str], typeFilter: List[str], bufferSize: int
+):
+    chunks = list(
         viame.export_tracks_as_csv(
-            input, filenames=filenames, header=False, typeFilter=set(typeFilter)
+            input,
+            filenames=filenames,
+            header=False,
+            typeFilter=set(typeFilter),
+            bufferSize=bufferSize,
         )
-    ):
+    )
+    if bufferSize == 0:
+        assert len(chunks) == len(expected)
+    lines = "".join(chunks).splitlines()
+    assert len(lines) == len(expected)
+    for i, line in enumerate(lines):
         assert line.strip(' ').rstrip() == expected[i]
+
+
+@pytest.mark.parametrize("input,expected,typeFilter", test_tuple)
+def test_write_viame_csv_sorted_by_frame(
+    input: Dict[str, dict], expected: List[str], typeFilter: List[str]
+):
+    lines = "".join(
+        viame.export_tracks_as_csv(
+            input,
+            filenames=filenames,
+            header=False,
+            typeFilter=set(typeFilter),
+            sortBy='frame',
+        )
+    ).splitlines()
+    # Rows are stably sorted, so tracks keep their order within a frame
+    expected = sorted(expected, key=lambda row: int(row.split(',')[2]))
+    assert [line.strip(' ').rstrip() for line in lines] == expected
+
+
+def test_write_viame_csv_sorted_by_frame_overlapping_tracks():
+    tracks = {
+        str(trackId): {
+            "trackId": trackId,
+            "confidencePairs": [["fish", 1.0]],
+            "features": [
+                {"frame": begin, "bounds": [0, 0, 10, 10], "keyframe": True, "interpolate": True},
+                {"frame": end, "bounds": [10, 10, 20, 20], "keyframe": True},
+            ],
+            "begin": begin,
+            "end": end,
+        }
+        for trackId, begin, end in [(0, 5, 9), (1, 0, 3), (2, 2, 12), (3, 20, 21)]
+    }
+    rows = list(
+        csv.reader(
+            "".join(viame.export_tracks_as_csv(tracks, header=False, sortBy='frame')).splitlines()
+        )
+    )
+    assert len(rows) == 5 + 4 + 11 + 2
+    keys = [(int(row[2]), int(row[0])) for row in rows]
+    assert keys == sorted(keys)
+
+
+def test_write_viame_csv_invalid_sort():
+    with pytest.raises(ValueError):
+        list(viame.export_tracks_as_csv({}, sortBy='type'))
@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+from dive_utils.stats import track_stats, update_track_stats
+
+
+def make_track(trackId: int, begin: int, end: int, trackType=None, features=1):
+    track = {
+        "trackId": trackId,
+        "begin": begin,
+        "end": end,
+        "features": [{"frame": begin + i, "bounds": [0, 0, 1, 1]} for i in range(features)],
+    }
+    if trackType is not None:
+        track["confidencePairs"] = [[trackType, 0.9], ["other", 0.1]]
+    return track
+
+
+def test_track_stats():
+    tracks = [
+        make_track(0, 3, 10, "fish", features=2),
+        make_track(1, 0, 4, "fish"),
+        make_track(2, 7, 20, "crab", features=3),
+        make_track(3, 5, 6),
+    ]
+    assert track_stats(tracks) == {
+        "tracks": 4,
+        "detections": 7,
+        "types": [["crab", 1], ["fish", 2], ["unknown", 1]],
+        "frameRange": [0, 20],
+    }
+
+
+def test_track_stats_empty():
+    assert track_stats([]) == {"tracks": 0, "detections": 0, "types": [], "frameRange": None}
+
+
+def test_track_stats_dotted_types():
+    stats = track_stats([make_track(0, 0, 1, "sp. a$b")])
+    assert stats["types"] == [["sp. a$b", 1]]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_update_matches_recompute(seed: int):
+    rng = random.Random(seed)
+    types = ["fish", "crab", None]
+
+    def random_track(trackId):
+        begin = rng.randint(0, 100)
+        return make_track(
+            trackId, begin, begin + rng.randint(0, 20), rng.choice(types), rng.randint(0, 4)
+        )
+
+    tracks = {i: random_track(i) for i in range(rng.randint(0, 10))}
+    stats = track_stats(tracks.values())
+    for _ in range(10):
+        deleted = [i for i in tracks if rng.random() < 0.2]
+        upserted = [random_track(rng.randint(0, 15)) for _ in range(rng.randint(0, 3))]
+        upserted = list({track["trackId"]: track for track in upserted}.values())
+        changed = set(deleted) | {track["trackId"] for track in upserted}
+        removed = [tracks[i] for i in changed if i in tracks]
+        for i in deleted:
+            tracks.pop(i)
+        for track in upserted:
+            tracks[track["trackId"]] = track
+        updated = update_track_stats(stats, removed, upserted)
+        expected = track_stats(tracks.values())
+        if updated is None:
+            assert any(
+                track["begin"] <= stats["frameRange"][0] or track["end"] >= stats["frameRange"][1]
+                for track in removed
+            )
+            updated = expected
+        assert updated == expected
+        stats = updated
+
+
+def test_update_interior_removal():
+    tracks = [make_track(0, 0, 100, "fish"), make_track(1, 10, 20, "crab")]
+    stats = update_track_stats(track_stats(tracks), [tracks[1]], [])
+    assert stats == track_stats(tracks[:1])
+
+
+def test_update_boundary_removal():
+    tracks = [make_track(0, 0, 100, "fish"), make_track(1, 10, 20, "crab")]
+    assert update_track_stats(track_stats(tracks), [tracks[0]], []) is None
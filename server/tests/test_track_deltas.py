@@ -0,0 +1,193 @@
+from conftest import make_tracks
+from girder.models.file import File
+from girder.models.folder import Folder
+import pytest
+
+pytestmark = pytest.mark.plugin('dive_server')
+
+
+def test_apply_track_delta_deletes_before_upserts():
+    from dive_server.utils import applyTrackDelta
+
+    tracks = make_tracks(3)
+    replacement = {**tracks['1'], 'attributes': {'replaced': True}}
+    applyTrackDelta(tracks, {'delete': [0, '1', 5], 'upsert': [replacement]})
+    assert list(tracks) == ['2', '1']
+    assert tracks['1'] is replacement
+
+
+def test_apply_track_delta_order():
+    from dive_server.utils import applyTrackDelta
+
+    tracks = make_tracks(2)
+    later = make_tracks(4)
+    for delta in [
+        {'upsert': [later['2']], 'delete': []},
+        {'upsert': [], 'delete': [2]},
+        {'upsert': [later['3'], later['2']], 'delete': [0]},
+    ]:
+        applyTrackDelta(tracks, delta)
+    assert tracks == {'1': later['1'], '3': later['3'], '2': later['2']}
+
+
+def test_save_track_delta_appends_revisions(admin, dataset):
+    from dive_server.utils import (
+        detection_deltas,
+        detections_file,
+        getFolderTrackData,
+        saveTrackDelta,
+        saveTracks,
+    )
+
+    tracks = make_tracks(5)
+    saveTracks(dataset, {key: tracks[key] for key in ['0', '1', '2']}, admin)
+    snapshot = detections_file(dataset)
+    saveTrackDelta(dataset, [tracks['3']], ['0'], admin)
+    saveTrackDelta(dataset, [tracks['4'], tracks['0']], ['3'], admin)
+
+    assert detections_file(dataset)['_id'] == snapshot['_id']
+    assert len(list(detection_deltas(snapshot))) == 2
+    stored = getFolderTrackData(dataset)
+    assert sorted(stored, key=int) == ['0', '1', '2', '4']
+    assert stored == {key: tracks[key] for key in stored}
+
+
+def test_save_track_delta_without_snapshot(admin, dataset):
+    from dive_server.utils import detections_file, getFolderTrackData, saveTrackDelta
+
+    tracks = make_tracks(2)
+    saveTrackDelta(dataset, list(tracks.values()), [], admin)
+    assert detections_file(dataset) is not None
+    assert getFolderTrackData(dataset) == tracks
+
+
+def test_compaction_matches_snapshot_and_deltas(admin, dataset):
+    from dive_server.utils import (
+        compactTrackDeltas,
+        detection_deltas,
+        detections_file,
+        getFolderTrackData,
+        saveTrackDelta,
+        saveTracks,
+    )
+
+    tracks = make_tracks(6)
+    saveTracks(dataset, {key: tracks[key] for key in ['0', '1', '2']}, admin)
+    saveTrackDelta(dataset, [tracks['3'], tracks['4']], ['1'], admin)
+    saveTrackDelta(dataset, [tracks['5'], {**tracks['3'], 'attributes': {'a': 1}}], ['4'], admin)
+    expected = getFolderTrackData(dataset)
+
+    compactTrackDeltas(dataset, admin)
+    snapshot = detections_file(dataset)
+    assert list(detection_deltas(snapshot)) == []
+    assert getFolderTrackData(dataset) == expected
+
+
+def test_revision_saved_across_compaction_is_kept(admin, dataset):
+    from dive_server.utils import (
+        compactTrackDeltas,
+        detection_deltas,
+        detections_file,
+        getFolderTrackData,
+        saveTrackDelta,
+        saveTracks,
+    )
+
+    tracks = make_tracks(4)
+    saveTracks(dataset, {key: tracks[key] for key in ['0', '1']}, admin)
+    saveTrackDelta(dataset, [tracks['2']], [], admin)
+    # A save that looked up the detection file just before the compaction finished
+    stale = Folder().load(dataset['_id'], force=True)
+    compactTrackDeltas(dataset, admin)
+    saveTrackDelta(stale, [tracks['3']], ['0'], admin)
+
+    current = Folder().load(dataset['_id'], force=True)
+    assert len(list(detection_deltas(detections_file(current)))) == 1
+    assert getFolderTrackData(current) == {key: tracks[key] for key in ['1', '2', '3']}
+
+
+@pytest.mark.parametrize('delete,parses', [(['2'], 0), (['0'], 1)], ids=['interior', 'boundary'])
+def test_save_track_delta_updates_stats(admin, dataset, monkeypatch, delete, parses):
+    from dive_server import utils
+    from dive_utils.constants import DatasetStatsMarker
+    from dive_utils.stats import track_stats
+
+    tracks = make_tracks(6)
+    utils.saveTracks(dataset, {key: tracks[key] for key in ['0', '1', '2', '3', '4']}, admin)
+    utils.saveTrackDelta(dataset, [{**tracks['3'], 'confidencePairs': [['eel', 0.5]]}], [], admin)
+    before = Folder().load(dataset['_id'], force=True)['meta'][DatasetStatsMarker]
+
+    getTrackData = utils.getTrackData
+    calls = []
+    monkeypatch.setattr(
+        utils, 'getTrackData', lambda file: calls.append(file) or getTrackData(file)
+    )
+    replaced = {**tracks['3'], 'confidencePairs': [['star', 0.5]]}
+    utils.saveTrackDelta(dataset, [tracks['5'], replaced], delete, admin)
+    # Only a removed track that bounded the frame range needs every track
+    assert len(calls) == parses
+    monkeypatch.undo()
+
+    stats = Folder().load(dataset['_id'], force=True)['meta'][DatasetStatsMarker]
+    assert stats.pop('modified') > before['modified']
+    assert stats == track_stats(utils.getFolderTrackData(dataset).values())
+    assert ['star', 1] in stats['types']
+    assert 'eel' not in [trackType for trackType, _ in stats['types']]
+
+
+def test_get_track_versions(admin, dataset):
+    from dive_server.utils import detections_file, getTrackVersions, saveTrackDelta, saveTracks
+
+    tracks = make_tracks(5)
+    saveTracks(dataset, {key: tracks[key] for key in ['0', '1', '2', '3']}, admin)
+    replaced = {**tracks['1'], 'attributes': {'replaced': True}}
+    saveTrackDelta(dataset, [replaced, tracks['4']], ['2'], admin)
+    versions = getTrackVersions(detections_file(dataset), ['1', '2', '4', '9'])
+    assert sorted(versions, key=lambda track: track['trackId']) == [replaced, tracks['4']]
+    assert getTrackVersions(detections_file(dataset), ['0']) == [tracks['0']]
+
+
+def test_get_track_versions_without_indexed_keys(admin, dataset):
+    from dive_server import utils
+    from dive_utils.constants import IntervalIndexMimeType
+
+    tracks = make_tracks(3)
+    utils.saveTracks(dataset, tracks, admin)
+    file = utils.detections_file(dataset)
+    index = dict(utils.detections_interval_index(file))
+    del index['keys']
+    utils.intervalIndexCache.put(
+        str(File().findOne({'itemId': file['itemId'], 'mimeType': IntervalIndexMimeType})['_id']),
+        index,
+        1,
+    )
+    assert utils.getTrackVersions(file, ['1']) == [tracks['1']]
+
+
+def test_clone_keeps_uncompacted_revisions(admin, dataset):
+    from dive_server.utils import (
+        compactTrackDeltas,
+        createSoftClone,
+        detection_deltas,
+        detections_file,
+        getFolderTrackData,
+        saveTrackDelta,
+        saveTracks,
+    )
+
+    tracks = make_tracks(4)
+    saveTracks(dataset, {key: tracks[key] for key in ['0', '1']}, admin)
+    saveTrackDelta(dataset, [tracks['2']], ['0'], admin)
+    saveTrackDelta(dataset, [tracks['3'], tracks['0']], ['2'], admin)
+    expected = getFolderTrackData(dataset)
+
+    parent = Folder().createFolder(admin, 'clones', parentType='user', creator=admin)
+    clone = createSoftClone(admin, Folder().load(dataset['_id'], force=True), parent, 'clone')
+    assert getFolderTrackData(clone) == expected
+    assert len(list(detection_deltas(detections_file(clone)))) == 2
+
+    # The logs are independent of each other
+    compactTrackDeltas(clone, admin)
+    assert getFolderTrackData(clone) == expected
+    assert len(list(detection_deltas(detections_file(dataset)))) == 2
+    assert getFolderTrackData(Folder().load(dataset['_id'], force=True)) == expected
@@ -0,0 +1,117 @@
+from click.testing import CliRunner
+from conftest import make_tracks
+from girder.models.folder import Folder
+import pytest
+
+pytestmark = pytest.mark.plugin('dive_server')
+
+
+@pytest.fixture
+def track_dataset(admin, dataset):
+    from dive_server.utils import migrateTrackStorage
+
+    assert migrateTrackStorage(dataset)
+    return dataset
+
+
+def test_replace_round_trip(track_dataset):
+    from dive_server.track_item import TrackItem
+
+    tracks = make_tracks(12)
+    tracks['3']['attributes'] = {'a.b': 1, '$c': 'text'}
+    TrackItem().replace(track_dataset, tracks)
+    # Tracks come back in trackId order, whatever order they were saved in
+    assert list(TrackItem().trackDict(track_dataset)) == [str(i) for i in range(12)]
+    assert TrackItem().trackDict(track_dataset) == tracks
+    TrackItem().replace(track_dataset, make_tracks(2))
+    assert TrackItem().trackDict(track_dataset) == make_tracks(2)
+
+
+def test_upsert_and_delete(track_dataset):
+    from dive_server.track_item import TrackItem
+
+    tracks = make_tracks(5)
+    TrackItem().replace(track_dataset, {key: tracks[key] for key in ['0', '1', '2']})
+    changed = {**tracks['1'], 'confidencePairs': [['star', 1.0]]}
+    TrackItem().upsert(track_dataset, [changed, tracks['4']])
+    TrackItem().delete(track_dataset, ['0', 2, 7])
+    assert TrackItem().trackDict(track_dataset) == {'1': changed, '4': tracks['4']}
+    doc = TrackItem().findOne({'datasetId': track_dataset['_id'], 'trackId': 1})
+    assert doc['type'] == 'star'
+    assert (doc['begin'], doc['end']) == (1, 5)
+
+
+def test_tracks_are_scoped_to_their_dataset(admin, track_dataset):
+    from dive_server.track_item import TrackItem
+
+    other = Folder().createFolder(admin, 'other', parentType='user', creator=admin)
+    TrackItem().replace(track_dataset, make_tracks(3))
+    TrackItem().replace(other, make_tracks(1))
+    assert len(TrackItem().trackDict(track_dataset)) == 3
+    TrackItem().delete(other, [0, 1])
+    assert len(TrackItem().trackDict(track_dataset)) == 3
+
+
+def test_json_generator(track_dataset):
+    import json
+
+    from dive_server.track_item import TrackItem
+
+    tracks = make_tracks(3)
+    TrackItem().replace(track_dataset, tracks)
+    assert json.loads(''.join(TrackItem().jsonGenerator(track_dataset))) == tracks
+    TrackItem().replace(track_dataset, {})
+    assert ''.join(TrackItem().jsonGenerator(track_dataset)) == '{}'
+
+
+def test_migrate_dataset(admin, dataset):
+    from dive_server.utils import (
+        getFolderTrackData,
+        migrateTrackStorage,
+        saveTrackDelta,
+        saveTracks,
+        usesTrackItems,
+    )
+
+    tracks = make_tracks(4)
+    saveTracks(dataset, {key: tracks[key] for key in ['0', '1', '2']}, admin)
+    saveTrackDelta(dataset, [tracks['3']], ['1'], admin)
+    expected = getFolderTrackData(dataset)
+    assert not usesTrackItems(dataset)
+
+    assert migrateTrackStorage(dataset)
+    assert not migrateTrackStorage(dataset)
+    dataset = Folder().load(dataset['_id'], force=True)
+    assert usesTrackItems(dataset)
+    assert getFolderTrackData(dataset) == expected
+
+    # Saves go to the track documents from then on
+    saveTrackDelta(dataset, [tracks['1']], ['0'], admin)
+    saveTracks(dataset, {**getFolderTrackData(dataset), '0': tracks['0']}, admin)
+    assert getFolderTrackData(dataset) == tracks
+
+
+def test_migrate_tracks_command(admin, dataset, monkeypatch):
+    from dive_server import cli
+    from dive_server.utils import getFolderTrackData, saveTracks, usesTrackItems
+
+    # The test server is already configured
+    monkeypatch.setattr(cli, 'configureServer', lambda plugins: None)
+    saveTracks(dataset, make_tracks(2), admin)
+    result = CliRunner().invoke(cli.migrate_tracks, ['--dataset', str(dataset['_id'])])
+    assert result.exit_code == 0, result.output
+    assert f'Migrated dataset ({dataset["_id"]})' in result.output
+    dataset = Folder().load(dataset['_id'], force=True)
+    assert usesTrackItems(dataset)
+    assert getFolderTrackData(dataset) == make_tracks(2)
+
+    result = CliRunner().invoke(cli.migrate_tracks, [])
+    assert f'Skipped dataset ({dataset["_id"]}), already migrated' in result.output
+
+
+def test_removing_dataset_removes_tracks(admin, track_dataset):
+    from dive_server.track_item import TrackItem
+
+    TrackItem().replace(track_dataset, make_tracks(3))
+    Folder().remove(track_dataset)
+    assert TrackItem().find({'datasetId': track_dataset['_id']}).count() == 0
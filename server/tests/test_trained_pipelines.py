@@ -0,0 +1,110 @@
+from conftest import upload
+from girder.models.folder import Folder
+import pytest
+
+from dive_utils.constants import TrainedPipeFileMarker, TrainedPipelineMarker
+
+pytestmark = pytest.mark.plugin('dive_server')
+
+
+def trained(owner, name, meta=None):
+    folder = Folder().createFolder(owner, name, parentType='user', creator=owner)
+    return Folder().setMetadata(folder, {TrainedPipelineMarker: True, **(meta or {})})
+
+
+@pytest.fixture
+def trainedPipelines(monkeypatch):
+    """Count the queries for trained pipelines, starting from an empty cache"""
+    from dive_server import pipelines
+
+    pipelines.invalidateTrainedPipelines()
+    calls = []
+    query = pipelines._trainedPipelines
+
+    def counted(user):
+        calls.append(user['_id'])
+        return query(user)
+
+    monkeypatch.setattr(pipelines, '_trainedPipelines', counted)
+    return calls
+
+
+def names(user):
+    from dive_server.pipelines import _load_dynamic_pipelines
+
+    return sorted(pipe['name'] for pipe in _load_dynamic_pipelines(user)['trained']['pipes'])
+
+
+def test_trained_pipelines_backfill(server, admin, fsAssetstore):
+    from dive_server.pipelines import _trainedPipelines
+
+    legacy = trained(admin, 'legacy')
+    upload(admin, legacy, 'notes.txt', b'notes')
+    upload(admin, legacy, 'detector.pipe', b'pipe')
+    recorded = trained(admin, 'recorded', {TrainedPipeFileMarker: 'tracker.pipe'})
+    unfinished = trained(admin, 'unfinished')
+
+    pipes = {pipe['name']: pipe for pipe in _trainedPipelines(admin)}
+    assert pipes == {
+        'legacy': {
+            'name': 'legacy',
+            'type': 'trained',
+            'pipe': 'detector.pipe',
+            'folderId': str(legacy['_id']),
+        },
+        'recorded': {
+            'name': 'recorded',
+            'type': 'trained',
+            'pipe': 'tracker.pipe',
+            'folderId': str(recorded['_id']),
+        },
+    }
+    assert Folder().load(legacy['_id'], force=True)['meta'][TrainedPipeFileMarker] == (
+        'detector.pipe'
+    )
+    assert TrainedPipeFileMarker not in Folder().load(unfinished['_id'], force=True)['meta']
+
+
+def test_trained_pipelines_readable_by_user(server, admin, user, fsAssetstore):
+    from dive_server.pipelines import _trainedPipelines
+
+    trained(admin, 'private', {TrainedPipeFileMarker: 'detector.pipe'})
+    trained(user, 'own', {TrainedPipeFileMarker: 'detector.pipe'})
+    assert [pipe['name'] for pipe in _trainedPipelines(user)] == ['own']
+
+
+def test_cached_per_user(server, admin, user, fsAssetstore, trainedPipelines):
+    from dive_server.pipelines import _load_dynamic_pipelines
+
+    trained(admin, 'pipeline', {TrainedPipeFileMarker: 'detector.pipe'})
+    assert names(admin) == ['pipeline']
+    assert names(admin) == ['pipeline']
+    assert trainedPipelines == [admin['_id']]
+    assert names(user) == []
+    assert trainedPipelines == [admin['_id'], user['_id']]
+
+    # Callers get copies of the cached pipelines
+    _load_dynamic_pipelines(admin)['trained']['pipes'][0]['name'] = 'changed'
+    assert names(admin) == ['pipeline']
+    assert len(trainedPipelines) == 2
+
+
+def test_invalidated_by_trained_folders(server, admin, fsAssetstore, trainedPipelines):
+    folder = trained(admin, 'pipeline', {TrainedPipeFileMarker: 'detector.pipe'})
+    names(admin)
+    other = Folder().createFolder(admin, 'other', parentType='user', creator=admin)
+    Folder().setMetadata(other, {'note': 1})
+    names(admin)
+    assert len(trainedPipelines) == 1
+
+    folder = Folder().setMetadata(folder, {'note': 1})
+    names(admin)
+    assert len(trainedPipelines) == 2
+
+    trained(admin, 'second', {TrainedPipeFileMarker: 'tracker.pipe'})
+    assert names(admin) == ['pipeline', 'second']
+    assert len(trainedPipelines) == 3
+
+    Folder().remove(folder)
+    assert names(admin) == ['second']
+    assert len(trainedPipelines) == 4
@@ -0,0 +1,113 @@
+"""
+Micro-benchmark for the VIAME CSV row parser.
+
+Requires dive_server to be installed (pip install -e server/).
+"""
+import argparse
+import csv
+import os
+import random
+import tempfile
+import timeit
+
+from dive_server.serializers import viame
+
+
+def polygon_rows(count, vertices):
+    rows = []
+    for i in range(count):
+        coords = " ".join(str(random.randint(0, 1920)) for _ in range(vertices * 2))
+        rows.append(
+            f"{i % 100},{i}.png,{i},10,10,20,20,0.9,-1,fish,0.9,"
+            f"(kp) head 12.5 14.5,(kp) tail 18.5 19.5,(poly) {coords}"
+        )
+    return rows
+
+
+def attribute_rows(count, attributes):
+    rows = []
+    for i in range(count):
+        columns = [f"{i % 100},{i}.png,{i},10,10,20,20,0.9,-1,fish,0.9,scallop,0.4"]
+        for a in range(attributes):
+            columns.append(f"(atr) detection_{a} {random.choice(['true', '1.5', 'some text'])}")
+        columns.append("(trk-atr) reviewed false")
+        rows.append(",".join(columns))
+    return rows
+
+
+def run(name, rows, repeat):
+    parsed = [next(csv.reader([row])) for row in rows]
+    parse_time = min(
+        timeit.repeat(lambda: [viame._parse_row(row) for row in parsed], number=1, repeat=repeat)
+    )
+    load_time = min(
+        timeit.repeat(
+            lambda: viame.load_csv_as_tracks_and_attributes(rows), number=1, repeat=repeat
+        )
+    )
+    print(f"{name}:")
+    print(f"  _parse_row                         {len(rows) / parse_time:>12,.0f} rows/s")
+    print(f"  load_csv_as_tracks_and_attributes  {len(rows) / load_time:>12,.0f} rows/s")
+
+
+def run_parallel(name, rows, repeat, processes):
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as fh:
+        fh.write("\n".join(rows))
+    try:
+        serial_time = min(
+            timeit.repeat(
+                lambda: viame.load_csv_file_as_tracks_and_attributes(fh.name, processes=1),
+                number=1,
+                repeat=repeat,
+            )
+        )
+        parallel_time = min(
+            timeit.repeat(
+                lambda: viame.load_csv_file_as_tracks_and_attributes(
+                    fh.name, processes=processes, min_range_bytes=1, min_parallel_bytes=0
+                ),
+                number=1,
+                repeat=repeat,
+            )
+        )
+    finally:
+        os.remove(fh.name)
+    print(f"{name} file import:")
+    print(f"  serial                             {len(rows) / serial_time:>12,.0f} rows/s")
+    print(
+        f"  {processes:>2} processes                       "
+        f"{len(rows) / parallel_time:>12,.0f} rows/s ({serial_time / parallel_time:.1f}x)"
+    )
+
+
+def main(args):
+    random.seed(0)
+    polygon = polygon_rows(args.rows, args.vertices)
+    attribute = attribute_rows(args.rows, args.attributes)
+    run("polygon-heavy", polygon, args.repeat)
+    run("attribute-heavy", attribute, args.repeat)
+    if args.processes > 1:
+        run_parallel("polygon-heavy", polygon, args.repeat, args.processes)
+        run_parallel("attribute-heavy", attribute, args.repeat, args.processes)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark VIAME CSV parsing")
+
+    parser.add_argument("--rows", default=20000, type=int, help="Rows per CSV")
+    parser.add_argument("--vertices", default=64, type=int, help="Vertices per polygon")
+    parser.add_argument("--attributes", default=8, type=int, help="Attributes per row")
+    parser.add_argument("--repeat", default=3, type=int, help="Timing repetitions")
+    parser.add_argument(
+        "--processes",
+        default=os.cpu_count(),
+        type=int,
+        help="Process pool size for the parallel file import (1 to skip)",
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args)